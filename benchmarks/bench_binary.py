@@ -0,0 +1,49 @@
+"""
+Size and speed of the binary serialization against dataclasses_json to_json
+and from_json, for lists of departures, disruptions and trips.
+"""
+
+import dataclasses
+import json
+
+from ns import binary, models
+from ns.decoder import decode
+
+from benchmarks.common import load, measure, report, scale
+
+
+def to_json(items: list) -> str:
+    return json.dumps([item.to_dict() for item in items])
+
+
+def asdict_json(items: list) -> str:
+    """ Trip.to_dict fails on its duplicate ctxRecon field, so trips are compared against json of asdict """
+    return json.dumps([dataclasses.asdict(item) for item in items])
+
+
+def main(size: int = 2000):
+    cases = [
+        ('departures', ['payload', 'departures'], models.Departure, to_json),
+        ('disruptions', ['payload'], models.Disruption, to_json),
+        ('trips', ['trips'], models.Trip, asdict_json),
+    ]
+    for name, path, model, encode_json in cases:
+        payload = load(name)
+        for key in path:
+            payload = payload[key]
+        # Sizes of the recorded response, as the scaled one repeats its strings
+        recorded = decode(payload, model)
+        print(f'{name:<40} json {len(encode_json(recorded)):8,} B, binary {len(binary.dumps(recorded)):8,} B')
+
+        items = decode(scale(payload, size), model)
+        text = encode_json(items)
+        data = binary.dumps(items)
+        report(f'{name} json encode', measure(lambda: encode_json(items), repeat=3), size)
+        report(f'{name} binary encode', measure(lambda: binary.dumps(items), repeat=3), size)
+        if encode_json is to_json:
+            report(f'{name} json decode (from_dict)', measure(lambda: [model.from_dict(item) for item in json.loads(text)], repeat=3), size)
+        report(f'{name} binary decode', measure(lambda: binary.loads(data, model), repeat=3), size)
+
+
+if __name__ == '__main__':
+    main()
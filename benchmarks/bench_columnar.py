@@ -0,0 +1,47 @@
+"""
+Models, models with parsed timestamps and columns for departure boards,
+computing the mean delay.
+"""
+
+from datetime import datetime
+
+from ns import models, parsed
+from ns.columnar import MISSING, departure_columns
+from ns.decoder import decode
+
+from benchmarks.common import load, measure, report, scale
+
+
+def parse(value: str) -> datetime:
+    return datetime.strptime(value, '%Y-%m-%dT%H:%M:%S%z')
+
+
+def mean_delay_models(payload):
+    departures = decode(payload, models.Departure)
+    delays = [(parse(d.actual_datetime) - parse(d.planned_datetime)).total_seconds() for d in departures
+              if d.actual_datetime]
+    return sum(delays) / len(delays)
+
+
+def mean_delay_parsed(payload):
+    departures = decode(payload, parsed.MODELS['epoch'][models.Departure])
+    delays = [d.delay for d in departures if d.actual_datetime]
+    return sum(delays) / len(delays)
+
+
+def mean_delay_columns(payload):
+    columns = departure_columns(payload)
+    delays = [actual - planned for planned, actual in zip(columns['planned_datetime'], columns['actual_datetime'])
+              if actual != MISSING]
+    return sum(delays) / len(delays)
+
+
+def main(size: int = 20000):
+    payload = scale(load('departures')['payload']['departures'], size)
+    report('departures models', measure(lambda: mean_delay_models(payload)), size)
+    report('departures parsed models', measure(lambda: mean_delay_parsed(payload)), size)
+    report('departures columns', measure(lambda: mean_delay_columns(payload)), size)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,25 @@
+"""
+Compiled decoders (ns.decoder) against dataclasses_json from_dict.
+"""
+
+import warnings
+
+from ns.decoder import decode
+from ns.models import Departure, Trip
+
+from benchmarks.common import load, measure, report, scale
+
+
+def main(size: int = 10000):
+    warnings.simplefilter('ignore')
+    cases = [
+        ('departures', Departure, scale(load('departures')['payload']['departures'], size)),
+        ('trips', Trip, scale(load('trips')['trips'], size // 10)),
+    ]
+    for name, model, payload in cases:
+        report(f'{name} from_dict', measure(lambda: [model.from_dict(d) for d in payload], repeat=3), len(payload))
+        report(f'{name} decoder', measure(lambda: decode(payload, model)), len(payload))
+
+
+if __name__ == '__main__':
+    main()
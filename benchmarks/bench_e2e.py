@@ -0,0 +1,68 @@
+"""
+End-to-end throughput and latency of NSAPI and AsyncNSAPI against the local
+stand-in gateway, serving the recorded fixtures with simulated latency.
+
+    python -m benchmarks.bench_e2e
+"""
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from ns import AsyncNSAPI, NSAPI
+from ns.replay import StandInGateway
+from ns.transport import TransportOptions
+
+from benchmarks.common import FIXTURES, report_latencies
+
+CALLS = {
+    'stations': lambda ns: ns.get_all_stations(),
+    'departures': lambda ns: ns.get_departures(station='UT'),
+    'trips': lambda ns: ns.get_trips(fromStation='UT', toStation='ASD'),
+    'disruptions': lambda ns: ns.get_disruptions(),
+    'prices': lambda ns: ns.get_trip_price('UT', 'ASD'),
+}
+
+
+def timed(call, ns) -> float:
+    start = time.perf_counter()
+    call(ns)
+    return time.perf_counter() - start
+
+
+def bench_sync(base_url: str, requests: int, concurrency: int):
+    ns = NSAPI('key', transport=TransportOptions(pool_maxsize=concurrency))
+    ns.base_url = base_url
+    for name, call in CALLS.items():
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            latencies = list(executor.map(lambda _: timed(call, ns), range(requests)))
+        report_latencies(f'sync x{concurrency} {name}', time.perf_counter() - start, latencies)
+
+
+async def bench_async(base_url: str, requests: int, concurrency: int):
+    async with AsyncNSAPI('key', transport=TransportOptions(pool_maxsize=concurrency)) as ns:
+        ns.base_url = base_url
+        semaphore = asyncio.Semaphore(concurrency)
+        for name, call in CALLS.items():
+            async def timed_async():
+                async with semaphore:
+                    start = time.perf_counter()
+                    await call(ns)
+                    return time.perf_counter() - start
+
+            start = time.perf_counter()
+            latencies = await asyncio.gather(*(timed_async() for _ in range(requests)))
+            report_latencies(f'async x{concurrency} {name}', time.perf_counter() - start, latencies)
+
+
+def main(requests: int = 500, latency: float = 0.005):
+    with StandInGateway(fixtures=FIXTURES, latency=latency) as gateway:
+        for concurrency in (1, 10):
+            bench_sync(gateway.base_url, requests, concurrency)
+        for concurrency in (1, 10):
+            asyncio.run(bench_async(gateway.base_url, requests, concurrency))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,37 @@
+"""
+Start-up cost of the package: importing it, first use of each client, and
+first use of the dataclasses_json methods of a model, in fresh interpreters.
+A bare ``import ns`` used to take half a second and should stay within
+IMPORT_BUDGET; tests/test_import.py checks that it loads no submodules and
+holds it to the same budget with -X importtime.
+"""
+
+import statistics
+import subprocess
+import sys
+
+STEPS = (
+    ('import ns', 'import ns'),
+    ('import ns + NSAPI', 'import ns\nns.NSAPI("key")'),
+    ('import ns + AsyncNSAPI', 'import asyncio, ns\nasync def main():\n    async with ns.AsyncNSAPI("key"):\n        pass\n'
+                               'asyncio.run(main())'),
+    ('import ns + Message.from_dict', 'import ns\nns.Message.from_dict({"message": "", "style": ""})'),
+)
+
+IMPORT_BUDGET = 0.05  # Seconds
+
+
+def seconds(statements: str) -> float:
+    code = f'import time\nstart = time.perf_counter()\n{statements}\nprint(time.perf_counter() - start)'
+    return float(subprocess.run([sys.executable, '-c', code], stdout=subprocess.PIPE, check=True).stdout)
+
+
+def main(repeat: int = 10):
+    for name, statements in STEPS:
+        median = statistics.median(seconds(statements) for _ in range(repeat))
+        over = '  over budget' if statements == 'import ns' and median > IMPORT_BUDGET else ''
+        print(f'{name:<40} {median * 1000:10.2f} ms{over}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,25 @@
+"""
+Eager against lazy decoding of trips, for a list view reading only the
+duration, the number of transfers and the first and last leg.
+"""
+
+from ns import lazy, models
+from ns.decoder import decode
+
+from benchmarks.common import load, measure, report, scale
+
+
+def overview(trips):
+    return [(trip.planned_duration, trip.transfers, trip.legs[0].origin.name, trip.legs[-1].destination.name)
+            for trip in trips]
+
+
+def main(size: int = 5000):
+    payload = scale(load('trips')['trips'], size)
+    for name, model in (('eager', models.Trip), ('lazy', lazy.MODELS[models.Trip])):
+        report(f'trips {name} decode', measure(lambda: decode(payload, model)), size)
+        report(f'trips {name} decode + overview', measure(lambda: overview(decode(payload, model))), size)
+
+
+if __name__ == '__main__':
+    main()
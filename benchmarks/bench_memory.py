@@ -0,0 +1,48 @@
+"""
+Bytes per decoded object for ns.models against the slotted ns.compact models.
+"""
+
+import gc
+import json
+import tracemalloc
+
+from ns import compact, models
+from ns.decoder import decode
+
+from benchmarks.common import load, scale
+
+
+def bytes_per_object(body: str, path: list, model: type) -> float:
+    """ Memory retained by the decoded objects, including their strings but not the response """
+    gc.collect()
+    tracemalloc.start()
+    payload = json.loads(body)
+    for key in path:
+        payload = payload[key]
+    items = decode(payload, model)
+    del payload
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size / len(items)
+
+
+def main(size: int = 20000):
+    cases = [
+        ('departures', ['payload', 'departures'], models.Departure, compact.Departure),
+        ('arrivals', ['payload', 'arrivals'], models.Arrival, compact.Arrival),
+        ('trips', ['trips'], models.Trip, compact.Trip),
+    ]
+    for name, path, model, compact_model in cases:
+        recorded = load(name)
+        items = recorded
+        for key in path:
+            items = items[key]
+        body = json.dumps({path[0]: {path[1]: scale(items, size)}} if len(path) == 2 else {path[0]: scale(items, size)})
+        before = bytes_per_object(body, path, model)
+        after = bytes_per_object(body, path, compact_model)
+        print(f'{name:<12} {before:10,.0f} B/object {after:10,.0f} B/object ({after / before:.0%})')
+
+
+if __name__ == '__main__':
+    main()
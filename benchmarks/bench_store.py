@@ -0,0 +1,38 @@
+"""
+Warm start of a worker: getting ~600 stations from the JSON response against
+from the persistent store, including decoding them into models.
+"""
+
+import json
+import tempfile
+
+from ns import models
+from ns.decoder import decode
+from ns.store import PersistentCache
+
+from benchmarks.common import load, measure, report, scale
+
+STATIONS = 'https://gateway.apiportal.ns.nl/public-reisinformatie/api/v2/stations'
+
+
+def main(size: int = 600):
+    response = load('stations')
+    response['payload'] = scale(response['payload'], size)
+    body = json.dumps(response)
+
+    with tempfile.TemporaryDirectory() as directory:
+        PersistentCache(directory).fetch(STATIONS, None, lambda: (response, len(body)))
+
+        def from_store():
+            # A new process, mapping the store for the first time
+            cache = PersistentCache(directory)
+            value, _ = cache.fetch(STATIONS, None, None)
+            cache.close()
+            return decode(value['payload'], models.Station)
+
+        report('stations json.loads + decode', measure(lambda: decode(json.loads(body)['payload'], models.Station)), size)
+        report('stations store + decode', measure(from_store), size)
+
+
+if __name__ == '__main__':
+    main()
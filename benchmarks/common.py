@@ -0,0 +1,43 @@
+"""
+Helpers shared by the benchmarks. Run a benchmark from the repository root, e.g.
+
+    python -m benchmarks.bench_decode
+"""
+
+import copy
+import json
+import os
+import timeit
+from typing import Callable, List
+
+FIXTURES = os.path.join(os.path.dirname(__file__), os.pardir, 'tests', 'fixtures')
+
+
+def load(name: str) -> dict:
+    """ Loads a recorded response from tests/fixtures """
+    with open(os.path.join(FIXTURES, f'{name}.json')) as f:
+        return json.load(f)
+
+
+def scale(items: List[dict], size: int) -> List[dict]:
+    """ Blows a recorded list of items up to the given size """
+    return [copy.deepcopy(items[i % len(items)]) for i in range(size)]
+
+
+def measure(func: Callable, repeat: int = 5, number: int = 1) -> float:
+    """ Best time in seconds of a single call """
+    return min(timeit.repeat(func, repeat=repeat, number=number)) / number
+
+
+def report(name: str, seconds: float, items: int):
+    print(f'{name:<40} {seconds * 1000:10.2f} ms {items / seconds:14,.0f} items/s')
+
+
+def percentile(samples: List[float], q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def report_latencies(name: str, seconds: float, latencies: List[float]):
+    print(f'{name:<40} {len(latencies) / seconds:10,.0f} req/s'
+          f'   p50 {percentile(latencies, 0.5) * 1000:7.2f} ms   p99 {percentile(latencies, 0.99) * 1000:7.2f} ms')
@@ -1,12 +1,38 @@
 """
-ns-api 
+ns-api
 
 Simple wrapper for the NS API.
+
+The clients and models are imported on first access, so ``import ns`` itself
+loads nothing: NSAPI does not pull in asyncio or aiohttp, and the models do
+not pull in dataclasses_json until one of its methods is used.
 """
 
+import importlib
 
 __version__ = '0.0.1'
 
+_MODELS = ('Station', 'Product', 'Message', 'Arrival', 'Departure', 'Report', 'TravelAdvice', 'DisruptionTracks',
+           'DisruptionDetails', 'Disruption', 'Link', 'Note', 'TripOriginDestination', 'LegStop', 'JourneyDetail',
+           'Leg', 'TripFare', 'TripProductFare', 'TripFareOptions', 'Trip', 'Price', 'PriceOption')
+
+# Public name: module it is imported from on first access
+_LAZY = {
+    'NSAPI': 'ns.api',
+    'AsyncNSAPI': 'ns.api',
+    **{name: 'ns.models' for name in _MODELS},
+}
+
+__all__ = list(_LAZY)
+
+
+def __getattr__(name: str):
+    module = _LAZY.get(name)
+    if module is None:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    value = globals()[name] = getattr(importlib.import_module(module), name)
+    return value
+
 
-from .models import *
-from .api import NSAPI, AsyncNSAPI
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY))
@@ -1,177 +1,419 @@
-from typing import Dict, List, Union
-
-import requests
-import asyncio
-import aiohttp
-
-from ns.models import Arrival, Departure, Disruption, Station, Trip, PriceOption
+from typing import AsyncIterator, Awaitable, Callable, Dict, Iterable, Iterator, List, Tuple, TypeVar, Union
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from ns.boards import BoardUpdate, DepartureBoards
+from ns.bulk import BulkResult, gather_async, gather_threaded, station_params
+from ns.cache import ResponseCache
+from ns.columnar import Columns, arrival_columns, departure_columns, stop_columns
+from ns.decoder import decode
+from ns.disruptions import DisruptionEvent, DisruptionWatcher
+from ns.endpoints import ARRIVALS, DEPARTURES, DISRUPTIONS, TRIP, TRIPS, Endpoint, endpoint_methods
+from ns.metrics import MODEL_ENDPOINTS, Instrumentation, endpoint
+from ns.models import Departure, Disruption, Trip
+from ns.prices import PriceCache, PriceMatrix, prepare, price_matrix
+from ns.ratelimit import TokenBucket
+from ns.scheduler import Scheduler
+from ns.scroll import TripScroll
+from ns.store import PersistentCache
+from ns.stream import ArrayStream
+from ns.tracking import TripTracker, TripUpdate
+from ns.transport import RequestsTransport, TransportOptions
+
+T = TypeVar('T')
 
 class NSBase():
     base_url = 'https://gateway.apiportal.ns.nl/public-'
+    chunk_size = 64 * 1024
+    compact = False
+    lazy = False
+    timestamps: str = None
+    cache: ResponseCache = None
+    store: PersistentCache = None
+    instrumentation: Instrumentation = None
+    scheduler: Scheduler = None
+    rate_limit: TokenBucket = None
+    transport: TransportOptions = TransportOptions()
 
     @classmethod
-    def _route(cls, product: str, *args) -> str:
+    def _route(cls, product: str, *args, base_url: str = None) -> str:
         remainder = '/'+'/'.join(args)
-        return f'{cls.base_url}{product}{remainder}'
+        return f'{base_url or cls.base_url}{product}{remainder}'
+
+    def _url(self, spec: Endpoint, **values) -> str:
+        # The base url of the instance, e.g. of a stand-in gateway
+        return self._route(*spec.route(values), base_url = self.base_url)
 
     @staticmethod
-    def _convert(payload: Union[List, Dict], model: type):
-        if isinstance(payload, list):
-            items = []
-            for data in payload:
-                item = model.from_dict(data)
-                items.append(item)
-            return items
-        return model.from_dict(payload)
+    def _check_timestamps(timestamps: str) -> str:
+        if timestamps is not None:
+            from ns import parsed as parsed_models
+            if timestamps not in parsed_models.PARSERS:
+                raise ValueError(f'timestamps should be one of {", ".join(parsed_models.PARSERS)}, not {timestamps}')
+        return timestamps
+
+    def _retry_delay(self, url: str, attempt: int, status: int = None, retry_after: str = None) -> float:
+        """ Seconds to wait before retrying a failed request, or None to give up """
+        delay = self.transport.retry.delay(attempt, status, retry_after)
+        if delay is not None and self.instrumentation is not None:
+            self.instrumentation.retry(endpoint(url))
+        return delay
 
+    @staticmethod
+    def _convert(payload: Union[List, Dict], model: type, compact: bool = False, lazy: bool = False,
+                 timestamps: str = None, instrumentation: Instrumentation = None):
+        # The variants are built on first use, not on import
+        if compact:
+            from ns import compact as compact_models
+            model = compact_models.MODELS[model]
+        if lazy:
+            from ns import lazy as lazy_models
+            model = lazy_models.MODELS.get(model, model)
+        if timestamps:
+            from ns import parsed as parsed_models
+            model = parsed_models.MODELS[timestamps].get(model, model)
+        if instrumentation is not None:
+            with instrumentation.measure(MODEL_ENDPOINTS.get(model.__name__, model.__name__), 'convert'):
+                return decode(payload, model)
+        return decode(payload, model)
+
+    def _decode(self, payload: Union[List, Dict], model: type):
+        """ Converts a payload into the model variant of this client """
+        return self._convert(payload, model, self.compact, self.lazy, self.timestamps, self.instrumentation)
+
+@endpoint_methods(asynchronous=False)
 class NSAPI(NSBase):
     """
     Nederlandse Spoorwegen (NS) API.
     Wrapper to query the Public-Travel-Information API.
     """
 
-    def __init__(self, key: str):
-        self.session = requests.Session()
+    def __init__(self, key: str, compact: bool = False, lazy: bool = False, timestamps: str = None,
+                 cache: ResponseCache = None, store: PersistentCache = None,
+                 instrumentation: Instrumentation = None, transport: TransportOptions = None, scheduler: Scheduler = None,
+                 rate_limit: TokenBucket = None):
+        self.transport = transport or TransportOptions()
+        self.session = self.transport.session()
+        self.scheduler = scheduler
+        self.rate_limit = rate_limit
+        self.http = RequestsTransport(self.session, self.transport.timeout, scheduler.observe if scheduler is not None else None)
+        self.compact = compact
+        self.lazy = lazy
+        self.timestamps = self._check_timestamps(timestamps)
+        self.cache = cache
+        self.store = store
+        self.instrumentation = instrumentation
         self.headers = {
             'Ocp-Apim-Subscription-Key': key,
             'Accept': 'application/json'
         }
 
     def _request(self, url: str, params: dict = None) -> object:
-        with self.session.get(url, headers=self.headers, params=params) as request:
-            request.raise_for_status()
-            return request.json()
-
-    def get_all_stations(self) -> List[Station]:
-        """ List of stations """
-        # https://gateway.apiportal.ns.nl/public-reisinformatie/api/v2/stations
-        response = self._request(self._route('reisinformatie', 'api', 'v2', 'stations'))
-        return self._convert(response['payload'], model = Station)
-
-    def get_arrivals(self, **params) -> List[Arrival]:
-        """ Arrival times for a specified station. Either the UIC code or station is required """
-        # https://gateway.apiportal.ns.nl/public-reisinformatie/api/v2/arrivals[?dateTime][&maxJourneys][&lang][&station][&uicCode][&source]
-        response = self._request(self._route('reisinformatie', 'api', 'v2', 'arrivals'), params = params)
-        return self._convert(response['payload']['arrivals'], model = Arrival)
-
-    def get_departures(self, **params) -> List[Departure]:
-        """ Departure times for a specified station. Either the UIC code or station is required """
-        # https://gateway.apiportal.ns.nl/public-reisinformatie/api/v2/departures[?dateTime][&maxJourneys][&lang][&station][&uicCode][&source]
-        response = self._request(self._route('reisinformatie', 'api', 'v2', 'departures'), params = params)
-        return self._convert(response['payload']['departures'],  model = Departure)
-
-    def get_disruption(self, id: str) -> Disruption:
-        """ Specific disruption/maintenance """
-        # https://gateway.apiportal.ns.nl/public-reisinformatie/api/v2/disruptions/{id}
-        response = self._request(self._route('reisinformatie', 'api', 'v2', 'disruptions', id))
-        return self._convert(response['payload'],  model = Disruption)
-
-    def get_disruptions(self, **params) -> List[Disruption]:
-        """ List of disruptions/maintenance. """
-        # https://gateway.apiportal.ns.nl/public-reisinformatie/api/v2/disruptions[?type][&actual][&lang]
-        response = self._request(self._route('reisinformatie', 'api', 'v2', 'disruptions'), params = params)
-        return self._convert(response['payload'], model = Disruption)
-
-    def get_station_disruptions(self, code: str) -> List[Disruption]:
-        """ Disruptions for a station, code is either a UIC code or old-skool station code """
-        # https://gateway.apiportal.ns.nl/public-reisinformatie/api/v2/disruptions/station/{code}
-        response = self._request(self._route('reisinformatie', 'v2', 'disruptions', 'station', code))
-        return self._convert(response['payload'], model = Disruption)
-
-    def get_trip(self, ctx_recon: str, **params) -> Trip:
-        """ Reconstruct a trip if possible using the given reconCtx (representation of a trip found in a travel advice) """
-        # https://gateway.apiportal.ns.nl/public-reisinformatie/api/v3/trips/trip?ctxRecon={ctxRecon}[&date][&lang][&product][&travelClass][&discount][&travelRequestType]
-        response = self._request(self._route('reisinformatie', 'api', 'v3', 'trips', 'trip'), params = {'ctxRecon': ctx_recon, **params})
-        return self._convert(response['payload'], model = Trip)
-
-    def get_trips(self, **params) -> List[Trip]:
-        """ Searches for a travel advice with the specified options between the possible backends (HARP, 9292 or PAS/AVG) """
-        # https://gateway.apiportal.ns.nl/public-reisinformatie/api/v3/trips[?originLat][&originLng][&destinationLat][&destinationLng][&viaLat][&viaLng][&viaWaitTime][&dateTime][&searchForArrival][&previousAdvices][&nextAdvices][&context][&addChangeTime][&lang][&polylines][&fromZip][&toZip][&travelMethodFrom][&travelMethodTo][&product][&travelClass][&discount][&productStationFrom][&productStationTo][&yearCard][&originTransit][&originWalk][&originBike][&originCar][&originName][&travelAssistanceTransferTime][&searchForAccessibleTrip][&destinationTransit][&destinationWalk][&destinationBike][&destinationCar][&destinationName][&accessibilityEquipment1][&accessibilityEquipment2][&excludeHighSpeedTrains][&excludeReservationRequired][&passing][&travelRequestType][&originEVACode][&destinationEVACode][&viaEVACode][&shorterChange][&fromStation][&toStation][&originUicCode][&destinationUicCode][&viaUicCode][&bikeCarriageRequired][&viaStation][&departure][&minimalChangeTime]
-        response = self._request(self._route('reisinformatie', 'api', 'v3', 'trips'), params = params)
-        return self._convert(response['trips'], model = Trip)
-
-    def get_trip_price(self, from_station: str, to_station: str,**params) -> List[PriceOption]:
-        """ Returns a list of price options for the requested trip."""
-        # https://gateway.apiportal.ns.nl/public-prijsinformatie/prices[?date][&fromStation][&toStation]
-        response = self._request(self._route('prijsinformatie', 'prices'), params = {'fromStation': from_station, 'toStation': to_station, **params})
-        return self._convert(response['priceOptions'], model = PriceOption)
-
-
+        fetch = lambda: self._fetch(url, params)
+        if self.store is not None and self.store.handles(url):
+            fetch = lambda fetch=fetch: self.store.fetch(url, params, fetch)
+        if self.cache is not None:
+            return self.cache.fetch(url, params, fetch)
+        response, _ = fetch()
+        return response
+
+    def _fetch(self, url: str, params: dict = None) -> Tuple[object, int]:
+        if self.instrumentation is not None:
+            return self._retrying(url, lambda: self.http.get_instrumented(url, self.headers, params, self.instrumentation, endpoint(url)))
+        return self._retrying(url, lambda: self.http.get(url, self.headers, params))
+
+    def _retrying(self, url: str, attempt_request: Callable[[], T]) -> T:
+        """ Makes a request, retrying it per the retry policy """
+        attempt = 0
+        while True:
+            if self.scheduler is not None:
+                self.scheduler.acquire(endpoint(url))
+            if self.rate_limit is not None:
+                self.rate_limit.acquire()
+            try:
+                return attempt_request()
+            except self.http.errors as e:
+                delay = self._retry_delay(url, attempt, *self.http.failure(e))
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                attempt += 1
+
+    def _payload(self, spec: Endpoint, params: dict = None, **values) -> object:
+        """ The raw payload of an endpoint """
+        return spec.extract(self._request(self._url(spec, **values), params = params))
+
+    def _call(self, spec: Endpoint, values: dict, params: dict) -> object:
+        return self._decode(self._payload(spec, params or None, **values), model = spec.model)
+
+    def get_arrivals_bulk(self, stations: Iterable[str], concurrency: int = 10, rate_limit: TokenBucket = None, **params) -> Iterator[BulkResult]:
+        """ Arrival times for many stations (codes or UIC codes) on a thread pool, yielded per station as they complete """
+        calls = [(station, lambda station=station: self.get_arrivals(**station_params(station), **params)) for station in stations]
+        return gather_threaded(calls, concurrency = concurrency, rate_limit = rate_limit)
+
+    def get_departures_bulk(self, stations: Iterable[str], concurrency: int = 10, rate_limit: TokenBucket = None, **params) -> Iterator[BulkResult]:
+        """ Departure times for many stations (codes or UIC codes) on a thread pool, yielded per station as they complete """
+        calls = [(station, lambda station=station: self.get_departures(**station_params(station), **params)) for station in stations]
+        return gather_threaded(calls, concurrency = concurrency, rate_limit = rate_limit)
+
+    def get_arrivals_columns(self, **params) -> Columns:
+        """ Like get_arrivals, decoded into typed columns instead of models """
+        return arrival_columns(self._payload(ARRIVALS, params))
+
+    def get_departures_columns(self, **params) -> Columns:
+        """ Like get_departures, decoded into typed columns instead of models """
+        return departure_columns(self._payload(DEPARTURES, params))
+
+    def watch_disruptions(self, interval: float = 30, watcher: DisruptionWatcher = None, **params) -> Iterator[DisruptionEvent]:
+        """ Polls disruptions every interval seconds, yielding what was added, changed or removed since the previous poll """
+        watcher = watcher or DisruptionWatcher(lambda data: self._decode(data, model = Disruption))
+        url = self._url(DISRUPTIONS)
+        while True:
+            events = []
+            try:
+                headers, response = self._retrying(url, lambda: self.http.get_conditional(url, {**self.headers, **watcher.validators}, params))
+            except self.http.errors:
+                # Out of retries, poll again after the interval
+                headers, response = None, None
+            if response is not None:
+                watcher.update_validators(headers)
+                events = watcher.update(DISRUPTIONS.extract(response))
+            yield from events
+            time.sleep(interval)
+
+    def iter_trips(self, **params) -> Iterator[Trip]:
+        """ Like get_trips, but parses the response while it is downloaded, yielding each Trip as soon as it is complete """
+        stream = ArrayStream('trips')
+        if self.scheduler is not None:
+            self.scheduler.acquire('trips')
+        if self.rate_limit is not None:
+            self.rate_limit.acquire()
+        for chunk in self.http.chunks(self._url(TRIPS), self.headers, params, self.chunk_size):
+            for trip in stream.feed(chunk):
+                yield self._decode(trip, model = Trip)
+        for trip in stream.close():
+            yield self._decode(trip, model = Trip)
+
+    def scroll_trips(self, until: Union[str, int, datetime] = None, max_pages: int = None, **params) -> Iterator[Trip]:
+        """ Pages through get_trips with the scroll context of each response, yielding every trip once,
+        up to the first trip departing after until. The next page is fetched while the current one is consumed. """
+        url = self._url(TRIPS)
+        scroll = TripScroll(params, until, max_pages)
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix='ns-scroll') as executor:
+            pending = executor.submit(self._request, url, params)
+            try:
+                while pending is not None:
+                    trips, next_params = scroll.page(pending.result())
+                    pending = executor.submit(self._request, url, next_params) if next_params is not None else None
+                    yield from self._decode(trips, model = Trip)
+            finally:
+                if pending is not None:
+                    pending.cancel()
+
+    def get_trip_stop_columns(self, **params) -> Columns:
+        """ Stops of all legs of the trips of get_trips, decoded into typed columns instead of models """
+        return stop_columns(self._payload(TRIPS, params))
+
+    def get_price_matrix(self, origins: Iterable[str], destinations: Iterable[str] = None, dates: Iterable[str] = (None,),
+                         concurrency: int = 10, rate_limit: TokenBucket = None, symmetric: bool = True,
+                         cache: PriceCache = None, **params) -> PriceMatrix:
+        """ Price options between every origin and destination (or every pair of origins) on each date, on a thread pool """
+        origins, destinations, dates, plan, options, missing = prepare(origins, destinations, dates, symmetric, cache)
+        calls = [(key, lambda key=key: self.get_trip_price(key[0], key[1], **({'date': key[2]} if key[2] else {}), **params))
+                 for key in missing]
+        errors = {}
+        for result in gather_threaded(calls, concurrency = concurrency, rate_limit = rate_limit):
+            if result.ok:
+                options[result.key] = result.result
+                if cache is not None:
+                    cache.put(result.key, result.result)
+            else:
+                errors[result.key] = result.error
+        return price_matrix(origins, destinations, dates, plan, options, errors)
+
+
+@endpoint_methods(asynchronous=True)
 class AsyncNSAPI(NSBase):
     """
     Nederlandse Spoorwegen (NS) API.
     Wrapper to query the Public-Travel-Information API.
     """
 
-    def __init__(self, key: str):
+    def __init__(self, key: str, compact: bool = False, lazy: bool = False, timestamps: str = None,
+                 cache: ResponseCache = None, store: PersistentCache = None,
+                 instrumentation: Instrumentation = None, transport: TransportOptions = None, scheduler: Scheduler = None,
+                 rate_limit: TokenBucket = None):
+        self.transport = transport or TransportOptions()
+        self.scheduler = scheduler
+        self.rate_limit = rate_limit
+        self.compact = compact
+        self.lazy = lazy
+        self.timestamps = self._check_timestamps(timestamps)
+        self.cache = cache
+        self.store = store
+        self.instrumentation = instrumentation
+        self.boards: DepartureBoards = None
+        self.trips: TripTracker = None
         self.headers = {
             'Ocp-Apim-Subscription-Key': key,
             'Accept': 'application/json'
         }
 
     async def __aenter__(self):
-        self.session = aiohttp.ClientSession()
+        self.http = self.transport.async_transport(self.instrumentation,
+                                                   self.scheduler.observe if self.scheduler is not None else None)
+        self.session = self.http.session
         return self
 
     async def __aexit__(self, *args):
-        await self.session.close()
+        await self.http.close()
 
     async def _request(self, url: str, params: dict = None) -> object:
-        async with self.session.get(url, headers=self.headers, params=params) as request:
-            response = await request.json()
-            request.raise_for_status()
-            return response
-
-    async def get_all_stations(self) -> List[Station]:
-        """ List of stations """
-        # https://gateway.apiportal.ns.nl/public-reisinformatie/api/v2/stations
-        response = await self._request(self._route('reisinformatie', 'api', 'v2', 'stations'))
-        return self._convert(response['payload'], model = Station)
-
-    async def get_arrivals(self, **params) -> List[Arrival]:
-        """ Arrival times for a specified station. Either the UIC code or station is required """
-        # https://gateway.apiportal.ns.nl/public-reisinformatie/api/v2/arrivals[?dateTime][&maxJourneys][&lang][&station][&uicCode][&source]
-        response = await self._request(self._route('reisinformatie', 'api', 'v2', 'arrivals'), params = params)
-        return self._convert(response['payload']['arrivals'], model = Arrival)
-
-    async def get_departures(self, **params) -> List[Departure]:
-        """ Departure times for a specified station. Either the UIC code or station is required """
-        # https://gateway.apiportal.ns.nl/public-reisinformatie/api/v2/departures[?dateTime][&maxJourneys][&lang][&station][&uicCode][&source]
-        response = await self._request(self._route('reisinformatie', 'api', 'v2', 'departures'), params = params)
-        return self._convert(response['payload']['departures'],  model = Departure)
-
-    async def get_disruption(self, id: str) -> Disruption:
-        """ Specific disruption/maintenance """
-        # https://gateway.apiportal.ns.nl/public-reisinformatie/api/v2/disruptions/{id}
-        response = await self._request(self._route('reisinformatie', 'api', 'v2', 'disruptions', id))
-        return self._convert(response['payload'],  model = Disruption)
-
-    async def get_disruptions(self, **params) -> List[Disruption]:
-        """ List of disruptions/maintenance. """
-        # https://gateway.apiportal.ns.nl/public-reisinformatie/api/v2/disruptions[?type][&actual][&lang]
-        response = await self._request(self._route('reisinformatie', 'api', 'v2', 'disruptions'), params = params)
-        return self._convert(response['payload'], model = Disruption)
-
-    async def get_station_disruptions(self, code: str) -> List[Disruption]:
-        """ Disruptions for a station, code is either a UIC code or old-skool station code """
-        # https://gateway.apiportal.ns.nl/public-reisinformatie/api/v2/disruptions/station/{code}
-        response = await self._request(self._route('reisinformatie', 'api', 'v2', 'disruptions', 'station', code))
-        return self._convert(response['payload'], model = Disruption)
-
-    async def get_trip(self, ctx_recon: str, **params) -> Trip:
-        """ Reconstruct a trip if possible using the given reconCtx (representation of a trip found in a travel advice) """
-        # https://gateway.apiportal.ns.nl/public-reisinformatie/api/v3/trips/trip?ctxRecon={ctxRecon}[&date][&lang][&product][&travelClass][&discount][&travelRequestType]
-        response = await self._request(self._route('reisinformatie', 'api', 'v3', 'trips', 'trip'), params = {'ctxRecon': ctx_recon, **params})
-        return self._convert(response['payload'], model = Trip)
-
-    async def get_trips(self, **params) -> List[Trip]:
-        """ Searches for a travel advice with the specified options between the possible backends (HARP, 9292 or PAS/AVG) """
-        # https://gateway.apiportal.ns.nl/public-reisinformatie/api/v3/trips[?originLat][&originLng][&destinationLat][&destinationLng][&viaLat][&viaLng][&viaWaitTime][&dateTime][&searchForArrival][&previousAdvices][&nextAdvices][&context][&addChangeTime][&lang][&polylines][&fromZip][&toZip][&travelMethodFrom][&travelMethodTo][&product][&travelClass][&discount][&productStationFrom][&productStationTo][&yearCard][&originTransit][&originWalk][&originBike][&originCar][&originName][&travelAssistanceTransferTime][&searchForAccessibleTrip][&destinationTransit][&destinationWalk][&destinationBike][&destinationCar][&destinationName][&accessibilityEquipment1][&accessibilityEquipment2][&excludeHighSpeedTrains][&excludeReservationRequired][&passing][&travelRequestType][&originEVACode][&destinationEVACode][&viaEVACode][&shorterChange][&fromStation][&toStation][&originUicCode][&destinationUicCode][&viaUicCode][&bikeCarriageRequired][&viaStation][&departure][&minimalChangeTime]
-        response = await self._request(self._route('reisinformatie', 'api', 'v3', 'trips'), params = params)
-        return self._convert(response['trips'], model = Trip)
-
-    async def get_trip_price(self, from_station: str, to_station: str,**params) -> List[PriceOption]:
-        """ Returns a list of price options for the requested trip."""
-        # https://gateway.apiportal.ns.nl/public-prijsinformatie/prices[?date][&fromStation][&toStation]
-        response = await self._request(self._route('prijsinformatie', 'prices'), params = {'fromStation': from_station, 'toStation': to_station, **params})
-        return self._convert(response['priceOptions'], model = PriceOption)
\ No newline at end of file
+        fetch = lambda: self._fetch(url, params)
+        if self.store is not None and self.store.handles(url):
+            fetch = lambda fetch=fetch: self.store.fetch_async(url, params, fetch)
+        if self.cache is not None:
+            return await self.cache.fetch_async(url, params, fetch)
+        response, _ = await fetch()
+        return response
+
+    async def _fetch(self, url: str, params: dict = None) -> Tuple[object, int]:
+        if self.instrumentation is not None:
+            return await self._retrying(url, lambda: self.http.get_instrumented(url, self.headers, params, self.instrumentation, endpoint(url)))
+        return await self._retrying(url, lambda: self.http.get(url, self.headers, params))
+
+    async def _retrying(self, url: str, attempt_request: Callable[[], Awaitable[T]]) -> T:
+        """ Makes a request, retrying it per the retry policy """
+        import asyncio
+
+        attempt = 0
+        while True:
+            if self.scheduler is not None:
+                await self.scheduler.acquire_async(endpoint(url))
+            if self.rate_limit is not None:
+                await self.rate_limit.acquire_async()
+            try:
+                return await attempt_request()
+            except self.http.errors as e:
+                delay = self._retry_delay(url, attempt, *self.http.failure(e))
+                if delay is None:
+                    raise
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def _payload(self, spec: Endpoint, params: dict = None, **values) -> object:
+        """ The raw payload of an endpoint """
+        return spec.extract(await self._request(self._url(spec, **values), params = params))
+
+    async def _call(self, spec: Endpoint, values: dict, params: dict) -> object:
+        return self._decode(await self._payload(spec, params or None, **values), model = spec.model)
+
+    def subscribe_departures(self, station: str, **params) -> AsyncIterator[BoardUpdate]:
+        """ Live updates of the departure board of a station (code or UIC code), polled once for all its subscribers """
+        if self.boards is None:
+            self.boards = DepartureBoards(self._fetch_departures, lambda data: self._decode(data, model = Departure))
+        return self.boards.subscribe(station, {**station_params(station), **params})
+
+    async def _fetch_departures(self, params: dict) -> List[dict]:
+        return await self._payload(DEPARTURES, params)
+
+    def get_arrivals_bulk(self, stations: Iterable[str], concurrency: int = 10, rate_limit: TokenBucket = None, **params) -> AsyncIterator[BulkResult]:
+        """ Arrival times for many stations (codes or UIC codes), yielded per station as they complete """
+        calls = [(station, lambda station=station: self.get_arrivals(**station_params(station), **params)) for station in stations]
+        return gather_async(calls, concurrency = concurrency, rate_limit = rate_limit)
+
+    def get_departures_bulk(self, stations: Iterable[str], concurrency: int = 10, rate_limit: TokenBucket = None, **params) -> AsyncIterator[BulkResult]:
+        """ Departure times for many stations (codes or UIC codes), yielded per station as they complete """
+        calls = [(station, lambda station=station: self.get_departures(**station_params(station), **params)) for station in stations]
+        return gather_async(calls, concurrency = concurrency, rate_limit = rate_limit)
+
+    async def get_arrivals_columns(self, **params) -> Columns:
+        """ Like get_arrivals, decoded into typed columns instead of models """
+        return arrival_columns(await self._payload(ARRIVALS, params))
+
+    async def get_departures_columns(self, **params) -> Columns:
+        """ Like get_departures, decoded into typed columns instead of models """
+        return departure_columns(await self._payload(DEPARTURES, params))
+
+    async def watch_disruptions(self, interval: float = 30, watcher: DisruptionWatcher = None, **params) -> AsyncIterator[DisruptionEvent]:
+        """ Polls disruptions every interval seconds, yielding what was added, changed or removed since the previous poll """
+        import asyncio
+
+        watcher = watcher or DisruptionWatcher(lambda data: self._decode(data, model = Disruption))
+        url = self._url(DISRUPTIONS)
+        while True:
+            events = []
+            try:
+                headers, response = await self._retrying(url, lambda: self.http.get_conditional(url, {**self.headers, **watcher.validators}, params))
+            except self.http.errors:
+                # Out of retries, poll again after the interval
+                headers, response = None, None
+            if response is not None:
+                watcher.update_validators(headers)
+                events = watcher.update(DISRUPTIONS.extract(response))
+            for event in events:
+                yield event
+            await asyncio.sleep(interval)
+
+    def follow_trip(self, ctx_recon: str, checksum: str = None, **params) -> AsyncIterator[TripUpdate]:
+        """ Updates of a trip whenever its realtime fields change, refreshed once for all followers of the same trip """
+        if self.trips is None:
+            self.trips = TripTracker(self._fetch_trip, lambda data: self._decode(data, model = Trip))
+        return self.trips.follow(ctx_recon, checksum, params)
+
+    async def _fetch_trip(self, ctx_recon: str, params: dict) -> dict:
+        return await self._payload(TRIP, {'ctxRecon': ctx_recon, **params})
+
+    async def iter_trips(self, **params) -> AsyncIterator[Trip]:
+        """ Like get_trips, but parses the response while it is downloaded, yielding each Trip as soon as it is complete """
+        stream = ArrayStream('trips')
+        if self.scheduler is not None:
+            await self.scheduler.acquire_async('trips')
+        if self.rate_limit is not None:
+            await self.rate_limit.acquire_async()
+        async for chunk in self.http.chunks(self._url(TRIPS), self.headers, params, self.chunk_size):
+            for trip in stream.feed(chunk):
+                yield self._decode(trip, model = Trip)
+        for trip in stream.close():
+            yield self._decode(trip, model = Trip)
+
+    async def scroll_trips(self, until: Union[str, int, datetime] = None, max_pages: int = None, **params) -> AsyncIterator[Trip]:
+        """ Pages through get_trips with the scroll context of each response, yielding every trip once,
+        up to the first trip departing after until. The next page is fetched while the current one is consumed. """
+        import asyncio
+
+        url = self._url(TRIPS)
+        scroll = TripScroll(params, until, max_pages)
+        pending = asyncio.ensure_future(self._request(url, params))
+        try:
+            while pending is not None:
+                trips, next_params = scroll.page(await pending)
+                pending = asyncio.ensure_future(self._request(url, next_params)) if next_params is not None else None
+                for trip in self._decode(trips, model = Trip):
+                    yield trip
+        finally:
+            if pending is not None:
+                pending.cancel()
+
+    async def get_trip_stop_columns(self, **params) -> Columns:
+        """ Stops of all legs of the trips of get_trips, decoded into typed columns instead of models """
+        return stop_columns(await self._payload(TRIPS, params))
+
+    async def get_price_matrix(self, origins: Iterable[str], destinations: Iterable[str] = None, dates: Iterable[str] = (None,),
+                         concurrency: int = 10, rate_limit: TokenBucket = None, symmetric: bool = True,
+                         cache: PriceCache = None, **params) -> PriceMatrix:
+        """ Price options between every origin and destination (or every pair of origins) on each date, concurrently """
+        origins, destinations, dates, plan, options, missing = prepare(origins, destinations, dates, symmetric, cache)
+        calls = [(key, lambda key=key: self.get_trip_price(key[0], key[1], **({'date': key[2]} if key[2] else {}), **params))
+                 for key in missing]
+        errors = {}
+        async for result in gather_async(calls, concurrency = concurrency, rate_limit = rate_limit):
+            if result.ok:
+                options[result.key] = result.result
+                if cache is not None:
+                    cache.put(result.key, result.result)
+            else:
+                errors[result.key] = result.error
+        return price_matrix(origins, destinations, dates, plan, options, errors)
@@ -0,0 +1,307 @@
+"""
+Compact binary serialization of the models, for passing them between services.
+
+``to_json`` repeats every field name on every object. Here fields are written
+by position in the order of the model, and every distinct string is written
+once in a string table and referred to by index after that, so the many
+repeated station names, tracks and categories cost a byte or two each.
+
+    data = binary.dumps(departures)
+    departures = binary.loads(data, models.Departure)
+
+A message starts with ``NSB``, the format version, a flags byte and a
+fingerprint of the field layout of the model, checked on load. Values are a
+tag byte followed by a zigzag varint (integers, string indices, lengths), an
+8 byte double, or the fields of a nested model. Regular, compact, lazy and
+parsed variants of a model share their layout, so data written from one can
+be loaded into another. Timestamps are converted into the form the loading
+variant holds them in (ISO string, datetime or epoch seconds); parsed ones are
+kept in whole seconds, as the parsed variants decode them.
+"""
+
+import dataclasses
+import struct
+import zlib
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union, get_type_hints
+
+from ns.decoder import _list_item, _unwrap_optional
+from ns.timestamps import to_datetime, to_epoch
+
+MAGIC = b'NSB'
+FORMAT_VERSION = 1
+_LIST = 1  # flag: the message holds a list of objects
+
+_NONE, _FALSE, _TRUE, _INT, _FLOAT, _STR, _OBJECT, _LIST_VALUE, _DICT, _DATETIME = range(10)
+_DOUBLE = struct.Struct('<d')
+_PREFIX = struct.Struct('<3sBBI')  # magic, version, flags, fingerprint
+
+_LAYOUTS: Dict[type, Tuple[Tuple[str, ...], Tuple[Optional[type], ...]]] = {}
+_FINGERPRINTS: Dict[type, int] = {}
+_TIME_FIELDS: Dict[type, Tuple[Tuple[int, Callable], ...]] = {}
+_PARSERS: Dict[type, Optional[Callable]] = {}
+_TIMEZONES: Dict[int, timezone] = {}
+
+
+class SerializationError(ValueError):
+    """ Data that is not a message of this format, or not of the expected model """
+
+
+def _nested_model(tp) -> Optional[type]:
+    """ The model a field holds, directly or as the items of a list """
+    tp, _ = _unwrap_optional(tp)
+    item = _list_item(tp)
+    if item is not None:
+        tp, _ = _unwrap_optional(item)
+    return tp if dataclasses.is_dataclass(tp) else None
+
+
+def layout(model: type) -> Tuple[Tuple[str, ...], Tuple[Optional[type], ...]]:
+    """ Names of the fields of a model in serialization order, and the model each of them holds, if any """
+    try:
+        return _LAYOUTS[model]
+    except KeyError:
+        hints = get_type_hints(model)
+        fields = [f for f in dataclasses.fields(model) if f.init]
+        result = _LAYOUTS[model] = (tuple(f.name for f in fields), tuple(_nested_model(hints[f.name]) for f in fields))
+        return result
+
+
+def fingerprint(model: type) -> int:
+    """ Checksum of the field layout of a model and the models nested in it """
+    try:
+        return _FINGERPRINTS[model]
+    except KeyError:
+        names, nested = layout(model)
+        description = repr([(name, fingerprint(sub) if sub is not None else None) for name, sub in zip(names, nested)])
+        result = _FINGERPRINTS[model] = zlib.crc32(f'{model.__name__}{description}'.encode())
+        return result
+
+
+def time_fields(model: type) -> Tuple[Tuple[int, Callable], ...]:
+    """ Positions of the timestamps a (parsed) model parses, with their parser """
+    try:
+        return _TIME_FIELDS[model]
+    except KeyError:
+        parsers = getattr(model, '__parse__', {})
+        result = _TIME_FIELDS[model] = tuple((i, parsers[name]) for i, name in enumerate(layout(model)[0])
+                                             if name in parsers)
+        return result
+
+
+def _parser(model: type) -> Optional[Callable]:
+    """ Parser of the timestamps of a model and the models nested in it, None if they are kept as strings """
+    try:
+        return _PARSERS[model]
+    except KeyError:
+        _PARSERS[model] = None
+        parser = next((parser for _, parser in time_fields(model)), None)
+        for sub in layout(model)[1]:
+            if parser is None and sub is not None:
+                parser = _parser(sub)
+        _PARSERS[model] = parser
+        return parser
+
+
+class _Writer():
+    __slots__ = ('body', 'strings')
+
+    def __init__(self):
+        self.body = bytearray()
+        self.strings: Dict[str, int] = {}
+
+    def varint(self, value: int):
+        if not -2 ** 63 <= value < 2 ** 63:
+            raise SerializationError(f'Integer {value} does not fit in 64 bits')
+        value = (value << 1) ^ (value >> 63)
+        body = self.body
+        while value > 0x7f:
+            body.append((value & 0x7f) | 0x80)
+            value >>= 7
+        body.append(value)
+
+    def value(self, value: Any):
+        body = self.body
+        kind = type(value)
+        if value is None:
+            body.append(_NONE)
+        elif kind is bool:
+            body.append(_TRUE if value else _FALSE)
+        elif kind is str:
+            body.append(_STR)
+            index = self.strings.get(value)
+            if index is None:
+                index = self.strings[value] = len(self.strings)
+            self.varint(index)
+        elif kind is int:
+            body.append(_INT)
+            self.varint(value)
+        elif kind is float:
+            body.append(_FLOAT)
+            body += _DOUBLE.pack(value)
+        elif kind is list or kind is tuple:
+            body.append(_LIST_VALUE)
+            self.varint(len(value))
+            for item in value:
+                self.value(item)
+        elif kind is dict:
+            body.append(_DICT)
+            self.varint(len(value))
+            for key, item in value.items():
+                self.value(key)
+                self.value(item)
+        elif isinstance(value, datetime):
+            body.append(_DATETIME)
+            offset = value.utcoffset()
+            self.varint(int(value.timestamp()))
+            self.varint(int(offset.total_seconds()) if offset is not None else 0)
+        elif dataclasses.is_dataclass(value):
+            body.append(_OBJECT)
+            self.object(value)
+        elif isinstance(value, int):
+            body.append(_INT)
+            self.varint(int(value))
+        else:
+            raise SerializationError(f'Cannot serialize {kind.__name__}')
+
+    def object(self, obj: Any):
+        model = type(obj)
+        fields = time_fields(model)
+        if not fields or fields[0][1] is not to_epoch:
+            for name in layout(model)[0]:
+                self.value(getattr(obj, name))
+            return
+        # Epoch seconds are written as timestamps, so other variants load them as such
+        values = [getattr(obj, name) for name in layout(model)[0]]
+        for i, _ in fields:
+            if type(values[i]) is int:
+                values[i] = datetime.fromtimestamp(values[i], timezone.utc)
+        for value in values:
+            self.value(value)
+
+
+class _Reader():
+    __slots__ = ('data', 'pos', 'strings', 'parser')
+
+    def __init__(self, data: bytes, pos: int, parser: Optional[Callable] = None):
+        self.data = data
+        self.pos = pos
+        self.strings: List[str] = []
+        self.parser = parser  # Of the timestamps of the models loaded into
+
+    def varint(self) -> int:
+        data, pos = self.data, self.pos
+        result = shift = 0
+        while True:
+            byte = data[pos]
+            pos += 1
+            result |= (byte & 0x7f) << shift
+            if byte < 0x80:
+                break
+            shift += 7
+        self.pos = pos
+        return (result >> 1) ^ -(result & 1)
+
+    def value(self, model: Optional[type] = None) -> Any:
+        tag = self.data[self.pos]
+        self.pos += 1
+        if tag == _STR:
+            return self.strings[self.varint()]
+        if tag == _NONE:
+            return None
+        if tag == _INT:
+            return self.varint()
+        if tag == _TRUE:
+            return True
+        if tag == _FALSE:
+            return False
+        if tag == _OBJECT:
+            if model is None:
+                raise SerializationError('Object found where the model has none')
+            return self.object(model)
+        if tag == _LIST_VALUE:
+            return [self.value(model) for _ in range(self.varint())]
+        if tag == _DICT:
+            result = {}
+            for _ in range(self.varint()):
+                key = self.value()
+                result[key] = self.value()
+            return result
+        if tag == _FLOAT:
+            value, = _DOUBLE.unpack_from(self.data, self.pos)
+            self.pos += 8
+            return value
+        if tag == _DATETIME:
+            seconds, offset = self.varint(), self.varint()
+            if self.parser is to_epoch:
+                return seconds
+            tz = _TIMEZONES.get(offset)
+            if tz is None:
+                tz = _TIMEZONES[offset] = timezone(timedelta(seconds=offset))
+            value = datetime.fromtimestamp(seconds, tz)
+            # In the format of the API for the models keeping raw strings
+            return value if self.parser is not None else value.strftime('%Y-%m-%dT%H:%M:%S%z')
+        raise SerializationError(f'Unknown tag {tag} at {self.pos - 1}')
+
+    def object(self, model: type) -> Any:
+        _, nested = layout(model)
+        value = self.value
+        fields = time_fields(model)
+        if not fields:
+            return model(*[value(sub) for sub in nested])
+        values = [value(sub) for sub in nested]
+        for i, parser in fields:
+            # Strings written from the models keeping raw strings, or epoch seconds written before they were tagged
+            if type(values[i]) is str:
+                values[i] = parser(values[i]) if values[i] else None
+            elif type(values[i]) is int and parser is to_datetime:
+                values[i] = datetime.fromtimestamp(values[i], timezone.utc)
+        return model(*values)
+
+
+def dumps(obj: Union[Any, Sequence[Any]], model: type = None) -> bytes:
+    """ Serializes a model instance or a list of instances of one model (required for an empty list) """
+    many = isinstance(obj, (list, tuple))
+    if model is None:
+        if many and not obj:
+            raise SerializationError('The model of an empty list is required')
+        model = type(obj[0]) if many else type(obj)
+    writer = _Writer()
+    if many:
+        writer.varint(len(obj))
+        for item in obj:
+            writer.object(item)
+    else:
+        writer.object(obj)
+
+    table = _Writer()
+    table.varint(len(writer.strings))
+    for string in writer.strings:
+        encoded = string.encode('utf-8')
+        table.varint(len(encoded))
+        table.body += encoded
+    return _PREFIX.pack(MAGIC, FORMAT_VERSION, _LIST if many else 0, fingerprint(model)) + table.body + writer.body
+
+
+def loads(data: bytes, model: type) -> Union[Any, List[Any]]:
+    """ Deserializes into instances of a model (or any of its compact, lazy or parsed variants) """
+    if len(data) < _PREFIX.size:
+        raise SerializationError('Truncated message')
+    magic, version, flags, checksum = _PREFIX.unpack_from(data, 0)
+    if magic != MAGIC or version != FORMAT_VERSION:
+        raise SerializationError('Not a message of this format or version')
+    if checksum != fingerprint(model):
+        raise SerializationError(f'Message does not hold {model.__name__} objects of this layout')
+
+    reader = _Reader(data, _PREFIX.size, _parser(model))
+    try:
+        strings = reader.strings
+        for _ in range(reader.varint()):
+            length = reader.varint()
+            strings.append(data[reader.pos:reader.pos + length].decode('utf-8'))
+            reader.pos += length
+        if flags & _LIST:
+            return [reader.object(model) for _ in range(reader.varint())]
+        return reader.object(model)
+    except (IndexError, UnicodeDecodeError, struct.error) as e:
+        raise SerializationError('Truncated or corrupt message') from e
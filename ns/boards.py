@@ -0,0 +1,161 @@
+"""
+Live departure board subscriptions for AsyncNSAPI.
+
+Every station is polled once, however many subscribers it has. Polls come
+faster as the next departure gets closer, and every poll is diffed against the
+previous one: only rows whose actual time, actual track, cancellation or
+messages changed are decoded and pushed, the same update object going to all
+subscribers.
+
+    async with AsyncNSAPI('yourkey') as ns:
+        async for update in ns.subscribe_departures('UT'):
+            for departure in update.changed:
+                print(departure.direction, departure.actual_datetime, departure.actual_track)
+"""
+
+import time
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Awaitable, Callable, Dict, Hashable, List, Optional, Set, Tuple
+
+from ns.decoder import decode
+from ns.models import Departure
+from ns.timestamps import to_epoch
+
+
+@dataclass
+class BoardUpdate:
+    station: str
+    changed: List[Departure] = field(default_factory=list)  # New rows, and rows with changed realtime fields
+    removed: List[Departure] = field(default_factory=list)  # Rows no longer on the board, e.g. departed
+    board: List[Departure] = field(default_factory=list)  # All rows, in board order
+    error: Optional[Exception] = None  # Set, without changes, when polling failed
+
+
+def row_key(data: dict) -> Hashable:
+    """ Identity of a raw departure on a board """
+    return data.get('name'), data.get('plannedDateTime')
+
+
+def row_version(data: dict) -> Hashable:
+    """ The realtime fields of a raw departure that subscribers are notified of """
+    messages = tuple((m.get('message'), m.get('style')) for m in data.get('messages') or ())
+    return data.get('actualDateTime'), data.get('actualTrack'), data.get('cancelled'), messages
+
+
+class BoardDiff():
+    """ Snapshot of a departure board, diffed against every new list of raw departures """
+
+    def __init__(self, convert: Callable[[dict], Departure] = None):
+        self.convert = convert or (lambda data: decode(data, Departure))
+        self.snapshot: Dict[Hashable, Tuple[Hashable, Departure]] = {}
+
+    def update(self, payload: List[dict]) -> Tuple[List[Departure], List[Departure], List[Departure]]:
+        """ Replaces the snapshot, returning the changed, removed and all rows """
+        changed, board = [], []
+        snapshot = {}
+        for data in payload:
+            key, current = row_key(data), row_version(data)
+            previous = self.snapshot.get(key)
+            if previous is not None and previous[0] == current:
+                snapshot[key] = previous
+            else:
+                snapshot[key] = (current, self.convert(data))
+                changed.append(snapshot[key][1])
+            board.append(snapshot[key][1])
+        removed = [departure for key, (_, departure) in self.snapshot.items() if key not in snapshot]
+        self.snapshot = snapshot
+        return changed, removed, board
+
+
+def next_departure(payload: List[dict], now: float) -> Optional[float]:
+    """ Seconds until the first departure on a raw board that has not left yet """
+    upcoming = [to_epoch(data.get('actualDateTime') or data['plannedDateTime']) - now
+                for data in payload if data.get('actualDateTime') or data.get('plannedDateTime')]
+    upcoming = [seconds for seconds in upcoming if seconds >= 0]
+    return min(upcoming) if upcoming else None
+
+
+class _Board():
+    __slots__ = ('station', 'params', 'diff', 'subscribers', 'rows', 'task')
+
+    def __init__(self, station: str, params: dict, diff: BoardDiff):
+        self.station = station
+        self.params = params
+        self.diff = diff
+        self.subscribers: Set['asyncio.Queue'] = set()
+        self.rows: Optional[List[Departure]] = None  # None until the first poll
+        self.task: Optional['asyncio.Task'] = None
+
+
+class DepartureBoards():
+    """ Shared, adaptive polling of departure boards, fanned out to subscribers """
+
+    def __init__(self, fetch: Callable[[dict], Awaitable[List[dict]]], convert: Callable[[dict], Departure] = None,
+                 min_interval: float = 10, max_interval: float = 120, lead: float = 0.25,
+                 clock: Callable[[], float] = time.time):
+        """ fetch(params) returns the raw departures of a board. The poll interval is `lead` times the time
+        until the next departure, between min_interval and max_interval seconds. """
+        self.fetch = fetch
+        self.convert = convert
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.lead = lead
+        self.clock = clock
+        self.polls = 0
+        self.boards: Dict[Hashable, _Board] = {}
+
+    def __len__(self) -> int:
+        return len(self.boards)
+
+    def interval(self, payload: List[dict]) -> float:
+        """ Seconds until the next poll of a board """
+        seconds = next_departure(payload, self.clock())
+        if seconds is None:
+            return self.max_interval
+        return min(self.max_interval, max(self.min_interval, seconds * self.lead))
+
+    async def subscribe(self, station: str, params: dict = None) -> AsyncIterator[BoardUpdate]:
+        """ Updates of the board of a station fetched with params, starting with all of its rows.
+        The board stops being polled once its last subscriber is closed or cancelled. """
+        import asyncio
+
+        params = params or {}
+        key = (station, tuple(sorted(params.items())))
+        board = self.boards.get(key)
+        if board is None:
+            board = self.boards[key] = _Board(station, params, BoardDiff(self.convert))
+        queue: asyncio.Queue = asyncio.Queue()
+        board.subscribers.add(queue)
+        if board.rows is not None:
+            queue.put_nowait(BoardUpdate(station, changed=list(board.rows), board=board.rows))
+        if board.task is None:
+            board.task = asyncio.get_running_loop().create_task(self._poll(board))
+        try:
+            while True:
+                yield await queue.get()
+        finally:
+            board.subscribers.discard(queue)
+            if not board.subscribers:
+                board.task.cancel()
+                if self.boards.get(key) is board:
+                    del self.boards[key]
+
+    async def _poll(self, board: _Board):
+        import asyncio
+
+        while True:
+            try:
+                payload = await self.fetch(board.params)
+            except Exception as e:
+                update = BoardUpdate(board.station, board=board.rows or [], error=e)
+                interval = self.min_interval
+            else:
+                self.polls += 1
+                first = board.rows is None
+                changed, removed, board.rows = board.diff.update(payload)
+                update = BoardUpdate(board.station, changed, removed, board.rows) if first or changed or removed else None
+                interval = self.interval(payload)
+            if update is not None:
+                for queue in board.subscribers:
+                    queue.put_nowait(update)
+            await asyncio.sleep(interval)
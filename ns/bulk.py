@@ -0,0 +1,74 @@
+"""
+Fan out many requests with a concurrency cap and an optional rate limit,
+yielding a result or error per request as they complete.
+"""
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Awaitable, Callable, Hashable, Iterable, Iterator, Optional, Tuple
+
+from ns.ratelimit import TokenBucket
+
+
+@dataclass
+class BulkResult:
+    key: Hashable
+    result: Any = None
+    error: Optional[Exception] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def station_params(station: str) -> dict:
+    """ Query parameters selecting a station by UIC code or station code """
+    return {'uicCode': station} if station.isdigit() else {'station': station}
+
+
+async def gather_async(calls: Iterable[Tuple[Hashable, Callable[[], Awaitable]]], concurrency: int = 10,
+                       rate_limit: TokenBucket = None) -> AsyncIterator[BulkResult]:
+    """ Runs coroutine functions, at most `concurrency` at a time, yielding results as they complete """
+    import asyncio
+
+    semaphore = asyncio.Semaphore(concurrency)
+    done: asyncio.Queue = asyncio.Queue()
+
+    async def run(key, call):
+        async with semaphore:
+            if rate_limit is not None:
+                await rate_limit.acquire_async()
+            try:
+                done.put_nowait(BulkResult(key, result=await call()))
+            except Exception as e:
+                done.put_nowait(BulkResult(key, error=e))
+
+    tasks = [asyncio.ensure_future(run(key, call)) for key, call in calls]
+    try:
+        for _ in tasks:
+            yield await done.get()
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+def gather_threaded(calls: Iterable[Tuple[Hashable, Callable[[], Any]]], concurrency: int = 10,
+                    rate_limit: TokenBucket = None) -> Iterator[BulkResult]:
+    """ Runs functions on a thread pool of `concurrency` threads, yielding results as they complete """
+
+    def run(key, call):
+        if rate_limit is not None:
+            rate_limit.acquire()
+        try:
+            return BulkResult(key, result=call())
+        except Exception as e:
+            return BulkResult(key, error=e)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [executor.submit(run, key, call) for key, call in calls]
+        try:
+            for future in as_completed(futures):
+                yield future.result()
+        finally:
+            for future in futures:
+                future.cancel()
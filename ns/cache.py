@@ -0,0 +1,189 @@
+"""
+Response cache shared by NSAPI and AsyncNSAPI.
+
+Parsed responses are cached per route and normalised query parameters, with a
+time to live per endpoint and least-recently-used eviction once the total size
+of the cached response bodies exceeds ``max_size`` bytes. Concurrent misses for
+the same key are coalesced, so only one of them goes upstream.
+
+    cache = ResponseCache(ttls={'departures': 10})
+    ns = NSAPI('yourkey', cache=cache)
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+from urllib.parse import urlsplit
+
+# Time to live in seconds, per endpoint
+DEFAULT_TTLS = {
+    'stations': 6 * 60 * 60,
+    'prices': 60 * 60,
+    'disruptions': 60,
+    'trips': 30,
+    'departures': 15,
+    'arrivals': 15,
+}
+
+_MISSING = object()
+
+
+def _retrieve(task: 'asyncio.Task'):
+    """ Marks the exception of a request as retrieved, so it is not logged when all of its callers were cancelled """
+    if not task.cancelled():
+        task.exception()
+
+
+class ResponseCache():
+    """ TTL + LRU cache of parsed API responses """
+
+    def __init__(self, ttls: Dict[str, float] = None, default_ttl: float = 0, max_size: int = 32 * 1024 * 1024,
+                 clock: Callable[[], float] = time.monotonic):
+        self.ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        self.default_ttl = default_ttl
+        self.max_size = max_size
+        self.clock = clock
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self._entries: 'OrderedDict[Hashable, Tuple[float, int, Any]]' = OrderedDict()
+        self._pending: Dict[Hashable, Future] = {}
+        self._pending_async: Dict[Hashable, 'asyncio.Task'] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def ttl(self, url: str) -> float:
+        """ Time to live of responses of the endpoint a url belongs to """
+        for segment in urlsplit(url).path.split('/'):
+            if segment in self.ttls:
+                return self.ttls[segment]
+        return self.default_ttl
+
+    @staticmethod
+    def key(url: str, params: Optional[dict] = None) -> Hashable:
+        """ Cache key of a request, ignoring parameter order and unset parameters """
+        if not params:
+            return url, ()
+        return url, tuple(sorted((k, str(v)) for k, v in params.items() if v is not None))
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            value = self._lookup(key)
+        return default if value is _MISSING else value
+
+    def put(self, key: Hashable, value: Any, size: int, ttl: float):
+        """ Stores a response, evicting the least recently used ones when over max_size """
+        with self._lock:
+            self._remove(key)
+            if ttl <= 0 or size > self.max_size:
+                return
+            self._entries[key] = (self.clock() + ttl, size, value)
+            self.size += size
+            while self.size > self.max_size:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'coalesced': self.coalesced,
+            'evictions': self.evictions,
+            'entries': len(self._entries),
+            'size': self.size,
+        }
+
+    def fetch(self, url: str, params: Optional[dict], request: Callable[[], Tuple[Any, int]]) -> Any:
+        """ Returns the cached response, or calls request() returning (response, body size) on a miss """
+        ttl = self.ttl(url)
+        if ttl <= 0:
+            return request()[0]
+        key = self.key(url, params)
+
+        with self._lock:
+            value = self._lookup(key)
+            if value is not _MISSING:
+                self.hits += 1
+                return value
+            pending = self._pending.get(key)
+            leader = pending is None
+            if not leader:
+                self.coalesced += 1
+            else:
+                self.misses += 1
+                pending = self._pending[key] = Future()
+        if not leader:
+            return pending.result()
+
+        try:
+            value, size = request()
+            self.put(key, value, size, ttl)
+            pending.set_result(value)
+            return value
+        except BaseException as e:
+            pending.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._pending[key]
+
+    async def fetch_async(self, url: str, params: Optional[dict], request: Callable[[], Awaitable[Tuple[Any, int]]]) -> Any:
+        """ Like fetch, for a coroutine function request """
+        import asyncio
+
+        ttl = self.ttl(url)
+        if ttl <= 0:
+            return (await request())[0]
+        key = self.key(url, params)
+
+        with self._lock:
+            value = self._lookup(key)
+            if value is not _MISSING:
+                self.hits += 1
+                return value
+            pending = self._pending_async.get(key)
+            if pending is not None:
+                self.coalesced += 1
+            else:
+                self.misses += 1
+                # The request runs in a task of its own, so that cancelling the caller that started it
+                # does not cancel it for the callers waiting on the same key
+                pending = self._pending_async[key] = asyncio.ensure_future(self._fill_async(key, request, ttl))
+                pending.add_done_callback(_retrieve)
+        return await asyncio.shield(pending)
+
+    async def _fill_async(self, key: Hashable, request: Callable[[], Awaitable[Tuple[Any, int]]], ttl: float) -> Any:
+        try:
+            value, size = await request()
+            self.put(key, value, size, ttl)
+            return value
+        finally:
+            with self._lock:
+                del self._pending_async[key]
+
+    def _lookup(self, key: Hashable) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            return _MISSING
+        expires, _, value = entry
+        if expires <= self.clock():
+            self._remove(key)
+            return _MISSING
+        self._entries.move_to_end(key)
+        return value
+
+    def _remove(self, key: Hashable):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= entry[1]
@@ -0,0 +1,202 @@
+"""
+Columnar decoding of departures, arrivals and leg stops, for analytics.
+
+Raw payloads are turned straight into typed ``array`` columns without building
+a model per item. Timestamps become int64 seconds since the epoch, delays stay
+integers, and low-cardinality strings (tracks, categories, stations) are
+dictionary encoded. Missing values are ``MISSING`` (which NumPy reads as NaT in
+datetime64 columns) or -1 for dictionary codes.
+
+    columns = ns.get_departures_columns(station='UT')
+    arrays = columns.to_numpy()
+    delays = arrays['actual_datetime'] - arrays['planned_datetime']
+"""
+
+from array import array
+from typing import Any, Dict, Iterable, List, Sequence, Tuple, Union
+
+from ns.timestamps import to_epoch
+
+MISSING = -2 ** 63
+
+TIME, INT, FLOAT, BOOL, CATEGORY = 'time', 'int', 'float', 'bool', 'category'
+
+# (column, kind, key or path of keys in the raw payload)
+Spec = Sequence[Tuple[str, str, Union[str, Tuple[str, ...]]]]
+
+DEPARTURE_COLUMNS: Spec = (
+    ('planned_datetime', TIME, 'plannedDateTime'),
+    ('actual_datetime', TIME, 'actualDateTime'),
+    ('planned_track', CATEGORY, 'plannedTrack'),
+    ('actual_track', CATEGORY, 'actualTrack'),
+    ('train_category', CATEGORY, 'trainCategory'),
+    ('direction', CATEGORY, 'direction'),
+    ('operator', CATEGORY, ('product', 'operatorCode')),
+    ('number', CATEGORY, ('product', 'number')),
+    ('cancelled', BOOL, 'cancelled'),
+)
+
+ARRIVAL_COLUMNS: Spec = (
+    ('planned_datetime', TIME, 'plannedDateTime'),
+    ('actual_datetime', TIME, 'actualDateTime'),
+    ('planned_track', CATEGORY, 'plannedTrack'),
+    ('actual_track', CATEGORY, 'actualTrack'),
+    ('train_category', CATEGORY, 'trainCategory'),
+    ('origin', CATEGORY, 'origin'),
+    ('operator', CATEGORY, ('product', 'operatorCode')),
+    ('number', CATEGORY, ('product', 'number')),
+    ('cancelled', BOOL, 'cancelled'),
+)
+
+STOP_COLUMNS: Spec = (
+    ('index', INT, 'routeIdx'),
+    ('uic_code', CATEGORY, 'uicCode'),
+    ('name', CATEGORY, 'name'),
+    ('planned_departure_datetime', TIME, 'plannedDepartureDateTime'),
+    ('planned_arrival_datetime', TIME, 'plannedArrivalDateTime'),
+    ('actual_arrival_datetime', TIME, 'actualArrivalDateTime'),
+    ('departure_delay', INT, 'departureDelayInSeconds'),
+    ('arrival_delay', INT, 'arrivalDelayInSeconds'),
+    ('planned_departure_track', CATEGORY, 'plannedDepartureTrack'),
+    ('planned_arrival_track', CATEGORY, 'plannedArrivalTrack'),
+    ('actual_arrival_track', CATEGORY, 'actualArrivalTrack'),
+    ('cancelled', BOOL, 'cancelled'),
+)
+
+
+class Columns():
+    """ Equally long typed columns, with the dictionaries of the category columns """
+
+    def __init__(self, columns: Dict[str, array], dictionaries: Dict[str, List[str]] = None):
+        self.columns = columns
+        self.dictionaries = dictionaries or {}
+
+    def __len__(self) -> int:
+        return len(next(iter(self.columns.values()))) if self.columns else 0
+
+    def __getitem__(self, name: str) -> array:
+        return self.columns[name]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.columns
+
+    def __iter__(self):
+        return iter(self.columns)
+
+    def values(self, name: str) -> List[Any]:
+        """ Column with categories decoded back to strings and missing values as None """
+        column = self.columns[name]
+        if name in self.dictionaries:
+            dictionary = self.dictionaries[name]
+            return [dictionary[code] if code >= 0 else None for code in column]
+        if column.typecode == 'q':
+            return [None if value == MISSING else value for value in column]
+        return list(column)
+
+    def to_numpy(self) -> Dict[str, Any]:
+        """ NumPy arrays sharing the column buffers, timestamps as datetime64[s] """
+        import numpy
+
+        arrays = {}
+        for name, column in self.columns.items():
+            values = numpy.frombuffer(column, dtype=numpy.dtype(column.typecode)) if len(column) else \
+                numpy.array([], dtype=numpy.dtype(column.typecode))
+            if name.endswith('_datetime'):
+                values = values.view('datetime64[s]')
+            elif column.typecode == 'b':
+                values = values.view(numpy.bool_)
+            arrays[name] = values
+        return arrays
+
+    @classmethod
+    def concat(cls, parts: Iterable['Columns']) -> 'Columns':
+        """ Appends columns of the same spec, merging their dictionaries """
+        parts = list(parts)
+        if not parts:
+            return cls({})
+        columns = {name: array(column.typecode) for name, column in parts[0].columns.items()}
+        dictionaries = {name: _Dictionary() for name in parts[0].dictionaries}
+        for part in parts:
+            for name, column in part.columns.items():
+                if name in dictionaries:
+                    codes = [dictionaries[name].code(value) for value in part.dictionaries[name]]
+                    columns[name].extend(array(column.typecode, (codes[code] if code >= 0 else -1 for code in column)))
+                else:
+                    columns[name].extend(column)
+        return cls(columns, {name: dictionary.values for name, dictionary in dictionaries.items()})
+
+
+class _Dictionary():
+    __slots__ = ('codes', 'values')
+
+    def __init__(self):
+        self.codes: Dict[str, int] = {}
+        self.values: List[str] = []
+
+    def code(self, value) -> int:
+        if value is None:
+            return -1
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+
+def _getter(key: Union[str, Tuple[str, ...]]):
+    if isinstance(key, str):
+        return lambda item: item.get(key)
+
+    def get(item):
+        for part in key:
+            item = item.get(part) if item is not None else None
+        return item
+    return get
+
+
+def decode_columns(items: Iterable[dict], spec: Spec, extra: Dict[str, Iterable[int]] = None) -> Columns:
+    """ Decodes raw payload items into columns per spec, plus already integer extra columns """
+    items = items if isinstance(items, list) else list(items)
+    columns = {}
+    dictionaries = {}
+    for name, kind, key in spec:
+        get = _getter(key)
+        values = [get(item) for item in items]
+        if kind == TIME:
+            column = array('q', [to_epoch(value) if value else MISSING for value in values])
+        elif kind == INT:
+            column = array('q', [int(value) if value is not None else MISSING for value in values])
+        elif kind == FLOAT:
+            column = array('d', [float(value) if value is not None else float('nan') for value in values])
+        elif kind == BOOL:
+            column = array('b', [bool(value) for value in values])
+        elif kind == CATEGORY:
+            dictionary = _Dictionary()
+            column = array('i', [dictionary.code(value) for value in values])
+            dictionaries[name] = dictionary.values
+        else:
+            raise ValueError(f'Unknown column kind {kind}')
+        columns[name] = column
+    for name, values in (extra or {}).items():
+        columns[name] = array('q', values)
+    return Columns(columns, dictionaries)
+
+
+def departure_columns(payload: List[dict]) -> Columns:
+    return decode_columns(payload, DEPARTURE_COLUMNS)
+
+
+def arrival_columns(payload: List[dict]) -> Columns:
+    return decode_columns(payload, ARRIVAL_COLUMNS)
+
+
+def stop_columns(trips: List[dict]) -> Columns:
+    """ Stops of all legs of raw trips, with the trip and leg they belong to """
+    stops, trip_index, leg_index = [], [], []
+    for i, trip in enumerate(trips):
+        for j, leg in enumerate(trip.get('legs') or ()):
+            for stop in leg.get('stops') or ():
+                stops.append(stop)
+                trip_index.append(i)
+                leg_index.append(j)
+    return decode_columns(stops, STOP_COLUMNS, extra={'trip': trip_index, 'leg': leg_index})
@@ -0,0 +1,72 @@
+"""
+Memory-compact variants of the models in ns.models.
+
+Every model is mirrored here under the same name and with the same attributes,
+but with ``__slots__`` instead of a per-instance ``__dict__``. Low-cardinality
+strings (tracks, categories, operators, statuses) are interned by the decoder,
+so a day of departures for every station shares a single copy of each.
+
+    from ns import compact
+    compact.Departure  # slotted counterpart of ns.models.Departure
+"""
+
+import dataclasses
+from typing import Dict, Iterable
+
+from ns import models
+from ns.decoder import mentions, replace_models
+
+_TRACKS = ('planned_track', 'actual_track')
+_OFFSETS = ('planned_timezone_offset', 'actual_timezone_offset')
+
+# Fields interned on decode, per model
+INTERNED: Dict[str, Iterable[str]] = {
+    'Product': ('category_code', 'short_category_name', 'long_category_name', 'operator_code', 'operator_name',
+                'product_type', 'display_name'),
+    'Message': ('style',),
+    'Arrival': ('origin', 'train_category', *_TRACKS, *_OFFSETS),
+    'Departure': ('direction', 'train_category', 'departure_status', *_TRACKS, *_OFFSETS),
+    'Note': ('key', 'note_type'),
+    'TripOriginDestination': ('name', 'country_code', 'uic_code', 'type', 'prognosis_type', 'checkin_status',
+                              'city', 'exit_side', 'latest_known_track', *_TRACKS),
+    'LegStop': ('prognosis_type', 'name', 'uic_code', 'country_code', 'planned_departure_track',
+                'planned_arrival_track', 'actual_arrival_track'),
+    'Leg': ('travel_type',),
+}
+
+
+def _slotted(model: type, mapping: dict) -> type:
+    """ Rebuilds a dataclass with __slots__, pointing nested models to their compact variant """
+    bases = tuple(mapping.get(base, base) for base in model.__bases__)
+    inherited = {f.name for base in bases if dataclasses.is_dataclass(base) for f in dataclasses.fields(base)}
+    names = tuple(f.name for f in dataclasses.fields(model) if f.name not in inherited)
+
+    namespace = dict(model.__dict__)
+    for name in names + ('__dict__', '__weakref__'):
+        namespace.pop(name, None)
+    namespace['__slots__'] = names
+    namespace['__module__'] = __name__
+    namespace['__annotations__'] = {name: replace_models(tp, mapping)
+                                    for name, tp in model.__dict__.get('__annotations__', {}).items()}
+    namespace['__intern__'] = frozenset(INTERNED.get(model.__name__, ()))
+    return type(model)(model.__name__, bases, namespace)
+
+
+def _build() -> Dict[type, type]:
+    mapping = {}
+    pending = [model for model in vars(models).values()
+               if isinstance(model, type) and dataclasses.is_dataclass(model) and model.__module__ == models.__name__]
+    # Dependencies first, so annotations and bases can refer to compact classes
+    while pending:
+        for model in list(pending):
+            hints = model.__dict__.get('__annotations__', {}).values()
+            dependencies = [m for m in pending if m is not model and (m in model.__bases__ or any(mentions(tp, m) for tp in hints))]
+            if not dependencies:
+                mapping[model] = _slotted(model, mapping)
+                pending.remove(model)
+    return mapping
+
+
+MODELS = _build()
+globals().update({model.__name__: compact for model, compact in MODELS.items()})
+__all__ = [model.__name__ for model in MODELS]
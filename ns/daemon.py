@@ -0,0 +1,215 @@
+"""
+Network-wide polling of realtime data, sharded over worker processes.
+
+The station list is split over a number of processes, each running an
+AsyncNSAPI event loop that polls departures and arrivals of its stations every
+``interval`` seconds; the first worker also polls disruptions. Parsing and
+decoding happen in the workers, so throughput grows with the number of cores,
+while a SharedTokenBucket keeps all workers together under one request rate.
+
+Workers append what they decoded to a sink file, one frame per response in
+the format of ns.binary, for downstream consumers to read while it grows:
+
+    ns-poll yourkey --sink realtime.nsb --workers 8 --rate 20 --interval 60
+
+    for record in read_sink('realtime.nsb'):
+        print(record.kind, record.station, len(record.items))
+
+A frame is a header (frame length, kind, polled at in epoch seconds, station
+length), the station code and a binary.dumps message. Every frame is written
+with a single append to a file opened with O_APPEND, so frames of concurrent
+workers do not interleave. Readers continue from the ``end`` of the last
+record they read, reading only what was appended since.
+"""
+
+import argparse
+import asyncio
+import os
+import struct
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from ns import binary
+from ns.bulk import gather_async, station_params
+from ns.models import Arrival, Departure, Disruption
+from ns.ratelimit import SharedTokenBucket
+from ns.transport import TransportOptions
+
+KINDS = ('departures', 'arrivals', 'disruptions')
+MODELS = {'departures': Departure, 'arrivals': Arrival, 'disruptions': Disruption}
+
+# frame length (after this header), kind, polled at, station length
+_FRAME = struct.Struct('<IBdH')
+
+
+@dataclass
+class DaemonOptions:
+    key: str
+    sink: str
+    workers: int = field(default_factory=lambda: os.cpu_count() or 1)
+    rate: float = 10.0  # Requests per second of all workers together
+    interval: float = 60.0  # Seconds between the starts of two polls of a station
+    concurrency: int = 20  # Requests in flight per worker
+    kinds: Tuple[str, ...] = KINDS
+    rounds: Optional[int] = None  # Polls per station before stopping, None to poll until stopped
+    stations: Optional[List[str]] = None  # Station codes, all stations if None
+    base_url: Optional[str] = None  # Gateway to use instead of the NS API, e.g. a StandInGateway
+
+
+@dataclass
+class SinkRecord:
+    kind: str
+    station: Optional[str]  # None for disruptions
+    polled: float
+    items: list
+    end: int  # Offset of the next frame, to continue reading from
+
+
+class FileSink():
+    """ Appends decoded responses to a file, safe to share between processes """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+
+    def write(self, kind: str, station: Optional[str], items: list, polled: float = None):
+        station = (station or '').encode('utf-8')
+        message = binary.dumps(items, MODELS[kind])
+        header = _FRAME.pack(len(station) + len(message), KINDS.index(kind), time.time() if polled is None else polled,
+                             len(station))
+        frame = memoryview(header + station + message)
+        # Regular files only take less than a whole write when the disk is full or on a signal. Appending the rest
+        # right away keeps the frame whole, unless another worker appends in between, which the reader cannot undo.
+        while frame:
+            written = os.write(self._fd, frame)
+            if not written:
+                raise OSError(f'Could not write to {self.path}')
+            frame = frame[written:]
+
+    def close(self):
+        os.close(self._fd)
+
+
+def read_sink(path: str, models: Dict[str, type] = None, offset: int = 0) -> Iterator[SinkRecord]:
+    """ Records of a sink file from offset on, stopping at the end or at a frame still being written.
+    models maps kinds to the (e.g. compact) models to load into. """
+    models = {**MODELS, **(models or {})}
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        data = f.read()
+    position = 0
+    while position + _FRAME.size <= len(data):
+        length, kind, polled, station_length = _FRAME.unpack_from(data, position)
+        start = position + _FRAME.size
+        if start + length > len(data):
+            break
+        station = data[start:start + station_length].decode('utf-8') or None
+        kind = KINDS[kind]
+        position = start + length
+        yield SinkRecord(kind, station, polled, binary.loads(data[start + station_length:position], models[kind]),
+                         offset + position)
+
+
+def shard(stations: Sequence[str], workers: int) -> List[List[str]]:
+    """ Splits stations over workers round robin, so busy and quiet stations spread evenly """
+    return [list(stations[i::workers]) for i in range(min(workers, len(stations)) or 1)]
+
+
+def all_stations(options: DaemonOptions) -> List[str]:
+    from ns.api import NSAPI
+
+    ns = NSAPI(options.key)
+    if options.base_url:
+        ns.base_url = options.base_url
+    return [station.code for station in ns.get_all_stations()]
+
+
+async def poll(index: int, stations: List[str], options: DaemonOptions, bucket: SharedTokenBucket, stop=None):
+    """ Polls a shard of stations until the rounds are done or stop (an Event) is set """
+    from ns.api import AsyncNSAPI
+
+    sink = FileSink(options.sink)
+    kinds = [kind for kind in options.kinds if kind != 'disruptions']
+    transport = TransportOptions(pool_maxsize=options.concurrency)
+    rounds = 0
+    try:
+        # Every attempt, retries included, takes a token of the bucket shared by all workers
+        async with AsyncNSAPI(options.key, transport=transport, rate_limit=bucket) as ns:
+            if options.base_url:
+                ns.base_url = options.base_url
+            getters = {'departures': ns.get_departures, 'arrivals': ns.get_arrivals}
+            while (options.rounds is None or rounds < options.rounds) and not (stop is not None and stop.is_set()):
+                started = time.monotonic()
+                calls = [((kind, station), lambda kind=kind, station=station: getters[kind](**station_params(station)))
+                         for station in stations for kind in kinds]
+                if index == 0 and 'disruptions' in options.kinds:
+                    calls.append((('disruptions', None), ns.get_disruptions))
+                async for result in gather_async(calls, concurrency=options.concurrency):
+                    # Failed polls are skipped, the next round polls the station again
+                    if result.ok:
+                        sink.write(*result.key, result.result)
+                rounds += 1
+                if options.rounds is None or rounds < options.rounds:
+                    await asyncio.sleep(max(0.0, options.interval - (time.monotonic() - started)))
+    finally:
+        sink.close()
+
+
+def _worker(index: int, stations: List[str], options: DaemonOptions, bucket: SharedTokenBucket, stop):
+    try:
+        asyncio.run(poll(index, stations, options, bucket, stop))
+    except KeyboardInterrupt:
+        pass
+
+
+def run(options: DaemonOptions, context=None):
+    """ Starts a worker process per shard of the stations and waits for them to finish """
+    import multiprocessing
+
+    context = context or multiprocessing.get_context()
+    stations = options.stations or all_stations(options)
+    bucket = SharedTokenBucket(options.rate, context=context)
+    stop = context.Event()
+    processes = [context.Process(target=_worker, args=(i, part, options, bucket, stop), name=f'ns-poll-{i}')
+                 for i, part in enumerate(shard(stations, options.workers))]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        stop.set()
+        for process in processes:
+            process.join()
+    failed = [process.name for process in processes if process.exitcode]
+    if failed:
+        raise RuntimeError(f'Workers failed: {", ".join(failed)}')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Poll realtime data of all stations over worker processes')
+    parser.add_argument('key', nargs='?', default=os.environ.get('NS_API_KEY'), help='subscription key, or $NS_API_KEY')
+    parser.add_argument('--sink', required=True, help='file to append decoded responses to')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--rate', type=float, default=10.0, help='requests per second of all workers together')
+    parser.add_argument('--interval', type=float, default=60.0, help='seconds between polls of a station')
+    parser.add_argument('--concurrency', type=int, default=20, help='requests in flight per worker')
+    parser.add_argument('--kinds', default=','.join(KINDS), help=f'comma separated, of {", ".join(KINDS)}')
+    parser.add_argument('--rounds', type=int, help='polls per station before stopping')
+    parser.add_argument('--stations', help='comma separated station codes instead of all stations')
+    parser.add_argument('--base-url', help='gateway base url, e.g. of a stand-in gateway')
+    args = parser.parse_args(argv)
+    if not args.key:
+        parser.error('a subscription key is required')
+    kinds = tuple(kind for kind in args.kinds.split(',') if kind)
+    unknown = set(kinds) - set(KINDS)
+    if unknown:
+        parser.error(f'unknown kinds: {", ".join(sorted(unknown))}')
+
+    run(DaemonOptions(args.key, args.sink, args.workers, args.rate, args.interval, args.concurrency, kinds, args.rounds,
+                      args.stations.split(',') if args.stations else None, args.base_url))
+
+
+if __name__ == '__main__':
+    main()
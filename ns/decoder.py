@@ -0,0 +1,157 @@
+"""
+Fast-path decoding of API payloads into the models in ns.models.
+
+dataclasses_json re-inspects field metadata and type hints on every
+``from_dict`` call. Here a specialised decode function is generated once per
+model, with the field name mapping (``plannedDateTime`` -> ``planned_datetime``)
+and the conversion of nested models baked in. String fields listed in a model's
+``__intern__`` are passed through ``sys.intern``, fields mapped to a function in
+its ``__parse__`` are converted by it (see ns.parsed), and lists of models listed
+in its ``__lazy__`` are left undecoded, wrapped in ``Deferred`` (see ns.lazy).
+"""
+
+import dataclasses
+import sys
+from typing import Any, Callable, Dict, List, Union, get_type_hints
+
+_DECODERS: Dict[type, Callable[[dict], Any]] = {}
+_SCALARS = (int, float, str, bool)
+_NoneType = type(None)
+
+
+class Deferred():
+    """ Raw payloads of a list of models, to be decoded on first access """
+    __slots__ = ('items',)
+
+    def __init__(self, items: list):
+        self.items = items
+
+
+def _unwrap_optional(tp) -> tuple:
+    """ Returns (inner type, optional) for Optional[X] """
+    if getattr(tp, '__origin__', None) is Union:
+        args = [arg for arg in tp.__args__ if arg is not _NoneType]
+        if len(args) == 1:
+            return args[0], True
+    return tp, False
+
+
+def _list_item(tp):
+    """ Returns the item type of List[X], or None """
+    if getattr(tp, '__origin__', None) in (list, List) and getattr(tp, '__args__', None):
+        return tp.__args__[0]
+    return None
+
+
+def replace_models(tp, mapping: Dict[type, type]):
+    """ Replaces models inside a (generic) type hint, e.g. Optional[List[Message]] """
+    if tp in mapping:
+        return mapping[tp]
+    args = getattr(tp, '__args__', None)
+    if args and hasattr(tp, 'copy_with'):
+        return tp.copy_with(tuple(replace_models(arg, mapping) for arg in args))
+    return tp
+
+
+def mentions(tp, model: type) -> bool:
+    """ Whether a (generic) type hint refers to a model """
+    return tp is model or any(mentions(arg, model) for arg in getattr(tp, '__args__', None) or ())
+
+
+def field_keys(model: type) -> Dict[str, str]:
+    """ Maps field names of a model to the key used in the payload.
+    Fields shadowed by the override of another field are left out, like dataclasses_json does. """
+    overrides = {}
+    for f in dataclasses.fields(model):
+        letter_case = f.metadata.get('dataclasses_json', {}).get('letter_case')
+        if letter_case is not None:
+            overrides[f.name] = letter_case(f.name)
+    decode_names = {key: name for name, key in overrides.items()}
+
+    keys = {}
+    for f in dataclasses.fields(model):
+        key = overrides.get(f.name, f.name)
+        if decode_names.get(key, key) == f.name:
+            keys[f.name] = key
+    return keys
+
+
+def _compile(model: type) -> Callable[[dict], Any]:
+    hints = get_type_hints(model)
+    keys = field_keys(model)
+    interned = getattr(model, '__intern__', ())
+    deferred = getattr(model, '__lazy__', ())
+    parsers = getattr(model, '__parse__', {})
+    namespace = {'cls': model, 'MISSING': dataclasses.MISSING, 'intern': sys.intern, 'Deferred': Deferred}
+    lines = ['def decode(data):', '    get = data.get']
+    args = []
+
+    for i, f in enumerate(dataclasses.fields(model)):
+        if not f.init:
+            continue
+        var = f'v{i}'
+        args.append(f'{f.name}={var}')
+        key = keys.get(f.name)
+        has_default = f.default is not dataclasses.MISSING
+        has_factory = f.default_factory is not dataclasses.MISSING
+
+        if has_default:
+            namespace[f'd{i}'] = f.default
+        if has_factory:
+            namespace[f'd{i}'] = f.default_factory
+
+        if key is None:
+            # Shadowed field, never read from the payload
+            lines.append(f'    {var} = d{i}()' if has_factory else f'    {var} = d{i}')
+            continue
+        if has_default:
+            lines.append(f'    {var} = get({key!r}, d{i})')
+        elif has_factory:
+            lines.append(f'    {var} = get({key!r}, MISSING)')
+            lines.append(f'    if {var} is MISSING: {var} = d{i}()')
+        else:
+            lines.append(f'    {var} = data[{key!r}]')
+
+        tp, _ = _unwrap_optional(hints[f.name])
+        item = _list_item(tp)
+        if f.name in parsers:
+            namespace[f'p{i}'] = parsers[f.name]
+            lines.append(f'    if {var}: {var} = p{i}({var})')
+            lines.append(f'    else: {var} = None')
+        elif dataclasses.is_dataclass(tp):
+            namespace[f'c{i}'] = decoder_for(tp)
+            lines.append(f'    if {var} is not None: {var} = c{i}({var})')
+        elif item is not None and f.name in deferred:
+            lines.append(f'    if {var} is not None: {var} = Deferred({var})')
+        elif item is not None and dataclasses.is_dataclass(_unwrap_optional(item)[0]):
+            namespace[f'c{i}'] = decoder_for(_unwrap_optional(item)[0])
+            lines.append(f'    if {var} is not None: {var} = [c{i}(x) for x in {var}]')
+        elif tp in _SCALARS:
+            namespace[f't{i}'] = tp
+            lines.append(f'    if {var} is not None and not isinstance({var}, t{i}): {var} = t{i}({var})')
+            if tp is str and f.name in interned:
+                lines.append(f'    if {var} is not None: {var} = intern({var})')
+        # Anything else (Any, Dict[str, str], List[str], ...) is passed through as parsed
+
+    lines.append(f'    return cls({", ".join(args)})')
+    exec('\n'.join(lines), namespace)
+    decode = namespace['decode']
+    decode.__qualname__ = f'decode_{model.__name__}'
+    return decode
+
+
+def decoder_for(model: type) -> Callable[[dict], Any]:
+    """ Returns the compiled decoder of a model, compiling it (and its nested models) on first use """
+    try:
+        return _DECODERS[model]
+    except KeyError:
+        decode = _DECODERS[model] = _compile(model)
+        return decode
+
+
+def decode(payload: Union[List, Dict], model: type):
+    """ Decodes a single payload or a list of payloads into model instances """
+    convert = decoder_for(model)
+    if isinstance(payload, list):
+        return [convert(data) for data in payload]
+    return convert(payload)
@@ -0,0 +1,86 @@
+"""
+Change detection for polled disruptions.
+
+A DisruptionWatcher keeps the last snapshot of disruptions keyed by id, and
+turns every new list of raw disruptions into added, changed and removed
+events. Entries whose version did not change are not decoded again.
+
+    for event in ns.watch_disruptions(interval=30):
+        print(event.kind, event.disruption.title)
+"""
+
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Hashable, List, Tuple
+
+from ns.decoder import decode
+from ns.models import Disruption
+
+ADDED = 'added'
+CHANGED = 'changed'
+REMOVED = 'removed'
+
+
+@dataclass
+class DisruptionEvent:
+    kind: str
+    disruption: Disruption
+
+
+def version(data: dict) -> Hashable:
+    """ Version of a raw disruption: its version, sequence number and last update, or the payload itself """
+    details = data.get('verstoring') or {}
+    report = data.get('melding') or {}
+    key = (details.get('versie'), details.get('volgnummer'), report.get('laatstGewijzigd'))
+    if any(part is not None for part in key):
+        return key
+    return data
+
+
+class DisruptionWatcher():
+    """ Snapshot of disruptions by id, diffed against every new list of raw disruptions """
+
+    def __init__(self, convert: Callable[[dict], Disruption] = None):
+        self.convert = convert or (lambda data: decode(data, Disruption))
+        self.snapshot: Dict[str, Tuple[Any, Disruption]] = {}
+        self.validators: Dict[str, str] = {}
+
+    def __len__(self) -> int:
+        return len(self.snapshot)
+
+    @property
+    def disruptions(self) -> List[Disruption]:
+        return [disruption for _, disruption in self.snapshot.values()]
+
+    def update(self, payload: List[dict]) -> List[DisruptionEvent]:
+        """ Replaces the snapshot, returning what was added, changed and removed """
+        events = []
+        snapshot = {}
+        for data in payload:
+            id = data['id']
+            current = version(data)
+            previous = self.snapshot.get(id)
+            if previous is not None and previous[0] == current:
+                snapshot[id] = previous
+                continue
+            disruption = self.convert(data)
+            snapshot[id] = (current, disruption)
+            events.append(DisruptionEvent(ADDED if previous is None else CHANGED, disruption))
+
+        for id, (_, disruption) in self.snapshot.items():
+            if id not in snapshot:
+                events.append(DisruptionEvent(REMOVED, disruption))
+        self.snapshot = snapshot
+        return events
+
+    def update_validators(self, headers) -> Dict[str, str]:
+        """ Remembers the ETag and Last-Modified of a response, returning the conditional request headers """
+        if headers.get('ETag'):
+            self.validators['If-None-Match'] = headers['ETag']
+        if headers.get('Last-Modified'):
+            self.validators['If-Modified-Since'] = headers['Last-Modified']
+        return self.validators
+
+    def reset(self):
+        """ Forgets the snapshot, so everything is reported as added again """
+        self.snapshot = {}
+        self.validators = {}
@@ -0,0 +1,133 @@
+"""
+Declarative specs of the endpoints of the API, shared by both clients.
+
+An Endpoint holds everything about a call except the I/O: its route, where the
+payload sits in the response, the model it is decoded into and how the
+arguments of the client method map onto the route and query. NSAPI and
+AsyncNSAPI get their method for every endpoint from the same spec, so routes
+and payload paths cannot drift apart between them, and anything added to the
+request path of the clients applies to all endpoints of both.
+
+    DEPARTURES.route({})  # ('reisinformatie', 'api', 'v2', 'departures')
+    DEPARTURES.extract(response)  # response['payload']['departures']
+"""
+
+import inspect
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Tuple
+
+from ns.models import Arrival, Departure, Disruption, PriceOption, Station, Trip
+
+
+@dataclass(frozen=True)
+class Endpoint:
+    name: str  # Name of the client method
+    product: str
+    path: Tuple[str, ...]  # Segments after the product, '{argument}' ones filled in from the method arguments
+    payload: Tuple[str, ...]  # Keys leading to the payload in the response
+    model: type
+    doc: str
+    many: bool = True  # Whether the payload is a list of models
+    arguments: Tuple[str, ...] = ()  # Positional arguments of the method
+    query: Tuple[Tuple[str, str], ...] = ()  # Arguments sent as query parameters, (argument, parameter)
+    params: bool = True  # Whether the method takes any other query parameters
+
+    def bind(self, args: tuple, params: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """ Splits the arguments of a call into the values of the path and the query parameters """
+        if len(args) > len(self.arguments):
+            raise TypeError(f'{self.name}() takes {len(self.arguments)} positional arguments but {len(args)} were given')
+        values = dict(zip(self.arguments, args))
+        for name in self.arguments[len(args):]:
+            if name not in params:
+                raise TypeError(f'{self.name}() missing required argument: {name!r}')
+            values[name] = params.pop(name)
+        if params and not self.params:
+            raise TypeError(f'{self.name}() got unexpected keyword arguments: {", ".join(params)}')
+        query = {parameter: values.pop(name) for name, parameter in self.query}
+        return values, {**query, **params}
+
+    def route(self, values: Dict[str, Any]) -> Tuple[str, ...]:
+        """ Product and path segments of a call """
+        return (self.product,) + tuple(str(values[segment[1:-1]]) if segment.startswith('{') else segment
+                                       for segment in self.path)
+
+    def extract(self, response: Any) -> Any:
+        """ The payload of a response """
+        for key in self.payload:
+            response = response[key]
+        return response
+
+    def signature(self) -> inspect.Signature:
+        parameters = [inspect.Parameter('self', inspect.Parameter.POSITIONAL_OR_KEYWORD)]
+        parameters += [inspect.Parameter(name, inspect.Parameter.POSITIONAL_OR_KEYWORD, annotation=str) for name in self.arguments]
+        if self.params:
+            parameters.append(inspect.Parameter('params', inspect.Parameter.VAR_KEYWORD))
+        return inspect.Signature(parameters, return_annotation=List[self.model] if self.many else self.model)
+
+
+# https://gateway.apiportal.ns.nl/public-reisinformatie/api/v2/stations
+STATIONS = Endpoint('get_all_stations', 'reisinformatie', ('api', 'v2', 'stations'), ('payload',), Station,
+                    'List of stations', params=False)
+
+# https://gateway.apiportal.ns.nl/public-reisinformatie/api/v2/arrivals[?dateTime][&maxJourneys][&lang][&station][&uicCode][&source]
+ARRIVALS = Endpoint('get_arrivals', 'reisinformatie', ('api', 'v2', 'arrivals'), ('payload', 'arrivals'), Arrival,
+                    'Arrival times for a specified station. Either the UIC code or station is required')
+
+# https://gateway.apiportal.ns.nl/public-reisinformatie/api/v2/departures[?dateTime][&maxJourneys][&lang][&station][&uicCode][&source]
+DEPARTURES = Endpoint('get_departures', 'reisinformatie', ('api', 'v2', 'departures'), ('payload', 'departures'), Departure,
+                      'Departure times for a specified station. Either the UIC code or station is required')
+
+# https://gateway.apiportal.ns.nl/public-reisinformatie/api/v2/disruptions/{id}
+DISRUPTION = Endpoint('get_disruption', 'reisinformatie', ('api', 'v2', 'disruptions', '{id}'), ('payload',), Disruption,
+                      'Specific disruption/maintenance', many=False, arguments=('id',), params=False)
+
+# https://gateway.apiportal.ns.nl/public-reisinformatie/api/v2/disruptions[?type][&actual][&lang]
+DISRUPTIONS = Endpoint('get_disruptions', 'reisinformatie', ('api', 'v2', 'disruptions'), ('payload',), Disruption,
+                       'List of disruptions/maintenance.')
+
+# https://gateway.apiportal.ns.nl/public-reisinformatie/api/v2/disruptions/station/{code}
+STATION_DISRUPTIONS = Endpoint('get_station_disruptions', 'reisinformatie', ('api', 'v2', 'disruptions', 'station', '{code}'),
+                               ('payload',), Disruption,
+                               'Disruptions for a station, code is either a UIC code or old-skool station code',
+                               arguments=('code',), params=False)
+
+# https://gateway.apiportal.ns.nl/public-reisinformatie/api/v3/trips/trip?ctxRecon={ctxRecon}[&date][&lang][&product][&travelClass][&discount][&travelRequestType]
+TRIP = Endpoint('get_trip', 'reisinformatie', ('api', 'v3', 'trips', 'trip'), ('payload',), Trip,
+                'Reconstruct a trip if possible using the given reconCtx (representation of a trip found in a travel advice)',
+                many=False, arguments=('ctx_recon',), query=(('ctx_recon', 'ctxRecon'),))
+
+# https://gateway.apiportal.ns.nl/public-reisinformatie/api/v3/trips[?originLat][&originLng][&destinationLat][&destinationLng][&viaLat][&viaLng][&viaWaitTime][&dateTime][&searchForArrival][&previousAdvices][&nextAdvices][&context][&addChangeTime][&lang][&polylines][&fromZip][&toZip][&travelMethodFrom][&travelMethodTo][&product][&travelClass][&discount][&productStationFrom][&productStationTo][&yearCard][&originTransit][&originWalk][&originBike][&originCar][&originName][&travelAssistanceTransferTime][&searchForAccessibleTrip][&destinationTransit][&destinationWalk][&destinationBike][&destinationCar][&destinationName][&accessibilityEquipment1][&accessibilityEquipment2][&excludeHighSpeedTrains][&excludeReservationRequired][&passing][&travelRequestType][&originEVACode][&destinationEVACode][&viaEVACode][&shorterChange][&fromStation][&toStation][&originUicCode][&destinationUicCode][&viaUicCode][&bikeCarriageRequired][&viaStation][&departure][&minimalChangeTime]
+TRIPS = Endpoint('get_trips', 'reisinformatie', ('api', 'v3', 'trips'), ('trips',), Trip,
+                 'Searches for a travel advice with the specified options between the possible backends (HARP, 9292 or PAS/AVG)')
+
+# https://gateway.apiportal.ns.nl/public-prijsinformatie/prices[?date][&fromStation][&toStation]
+PRICES = Endpoint('get_trip_price', 'prijsinformatie', ('prices',), ('priceOptions',), PriceOption,
+                  'Returns a list of price options for the requested trip.', arguments=('from_station', 'to_station'),
+                  query=(('from_station', 'fromStation'), ('to_station', 'toStation')))
+
+ENDPOINTS = (STATIONS, ARRIVALS, DEPARTURES, DISRUPTION, DISRUPTIONS, STATION_DISRUPTIONS, TRIP, TRIPS, PRICES)
+
+
+def client_method(endpoint: Endpoint, asynchronous: bool) -> Callable:
+    """ Method calling an endpoint through self._call, awaiting it on an asynchronous client """
+    if asynchronous:
+        async def method(self, *args, **params):
+            return await self._call(endpoint, *endpoint.bind(args, params))
+    else:
+        def method(self, *args, **params):
+            return self._call(endpoint, *endpoint.bind(args, params))
+    method.__name__ = endpoint.name
+    method.__doc__ = endpoint.doc
+    method.__signature__ = endpoint.signature()
+    return method
+
+
+def endpoint_methods(asynchronous: bool) -> Callable[[type], type]:
+    """ Class decorator adding the method of every endpoint to a client """
+    def decorate(cls: type) -> type:
+        for endpoint in ENDPOINTS:
+            method = client_method(endpoint, asynchronous)
+            method.__qualname__ = f'{cls.__qualname__}.{endpoint.name}'
+            setattr(cls, endpoint.name, method)
+        return cls
+    return decorate
@@ -0,0 +1,271 @@
+"""
+Connection graph between stations, for answering "can I get from A to B and
+roughly how long does it take" locally instead of with a get_trips call.
+
+Stations are connected by the stops of trip legs, timed by the planned times
+between consecutive stops, and by the route stations of departures, timed by
+distance until a leg times them. Edges are kept in adjacency arrays with the
+typical (mean planned) travel time per edge; shortest paths are found with A*,
+using the distance to the destination at the highest speed in the graph as the
+heuristic. Use get_trips when realtime advice with transfers is needed.
+
+    graph = ConnectionGraph(StationIndex(ns.get_all_stations()))
+    graph.add_trips(ns.get_trips(fromStation='UT', toStation='ASD'))
+    graph.add_departures('UT', ns.get_departures(station='UT'))
+    route = graph.shortest_path('UT', 'ASD')
+    route.stations, route.duration / 60
+    graph.reachable('UT', within=30 * 60)  # {uic code: seconds}
+"""
+
+import heapq
+import math
+import pickle
+from array import array
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from ns.models import Departure, Leg, Trip
+from ns.stations import StationIndex, distance
+from ns.timestamps import optional_epoch
+
+
+@dataclass
+class Route:
+    stations: List[str]  # UIC codes, origin first
+    duration: float  # Seconds
+    estimated: bool = False  # Whether any edge is timed by distance only
+
+
+class ConnectionGraph():
+    """ Directed graph of UIC codes, with the typical travel time of every connection """
+
+    def __init__(self, stations: StationIndex = None, speed: float = 80.0, default_time: float = 900.0):
+        self.stations = stations
+        self.speed = speed  # km/h of edges timed by distance
+        self.default_time = default_time  # Seconds of edges between stations without coordinates
+        self.codes: List[str] = []
+        self._ids: Dict[str, int] = {}
+        self._latitude = array('d')
+        self._longitude = array('d')
+        # Per edge, in the order they were added
+        self._sources = array('i')
+        self._targets = array('i')
+        self._total = array('d')  # Sum of the observed travel times
+        self._count = array('I')  # Number of observed travel times, 0 if timed by distance
+        self._weight = array('d')
+        self._edges: Dict[Tuple[int, int], int] = {}
+        # Compressed adjacency: the edges leaving node n are _adjacent[_offsets[n]:_offsets[n + 1]]
+        self._offsets = array('i', [0])
+        self._adjacent = array('i')
+        self._max_speed = 0.0  # km/s, highest over all edges with coordinates at both ends
+        self._dirty = False
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def __contains__(self, identifier: str) -> bool:
+        return self._resolve(identifier) in self._ids
+
+    @property
+    def edge_count(self) -> int:
+        return len(self._sources)
+
+    def add_connection(self, origin: str, destination: str, seconds: float = None):
+        """ Connects two stations, with an observed travel time if known """
+        source, target = self._node(origin), self._node(destination)
+        if source == target:
+            return
+        edge = self._edges.get((source, target))
+        if edge is None:
+            edge = self._edges[source, target] = len(self._sources)
+            self._sources.append(source)
+            self._targets.append(target)
+            self._total.append(0.0)
+            self._count.append(0)
+            self._weight.append(0.0)
+            self._dirty = True
+        if seconds is not None and seconds > 0:
+            self._total[edge] += seconds
+            self._count[edge] += 1
+            self._weight[edge] = self._total[edge] / self._count[edge]
+            self._update_speed(edge)
+        elif not self._count[edge]:
+            self._dirty = True
+
+    def add_leg(self, leg: Leg):
+        """ Connects the consecutive stops of a leg, timed by their planned times """
+        previous, departs = None, None
+        for stop in leg.stops or ():
+            if stop.passing or not stop.uic_code:
+                continue
+            self._locate(stop.uic_code, stop.latitude, stop.longitude)
+            if previous is not None:
+                arrives = optional_epoch(stop.planned_arrival_datetime)
+                self.add_connection(previous, stop.uic_code,
+                                    arrives - departs if arrives is not None and departs is not None else None)
+            previous, departs = stop.uic_code, optional_epoch(stop.planned_departure_datetime)
+
+    def add_trips(self, trips: Iterable[Trip]):
+        for trip in trips:
+            for leg in trip.legs or ():
+                self.add_leg(leg)
+
+    def add_departures(self, station: str, departures: Iterable[Departure]):
+        """ Connects a station along the route stations of its departures """
+        for departure in departures:
+            previous = station
+            for route_station in departure.route_stations or ():
+                code = route_station.get('uicCode')
+                if code:
+                    self.add_connection(previous, code)
+                    previous = code
+
+    def neighbours(self, identifier: str) -> Dict[str, float]:
+        """ Stations directly reachable from a station, with their travel time in seconds """
+        self._compile()
+        node = self._ids.get(self._resolve(identifier))
+        if node is None:
+            return {}
+        return {self.codes[self._targets[edge]]: self._weight[edge]
+                for edge in self._adjacent[self._offsets[node]:self._offsets[node + 1]]}
+
+    def shortest_path(self, origin: str, destination: str) -> Optional[Route]:
+        """ Fastest route between two stations by typical travel times, None if not connected """
+        self._compile()
+        source, goal = self._ids.get(self._resolve(origin)), self._ids.get(self._resolve(destination))
+        if source is None or goal is None:
+            return None
+        heuristic = self._heuristic(goal)
+        offsets, adjacent, targets, weight = self._offsets, self._adjacent, self._targets, self._weight
+        times = {source: 0.0}
+        via: Dict[int, int] = {}  # node: edge it is reached by
+        queue = [(heuristic(source), 0.0, source)]
+        while queue:
+            _, time, node = heapq.heappop(queue)
+            if node == goal:
+                return self._route(goal, time, via)
+            if time > times[node]:
+                continue
+            for edge in adjacent[offsets[node]:offsets[node + 1]]:
+                target = targets[edge]
+                arrival = time + weight[edge]
+                if arrival < times.get(target, math.inf):
+                    times[target] = arrival
+                    via[target] = edge
+                    heapq.heappush(queue, (arrival + heuristic(target), arrival, target))
+        return None
+
+    def reachable(self, origin: str, within: float = None) -> Dict[str, float]:
+        """ Travel time in seconds to every station reachable from origin, optionally within a number of seconds """
+        self._compile()
+        source = self._ids.get(self._resolve(origin))
+        if source is None:
+            return {}
+        within = math.inf if within is None else within
+        offsets, adjacent, targets, weight = self._offsets, self._adjacent, self._targets, self._weight
+        times = {source: 0.0}
+        queue = [(0.0, source)]
+        while queue:
+            time, node = heapq.heappop(queue)
+            if time > times[node]:
+                continue
+            for edge in adjacent[offsets[node]:offsets[node + 1]]:
+                target = targets[edge]
+                arrival = time + weight[edge]
+                if arrival <= within and arrival < times.get(target, math.inf):
+                    times[target] = arrival
+                    heapq.heappush(queue, (arrival, target))
+        return {self.codes[node]: time for node, time in times.items()}
+
+    def save(self, path: str):
+        with open(path, 'wb') as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, path: str) -> 'ConnectionGraph':
+        with open(path, 'rb') as f:
+            graph = pickle.load(f)
+        if not isinstance(graph, cls):
+            raise TypeError(f'{path} does not contain a {cls.__name__}')
+        return graph
+
+    def _resolve(self, identifier: str) -> str:
+        """ UIC code of a station identifier, as far as the station index knows it """
+        if self.stations is not None and identifier not in self._ids:
+            station = self.stations.get(identifier)
+            if station is not None and station.uic_code:
+                return station.uic_code
+        return identifier
+
+    def _node(self, identifier: str) -> int:
+        code = self._resolve(identifier)
+        node = self._ids.get(code)
+        if node is None:
+            node = self._ids[code] = len(self.codes)
+            self.codes.append(code)
+            station = self.stations.get(code) if self.stations is not None else None
+            self._latitude.append(station.latitude if station is not None and station.latitude is not None else math.nan)
+            self._longitude.append(station.longitude if station is not None and station.longitude is not None else math.nan)
+        return node
+
+    def _locate(self, identifier: str, latitude: Optional[float], longitude: Optional[float]):
+        """ Sets the coordinates of a station the station index does not have """
+        node = self._node(identifier)
+        if math.isnan(self._latitude[node]) and latitude is not None and longitude is not None:
+            self._latitude[node], self._longitude[node] = latitude, longitude
+            self._dirty = True
+
+    def _distance(self, source: int, target: int) -> float:
+        """ km between two nodes, nan if either has no coordinates """
+        if math.isnan(self._latitude[source]) or math.isnan(self._latitude[target]):
+            return math.nan
+        return distance(self._latitude[source], self._longitude[source], self._latitude[target], self._longitude[target])
+
+    def _update_speed(self, edge: int):
+        km = self._distance(self._sources[edge], self._targets[edge])
+        if not math.isnan(km):
+            self._max_speed = max(self._max_speed, km / self._weight[edge])
+
+    def _compile(self):
+        """ Times the edges not observed yet by distance, and rebuilds the adjacency arrays after edges were added """
+        if not self._dirty:
+            return
+        for edge in range(len(self._sources)):
+            if not self._count[edge]:
+                km = self._distance(self._sources[edge], self._targets[edge])
+                self._weight[edge] = self.default_time if math.isnan(km) else max(km / self.speed * 3600, 1.0)
+            self._update_speed(edge)
+
+        counts = [0] * (len(self.codes) + 1)
+        for source in self._sources:
+            counts[source + 1] += 1
+        for node in range(len(self.codes)):
+            counts[node + 1] += counts[node]
+        self._offsets = array('i', counts)
+        positions = counts[:-1]
+        adjacent = [0] * len(self._sources)
+        for edge, source in enumerate(self._sources):
+            adjacent[positions[source]] = edge
+            positions[source] += 1
+        self._adjacent = array('i', adjacent)
+        self._dirty = False
+
+    def _heuristic(self, goal: int):
+        """ Seconds from a node to the goal at the highest speed of any edge, a lower bound
+        as long as the stations on the way have coordinates """
+        if not self._max_speed or math.isnan(self._latitude[goal]):
+            return lambda node: 0.0
+        speed = self._max_speed
+
+        def heuristic(node: int) -> float:
+            km = self._distance(node, goal)
+            return 0.0 if math.isnan(km) else km / speed
+        return heuristic
+
+    def _route(self, goal: int, duration: float, via: Dict[int, int]) -> Route:
+        nodes, estimated = [goal], False
+        while nodes[-1] in via:
+            edge = via[nodes[-1]]
+            estimated = estimated or not self._count[edge]
+            nodes.append(self._sources[edge])
+        return Route([self.codes[node] for node in reversed(nodes)], duration, estimated)
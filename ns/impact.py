@@ -0,0 +1,166 @@
+"""
+Index of the stations and track segments affected by disruptions, for
+annotating departures, trips and stops in one pass instead of walking the
+tracks of every disruption for each of them.
+
+Every track of a disruption (its ``trajecten``, or else its ``baanvakken``) is
+indexed under each of its stations. A departure or leg is affected by a track
+when two of its stations lie on it, i.e. it travels over the disrupted
+segment, or when it calls at the station of a single station track. Tracks
+only count between their start and end date. The index is updated per
+disruption, so feeding it the events of a DisruptionWatcher keeps it current
+without rebuilding it on every poll.
+
+    impact = ImpactIndex(StationIndex(ns.get_all_stations()))
+    for event in ns.watch_disruptions():
+        impact.apply([event])
+    impact.annotate_departures('UT', ns.get_departures(station='UT'))  # [[Disruption, ...], ...]
+"""
+
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple, Union
+
+from ns.disruptions import REMOVED, DisruptionEvent
+from ns.models import Departure, Disruption, DisruptionTracks, LegStop, Trip
+from ns.stations import StationIndex
+from ns.timestamps import epoch, optional_epoch
+
+# (disruption id, index of the track within the disruption)
+TrackKey = Tuple[str, int]
+Timestamp = Union[str, int, datetime]
+
+
+def tracks(disruption: Disruption) -> List[DisruptionTracks]:
+    details = disruption.details
+    if details is None:
+        return []
+    return list(details.tracks or details.traject or ())
+
+
+class ImpactIndex():
+    """ Active disruptions by station, and through the stations by segment """
+
+    def __init__(self, stations: StationIndex = None, clock: Callable[[], float] = time.time):
+        self.stations = stations
+        self.clock = clock
+        self.disruptions: Dict[str, Disruption] = {}
+        # station code: tracks it lies on
+        self._tracks: Dict[str, Set[TrackKey]] = defaultdict(set)
+        # track: (start, end, stations a departure or leg has to share with it to be affected)
+        self._validity: Dict[TrackKey, Tuple[Optional[int], Optional[int], int]] = {}
+        self._codes: Dict[str, str] = {}
+
+    def __len__(self) -> int:
+        return len(self.disruptions)
+
+    def __contains__(self, id: str) -> bool:
+        return id in self.disruptions
+
+    def add(self, disruption: Disruption):
+        """ Indexes a disruption, replacing an earlier version """
+        self.remove(disruption.id)
+        self.disruptions[disruption.id] = disruption
+        for i, track in enumerate(tracks(disruption)):
+            codes = {self._code(code) for code in track.stations or ()}
+            if not codes:
+                continue
+            key = (disruption.id, i)
+            self._validity[key] = (optional_epoch(track.start_date), optional_epoch(track.end_date), min(2, len(codes)))
+            for code in codes:
+                self._tracks[code].add(key)
+
+    def remove(self, id: str):
+        disruption = self.disruptions.pop(id, None)
+        if disruption is None:
+            return
+        for i, track in enumerate(tracks(disruption)):
+            key = (id, i)
+            if self._validity.pop(key, None) is None:
+                continue
+            for code in {self._code(code) for code in track.stations or ()}:
+                keys = self._tracks.get(code)
+                if keys is not None:
+                    keys.discard(key)
+                    if not keys:
+                        del self._tracks[code]
+
+    def update(self, disruptions: Iterable[Disruption]):
+        """ Replaces the indexed disruptions by a new get_disruptions result, reindexing only what changed """
+        current = {disruption.id: disruption for disruption in disruptions}
+        for id in [id for id in self.disruptions if id not in current]:
+            self.remove(id)
+        for id, disruption in current.items():
+            previous = self.disruptions.get(id)
+            if previous is not disruption and previous != disruption:
+                self.add(disruption)
+
+    def apply(self, events: Iterable[DisruptionEvent]):
+        """ Updates the index with the events of a DisruptionWatcher """
+        for event in events:
+            if event.kind == REMOVED:
+                self.remove(event.disruption.id)
+            else:
+                self.add(event.disruption)
+
+    def at_station(self, station: str, at: Timestamp = None) -> List[Disruption]:
+        """ Active disruptions with a track through a station, in order of disruption id """
+        now = self._now(at)
+        ids = {id for id, track in self._tracks.get(self._code(station), ()) if self._active(id, track, now)}
+        return [self.disruptions[id] for id in sorted(ids)]
+
+    def on_segment(self, origin: str, destination: str, at: Timestamp = None) -> List[Disruption]:
+        """ Active disruptions with a track through both stations """
+        return self.affecting((origin, destination), at)
+
+    def affecting(self, stations: Sequence[str], at: Timestamp = None) -> List[Disruption]:
+        """ Active disruptions of the route through stations, in order of disruption id """
+        return self._affecting(stations, self._now(at))
+
+    def annotate_departures(self, station: str, departures: Iterable[Departure], at: Timestamp = None) -> List[List[Disruption]]:
+        """ Disruptions affecting each departure from station, over its route stations """
+        now = self._now(at)
+        return [self._affecting([station] + [route.get('uicCode') for route in departure.route_stations or ()], now)
+                for departure in departures]
+
+    def annotate_trips(self, trips: Iterable[Trip], at: Timestamp = None) -> List[List[Disruption]]:
+        """ Disruptions affecting any leg of each trip """
+        now = self._now(at)
+        annotations = []
+        for trip in trips:
+            found: Dict[str, Disruption] = {}
+            for leg in trip.legs or ():
+                stations = [stop.uic_code for stop in leg.stops] if leg.stops else [leg.origin.uic_code, leg.destination.uic_code]
+                found.update((disruption.id, disruption) for disruption in self._affecting(stations, now))
+            annotations.append([found[id] for id in sorted(found)])
+        return annotations
+
+    def annotate_stops(self, stops: Iterable[LegStop], at: Timestamp = None) -> List[List[Disruption]]:
+        """ Disruptions with a track through the station of each stop """
+        now = self._now(at)
+        return [self.at_station(stop.uic_code, now) if stop.uic_code else [] for stop in stops]
+
+    def _code(self, identifier: str) -> str:
+        """ Station code of an identifier (code, UIC code or name) as far as the station index knows it """
+        code = self._codes.get(identifier)
+        if code is None:
+            station = self.stations.get(identifier) if self.stations is not None else None
+            code = self._codes[identifier] = station.code.upper() if station is not None else identifier.upper()
+        return code
+
+    def _now(self, at: Optional[Timestamp]) -> int:
+        return int(self.clock()) if at is None else epoch(at)
+
+    def _active(self, id: str, track: int, now: int) -> bool:
+        start, end, _ = self._validity[id, track]
+        return (start is None or start <= now) and (end is None or now < end)
+
+    def _affecting(self, stations: Sequence[Optional[str]], now: int) -> List[Disruption]:
+        counts: Dict[TrackKey, int] = defaultdict(int)
+        for code in {self._code(station) for station in stations if station}:
+            for key in self._tracks.get(code, ()):
+                counts[key] += 1
+        ids = {key[0] for key, count in counts.items()
+               if count >= self._validity[key][2] and self._active(key[0], key[1], now)}
+        return [self.disruptions[id] for id in sorted(ids)]
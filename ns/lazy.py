@@ -0,0 +1,76 @@
+"""
+Lazy variants of the models holding large nested collections.
+
+``Trip.legs``, ``Leg.stops``, ``Leg.notes`` and ``TripOriginDestination.notes``
+are kept as raw payloads until first accessed, then decoded and memoized. The
+lazy classes subclass the regular (or compact) models, so attributes and
+isinstance checks are unchanged.
+
+    lazy.MODELS[models.Trip]  # lazy subclass of ns.models.Trip
+"""
+
+import dataclasses
+from typing import Dict, Iterable, get_type_hints
+
+from ns import compact, models
+from ns.decoder import Deferred, decoder_for, replace_models
+
+# Lists of models decoded on first access, per model
+LAZY_FIELDS: Dict[str, Iterable[str]] = {
+    'Trip': ('legs',),
+    'Leg': ('stops', 'notes'),
+    'TripOriginDestination': ('notes',),
+}
+
+
+class LazyList():
+    """ Descriptor decoding a Deferred list of models on first access """
+
+    def __init__(self, name: str, model: type):
+        self.name = name
+        self.model = model
+        self.slot = f'_lazy_{name}'
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        value = getattr(instance, self.slot)
+        if isinstance(value, Deferred):
+            decode = decoder_for(self.model)
+            value = [decode(item) for item in value.items]
+            setattr(instance, self.slot, value)
+        return value
+
+    def __set__(self, instance, value):
+        setattr(instance, self.slot, value)
+
+
+def _lazy(model: type, mapping: Dict[type, type]) -> type:
+    hints = get_type_hints(model)
+    names = LAZY_FIELDS.get(model.__name__, ())
+    namespace = {
+        '__module__': __name__,
+        '__qualname__': model.__qualname__,
+        '__slots__': tuple(f'_lazy_{name}' for name in names),
+        '__annotations__': {name: replace_models(tp, mapping) for name, tp in hints.items()},
+        '__lazy__': frozenset(names),
+    }
+    for name in names:
+        item = replace_models(hints[name], mapping).__args__[0].__args__[0]  # Optional[List[X]]
+        namespace[name] = LazyList(name, item)
+    return type(model.__name__, (model,), namespace)
+
+
+def _build(sources: Iterable[type]) -> Dict[type, type]:
+    """ Lazy subclasses of the models with lazy fields, and of the models containing them """
+    mapping = {}
+    for name in ('TripOriginDestination', 'Leg', 'Trip'):
+        model = next(model for model in sources if model.__name__ == name)
+        mapping[model] = _lazy(model, mapping)
+    return mapping
+
+
+MODELS = {
+    **_build([m for m in vars(models).values() if isinstance(m, type) and dataclasses.is_dataclass(m)]),
+    **_build(compact.MODELS.values()),
+}
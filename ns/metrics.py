@@ -0,0 +1,192 @@
+"""
+In-process request instrumentation.
+
+Records per endpoint timings of every request phase, payload sizes, status
+codes and retries into histograms. Hooks receive every measurement as it is
+recorded, for exporting to a metrics system. Clients without an
+Instrumentation skip all of this.
+
+    metrics = Instrumentation()
+    metrics.add_hook(lambda kind, route, label, value: statsd.timing(f'ns.{route}.{label}', value))
+    ns = NSAPI('yourkey', instrumentation=metrics)
+    metrics.snapshot()
+
+Phases are ``dns``, ``connect`` and ``ttfb`` (until the response headers),
+``download``, ``parse`` (JSON), ``convert`` (into models) and ``total``. The
+``requests`` based NSAPI cannot separate dns and connect from ttfb.
+"""
+
+import bisect
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Tuple
+from urllib.parse import urlsplit
+
+ENDPOINTS = ('stations', 'arrivals', 'departures', 'disruptions', 'trips', 'prices')
+MODEL_ENDPOINTS = {
+    'Station': 'stations',
+    'Arrival': 'arrivals',
+    'Departure': 'departures',
+    'Disruption': 'disruptions',
+    'Trip': 'trips',
+    'PriceOption': 'prices',
+}
+
+# Bucket upper bounds: 100 µs up to ~105 s for timings, 64 B up to 64 MiB for sizes
+TIMING_BOUNDS = tuple(0.0001 * 2 ** i for i in range(21))
+SIZE_BOUNDS = tuple(64 * 2 ** i for i in range(21))
+
+Hook = Callable[[str, str, str, float], None]
+
+
+def endpoint(url: str) -> str:
+    """ Endpoint a url belongs to, e.g. departures, or its path if unknown """
+    path = urlsplit(url).path
+    for segment in path.split('/'):
+        if segment in ENDPOINTS:
+            return segment
+    return path
+
+
+class Histogram():
+    """ Counts of values in fixed exponential buckets """
+
+    def __init__(self, bounds: Tuple[float, ...] = TIMING_BOUNDS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = float('inf')
+        self.max = float('-inf')
+
+    def record(self, value: float):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> float:
+        """ Upper bound of the bucket holding the q-th quantile """
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                return min(self.bounds[i], self.max) if i < len(self.bounds) else self.max
+        return self.max
+
+    def snapshot(self) -> dict:
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'min': self.min if self.count else 0.0,
+            'max': self.max if self.count else 0.0,
+            'mean': self.sum / self.count if self.count else 0.0,
+            'p50': self.quantile(0.5),
+            'p90': self.quantile(0.9),
+            'p99': self.quantile(0.99),
+            'buckets': dict(zip(self.bounds + (float('inf'),), self.counts)),
+        }
+
+
+class Instrumentation():
+    """ Histograms and counters per endpoint """
+
+    def __init__(self, hooks: List[Hook] = None):
+        self.hooks: List[Hook] = list(hooks or ())
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.timings: Dict[Tuple[str, str], Histogram] = defaultdict(Histogram)
+            self.sizes: Dict[str, Histogram] = defaultdict(lambda: Histogram(SIZE_BOUNDS))
+            self.statuses: Counter = Counter()
+            self.retries: Counter = Counter()
+
+    def add_hook(self, hook: Hook):
+        """ Calls hook(kind, route, label, value) for every measurement, kind being timing, size, status or retry """
+        self.hooks.append(hook)
+
+    def timing(self, route: str, phase: str, seconds: float):
+        with self._lock:
+            self.timings[route, phase].record(seconds)
+        self._notify('timing', route, phase, seconds)
+
+    def size(self, route: str, size: int):
+        with self._lock:
+            self.sizes[route].record(size)
+        self._notify('size', route, 'bytes', size)
+
+    def status(self, route: str, status: int):
+        with self._lock:
+            self.statuses[route, status] += 1
+        self._notify('status', route, str(status), 1)
+
+    def retry(self, route: str):
+        with self._lock:
+            self.retries[route] += 1
+        self._notify('retry', route, 'retries', 1)
+
+    @contextmanager
+    def measure(self, route: str, phase: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timing(route, phase, time.perf_counter() - start)
+
+    def snapshot(self) -> Dict[str, dict]:
+        """ Everything recorded so far, per endpoint """
+        routes: Dict[str, dict] = defaultdict(lambda: {'timings': {}, 'sizes': None, 'statuses': {}, 'retries': 0})
+        with self._lock:
+            for (route, phase), histogram in self.timings.items():
+                routes[route]['timings'][phase] = histogram.snapshot()
+            for route, histogram in self.sizes.items():
+                routes[route]['sizes'] = histogram.snapshot()
+            for (route, status), count in self.statuses.items():
+                routes[route]['statuses'][status] = count
+            for route, count in self.retries.items():
+                routes[route]['retries'] = count
+        return dict(routes)
+
+    def trace_config(self):
+        """ aiohttp TraceConfig recording the dns, connect and ttfb phases """
+        import aiohttp
+
+        async def on_request_start(session, context, params):
+            context.route = endpoint(str(params.url))
+            context.start = time.perf_counter()
+
+        async def on_dns_start(session, context, params):
+            context.dns = time.perf_counter()
+
+        async def on_dns_end(session, context, params):
+            self.timing(context.route, 'dns', time.perf_counter() - context.dns)
+
+        async def on_connect_start(session, context, params):
+            context.connect = time.perf_counter()
+
+        async def on_connect_end(session, context, params):
+            self.timing(context.route, 'connect', time.perf_counter() - context.connect)
+
+        async def on_request_end(session, context, params):
+            self.timing(context.route, 'ttfb', time.perf_counter() - context.start)
+
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_request_start.append(on_request_start)
+        trace_config.on_dns_resolvehost_start.append(on_dns_start)
+        trace_config.on_dns_resolvehost_end.append(on_dns_end)
+        trace_config.on_connection_create_start.append(on_connect_start)
+        trace_config.on_connection_create_end.append(on_connect_end)
+        trace_config.on_request_end.append(on_request_end)
+        return trace_config
+
+    def _notify(self, kind: str, route: str, label: str, value: float):
+        for hook in self.hooks:
+            hook(kind, route, label, value)
@@ -1,7 +1,9 @@
 from dataclasses import dataclass, field
-from dataclasses_json import LetterCase, dataclass_json, config
+from ns.schema import config, dataclass_json
 from typing import Any, Dict, List, Optional, Union
 
+from ns.timestamps import seconds_between
+
 @dataclass_json
 @dataclass
 class Station:
@@ -57,6 +59,11 @@ class Arrival:
     actual_timezone_offset: str = field(metadata=config(field_name='actualTimeZoneOffset'))
     messages: Optional[List[Message]] = None
 
+    @property
+    def delay(self) -> Optional[int]:
+        """ Seconds the actual time is behind the planned time, None without an actual time """
+        return seconds_between(self.planned_datetime, self.actual_datetime)
+
 
 @dataclass_json
 @dataclass
@@ -76,6 +83,11 @@ class Departure:
     departure_status: str = field(metadata=config(field_name='departureStatus'))
     messages: Optional[List[Message]] = None
 
+    @property
+    def delay(self) -> Optional[int]:
+        """ Seconds the actual time is behind the planned time, None without an actual time """
+        return seconds_between(self.planned_datetime, self.actual_datetime)
+
 @dataclass_json
 @dataclass
 class Report:
@@ -97,9 +109,9 @@ class TravelAdvice:
 @dataclass
 class DisruptionTracks:
     stations: List[str]
-    start_date: Optional[str] = None
-    end_date: Optional[str] = None
-    direction: Optional[str] = None
+    start_date: Optional[str] = field(default=None, metadata=config(field_name='begintijd'))
+    end_date: Optional[str] = field(default=None, metadata=config(field_name='eindtijd'))
+    direction: Optional[str] = field(default=None, metadata=config(field_name='richting'))
 
 
 @dataclass_json
@@ -186,6 +198,11 @@ class TripOriginDestination:
     latest_known_track: Optional[str] = field(default=None, metadata=config(field_name='latestKnownTrack'))
     # travelAssistanceBookingInfo: 
 
+    @property
+    def delay(self) -> Optional[int]:
+        """ Seconds the actual time is behind the planned time, None without an actual time """
+        return seconds_between(self.planned_datetime, self.actual_datetime)
+
 
 @dataclass_json
 @dataclass
@@ -0,0 +1,92 @@
+"""
+Variants of the models with their timestamps parsed at decode time.
+
+The API sends every time as an ISO string, e.g. ``2026-10-18T10:04:00+0200``.
+Instead of re-parsing these on every sort, filter or delay computation, the
+variants here hold them parsed once by the decoder, either as timezone aware
+datetimes (in the offset the API gives, the same as the ``*_timezone_offset``
+fields) or as epoch seconds. They subclass the regular, compact or lazy models,
+so attributes and isinstance checks are unchanged.
+
+    parsed.MODELS['datetime'][models.Departure]  # planned_datetime is a datetime
+    parsed.MODELS['epoch'][compact.Departure]  # planned_datetime is an int
+"""
+
+import dataclasses
+from datetime import datetime
+from typing import Callable, Dict, Iterable, Iterator, Optional, get_type_hints
+
+from ns import compact, lazy, models
+from ns.decoder import replace_models
+from ns.lazy import LazyList
+from ns.timestamps import to_datetime, to_epoch
+
+DATETIME, EPOCH = 'datetime', 'epoch'
+PARSERS: Dict[str, Callable] = {DATETIME: to_datetime, EPOCH: to_epoch}
+TYPES: Dict[str, type] = {DATETIME: datetime, EPOCH: int}
+
+# Timestamp fields parsed on decode, per model
+TIME_FIELDS: Dict[str, Iterable[str]] = {
+    'Arrival': ('planned_datetime', 'actual_datetime'),
+    'Departure': ('planned_datetime', 'actual_datetime'),
+    'Report': ('last_update',),
+    'TripOriginDestination': ('planned_datetime', 'actual_datetime'),
+    'LegStop': ('planned_departure_datetime', 'planned_arrival_datetime', 'actual_arrival_datetime'),
+}
+
+
+def _models_in(tp) -> Iterator[type]:
+    """ Models a (generic) type hint refers to """
+    if dataclasses.is_dataclass(tp):
+        yield tp
+    for arg in getattr(tp, '__args__', None) or ():
+        yield from _models_in(arg)
+
+
+def _parsed(model: type, mode: str, mapping: Dict[type, type]) -> type:
+    hints = get_type_hints(model)
+    names = TIME_FIELDS.get(model.__name__, ())
+    annotations = {name: replace_models(tp, mapping) for name, tp in hints.items()}
+    for name in names:
+        annotations[name] = Optional[TYPES[mode]]
+    namespace = {
+        '__module__': __name__,
+        '__qualname__': model.__qualname__,
+        '__slots__': (),
+        '__annotations__': annotations,
+        '__parse__': {name: PARSERS[mode] for name in names},
+    }
+    # Lazy lists decode into the parsed variant of their items
+    for name in getattr(model, '__lazy__', ()):
+        namespace[name] = LazyList(name, annotations[name].__args__[0].__args__[0])  # Optional[List[X]]
+    return type(model.__name__, (model,), namespace)
+
+
+def _build(mode: str, sources: Iterable[type]) -> Dict[type, type]:
+    """ Parsed subclasses of the models with timestamps, and of the models containing them """
+    mapping: Dict[type, type] = {}
+    done = set()
+
+    def visit(model: type):
+        if model in done:
+            return
+        done.add(model)
+        hints = get_type_hints(model)
+        for tp in hints.values():
+            for nested in _models_in(tp):
+                visit(nested)
+        if model.__name__ in TIME_FIELDS or any(m in mapping for tp in hints.values() for m in _models_in(tp)):
+            mapping[model] = _parsed(model, mode, mapping)
+
+    for model in sources:
+        visit(model)
+    return mapping
+
+
+def _sources() -> Iterator[type]:
+    yield from (m for m in vars(models).values() if isinstance(m, type) and dataclasses.is_dataclass(m))
+    yield from compact.MODELS.values()
+    yield from lazy.MODELS.values()
+
+
+MODELS: Dict[str, Dict[type, type]] = {mode: _build(mode, _sources()) for mode in PARSERS}
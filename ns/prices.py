@@ -0,0 +1,138 @@
+"""
+Fare matrices between many stations, built from concurrent get_trip_price calls.
+
+Pairs are deduplicated before anything is requested: repeated stations, a
+station to itself, and (as fares do not depend on the direction of travel) the
+reverse of a pair already requested. Price options are cached per pair and
+date, so recomputing a matrix for another day or an overlapping set of
+stations only requests what is new.
+
+    cache = PriceCache()
+    matrix = await ns.get_price_matrix(['UT', 'ASD', 'RTD'], dates=['2026-10-18'], cache=cache)
+    matrix.table('2026-10-18')  # second class single fares in cents, origins x destinations
+"""
+
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from ns.models import PriceOption
+
+# (from station, to station, date), date None meaning today
+PriceKey = Tuple[str, str, Optional[str]]
+
+
+def _unique(items: Iterable) -> list:
+    return list(dict.fromkeys(items))
+
+
+def plan_prices(origins: Sequence[str], destinations: Sequence[str], dates: Sequence[Optional[str]],
+                symmetric: bool = True) -> Dict[PriceKey, List[PriceKey]]:
+    """ Maps every price to request onto the matrix cells it fills """
+    plan: Dict[PriceKey, List[PriceKey]] = {}
+    for date in dates:
+        for origin in origins:
+            for destination in destinations:
+                if origin == destination:
+                    continue
+                key = (origin, destination, date)
+                if symmetric and (destination, origin, date) in plan:
+                    key = (destination, origin, date)
+                plan.setdefault(key, []).append((origin, destination, date))
+    return plan
+
+
+def fare(options: Optional[List[PriceOption]], class_type: str = 'SECOND', discount_type: str = 'NONE',
+         product_type: str = 'SINGLE_FARE') -> Optional[int]:
+    """ Price in cents of the first matching price among price options """
+    for option in options or ():
+        for price in option.prices or ():
+            if (price.class_type, price.discount_type, price.product_type) == (class_type, discount_type, product_type):
+                return price.price
+    return None
+
+
+class PriceCache():
+    """ Price options per pair and date, kept for ttl seconds """
+
+    def __init__(self, ttl: float = 24 * 60 * 60, clock: Callable[[], float] = time.monotonic):
+        self.ttl = ttl
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self._entries: Dict[PriceKey, Tuple[float, List[PriceOption]]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: PriceKey) -> Optional[List[PriceOption]]:
+        entry = self._entries.get(key)
+        if entry is None or self.clock() - entry[0] >= self.ttl:
+            self._entries.pop(key, None)
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key: PriceKey, options: List[PriceOption]):
+        self._entries[key] = (self.clock(), options)
+
+
+class PriceMatrix():
+    """ Price options between origins (rows) and destinations (columns), per date """
+
+    def __init__(self, origins: Sequence[str], destinations: Sequence[str], dates: Sequence[Optional[str]],
+                 options: Dict[PriceKey, List[PriceOption]], errors: Dict[PriceKey, Exception] = None):
+        self.origins = list(origins)
+        self.destinations = list(destinations)
+        self.dates = list(dates)
+        self.options = options
+        self.errors = errors or {}
+
+    def get(self, origin: str, destination: str, date: Optional[str] = None) -> Optional[List[PriceOption]]:
+        """ Price options of a pair, None for a station to itself or a failed request """
+        return self.options.get((origin, destination, date))
+
+    def __getitem__(self, key: Tuple) -> Optional[List[PriceOption]]:
+        """ matrix[origin, destination] or matrix[origin, destination, date] """
+        return self.get(*key)
+
+    def rows(self, date: Optional[str] = None) -> List[List[Optional[List[PriceOption]]]]:
+        """ Dense origins x destinations matrix of price options """
+        return [[self.get(origin, destination, date) for destination in self.destinations] for origin in self.origins]
+
+    def table(self, date: Optional[str] = None, class_type: str = 'SECOND', discount_type: str = 'NONE',
+              product_type: str = 'SINGLE_FARE') -> List[List[Optional[int]]]:
+        """ Dense origins x destinations matrix of fares in cents """
+        return [[fare(options, class_type, discount_type, product_type) for options in row] for row in self.rows(date)]
+
+
+def price_matrix(origins: Sequence[str], destinations: Sequence[str], dates: Sequence[Optional[str]],
+                 plan: Dict[PriceKey, List[PriceKey]], options: Dict[PriceKey, List[PriceOption]],
+                 errors: Dict[PriceKey, Exception]) -> PriceMatrix:
+    """ Spreads the requested prices over the cells of the matrix """
+    cells: Dict[PriceKey, List[PriceOption]] = {}
+    cell_errors: Dict[PriceKey, Exception] = {}
+    for key, targets in plan.items():
+        for target in targets:
+            if key in options:
+                cells[target] = options[key]
+            elif key in errors:
+                cell_errors[target] = errors[key]
+    return PriceMatrix(origins, destinations, dates, cells, cell_errors)
+
+
+def prepare(origins: Iterable[str], destinations: Optional[Iterable[str]], dates: Iterable[Optional[str]],
+            symmetric: bool, cache: Optional[PriceCache]):
+    """ Returns (origins, destinations, dates, plan, cached options, keys still to request) """
+    origins = _unique(origins)
+    destinations = _unique(destinations) if destinations is not None else origins
+    dates = _unique(dates)
+    plan = plan_prices(origins, destinations, dates, symmetric)
+    options = {}
+    for key in plan:
+        cached = cache.get(key) if cache is not None else None
+        if cached is None and cache is not None and symmetric:
+            cached = cache.get((key[1], key[0], key[2]))
+        if cached is not None:
+            options[key] = cached
+    return origins, destinations, dates, plan, options, [key for key in plan if key not in options]
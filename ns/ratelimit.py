@@ -0,0 +1,73 @@
+"""
+Token bucket rate limiting, for staying under the subscription key quota.
+"""
+
+import threading
+import time
+from typing import Callable
+
+
+class TokenBucket():
+    """ Allows `rate` requests per second on average, with bursts of up to `capacity` requests.
+    Callers reserve tokens in order, so waiting callers are served first come, first served. """
+
+    def __init__(self, rate: float, capacity: float = None, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1)
+        self.clock = clock
+        self.tokens = self.capacity
+        self.updated = clock()
+        self._lock = threading.Lock()
+
+    def reserve(self, tokens: float = 1) -> float:
+        """ Takes tokens, returning how many seconds to wait before using them """
+        with self._lock:
+            now = self.clock()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= tokens
+            return max(0.0, -self.tokens / self.rate)
+
+    def acquire(self, tokens: float = 1):
+        delay = self.reserve(tokens)
+        if delay > 0:
+            time.sleep(delay)
+
+    async def acquire_async(self, tokens: float = 1):
+        import asyncio
+
+        delay = self.reserve(tokens)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class SharedTokenBucket(TokenBucket):
+    """ TokenBucket shared by processes, so that workers together stay under one quota.
+    Create it before starting the processes and pass it to them as an argument. """
+
+    def __init__(self, rate: float, capacity: float = None, context=None):
+        import multiprocessing
+
+        context = context or multiprocessing.get_context()
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1)
+        # CLOCK_MONOTONIC is system wide, so all processes agree on it
+        self.clock = time.monotonic
+        self._state = context.RawArray('d', [self.capacity, self.clock()])
+        self._lock = context.Lock()
+
+    @property
+    def tokens(self) -> float:
+        return self._state[0]
+
+    @tokens.setter
+    def tokens(self, value: float):
+        self._state[0] = value
+
+    @property
+    def updated(self) -> float:
+        return self._state[1]
+
+    @updated.setter
+    def updated(self, value: float):
+        self._state[1] = value
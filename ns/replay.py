@@ -0,0 +1,380 @@
+"""
+Offline record and replay of gateway responses, and a local stand-in gateway.
+
+Record real responses with the sync client, and replay them later without a
+network or key:
+
+    ns = NSAPI('yourkey')
+    ns.session.mount('https://', RecordingAdapter('recordings'))
+    ns.get_departures(station='UT')
+
+    ns = NSAPI('unused')
+    ns.session.mount('https://', ReplayAdapter('recordings'))
+
+RecordingOptions and ReplayOptions do the same for either client, AsyncNSAPI
+included, as its transport options:
+
+    async with AsyncNSAPI('yourkey', transport=RecordingOptions(recordings='recordings')) as ns:
+        await ns.get_departures(station='UT')
+
+    async with AsyncNSAPI('unused', transport=ReplayOptions(recordings='recordings')) as ns:
+        await ns.get_departures(station='UT')
+
+Or serve recordings and fixtures (``<endpoint>.json``, e.g. ``departures.json``)
+over HTTP to both clients, with injected latency and errors:
+
+    with StandInGateway(fixtures='tests/fixtures', latency=0.02, error_rate=0.01) as gateway:
+        ns = NSAPI('unused')
+        ns.base_url = gateway.base_url
+
+    python -m ns.replay tests/fixtures --port 8080 --latency 0.02
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Any, AsyncIterator, Dict, Mapping, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+import requests
+from aiohttp import web
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+from ns.metrics import ENDPOINTS, endpoint
+from ns.transport import AiohttpTransport, Observer, TransportOptions
+
+# Headers describing the transfer rather than the (decoded) body are not recorded
+_SKIPPED_HEADERS = {'content-encoding', 'content-length', 'transfer-encoding', 'connection', 'keep-alive', 'date'}
+
+
+class MissingRecording(requests.exceptions.RequestException):
+    """ No recording for a replayed request """
+
+
+class RecordingStore():
+    """ Recorded responses as JSON files in a directory, one per endpoint, path and query """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def path(self, url: str) -> str:
+        parts = urlsplit(url)
+        query = sorted(parse_qsl(parts.query, keep_blank_values=True))
+        digest = hashlib.sha1(json.dumps([parts.path, query]).encode()).hexdigest()[:16]
+        name = endpoint(parts.path)
+        name = name if name in ENDPOINTS else 'other'
+        return os.path.join(self.directory, f'{name}-{digest}.json')
+
+    def save(self, url: str, status: int, headers: Dict[str, str], body: bytes):
+        os.makedirs(self.directory, exist_ok=True)
+        recording = {
+            'url': url,
+            'status': status,
+            'headers': {k: v for k, v in headers.items() if k.lower() not in _SKIPPED_HEADERS},
+            'body': body.decode('utf-8'),
+        }
+        with open(self.path(url), 'w', encoding='utf-8') as f:
+            json.dump(recording, f, ensure_ascii=False)
+
+    def load(self, url: str) -> Optional[dict]:
+        try:
+            with open(self.path(url), encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+
+class RecordingAdapter(HTTPAdapter):
+    """ requests adapter saving every response it receives """
+
+    def __init__(self, directory: str, **kwargs):
+        super().__init__(**kwargs)
+        self.store = RecordingStore(directory)
+
+    def send(self, request, **kwargs):
+        response = super().send(request, **kwargs)
+        self.store.save(request.url, response.status_code, response.headers, response.content)
+        return response
+
+
+class ReplayAdapter(BaseAdapter):
+    """ requests adapter answering from recordings instead of the network """
+
+    def __init__(self, directory: str):
+        super().__init__()
+        self.store = RecordingStore(directory)
+
+    def send(self, request, **kwargs):
+        recording = self.store.load(request.url)
+        if recording is None:
+            raise MissingRecording(f'No recording for {request.url}', request=request)
+        response = requests.Response()
+        response.status_code = recording['status']
+        response.headers = CaseInsensitiveDict(recording['headers'])
+        response._content = recording['body'].encode('utf-8')
+        response._content_consumed = True
+        response.encoding = 'utf-8'
+        response.url = request.url
+        response.request = request
+        response.elapsed = timedelta(0)
+        return response
+
+    def close(self):
+        pass
+
+
+class _RecordedTransport():
+    """ Transport of AsyncNSAPI over whole responses (status, headers, body), as recorded """
+
+    def __init__(self, observer: Observer = None):
+        import aiohttp
+
+        self.observer = observer
+        self.session = None
+        self.errors = (aiohttp.ClientResponseError, aiohttp.ClientConnectionError, asyncio.TimeoutError)
+
+    failure = staticmethod(AiohttpTransport.failure)
+
+    async def _send(self, url: str, headers: dict, params: Optional[dict]) -> Tuple[int, Mapping[str, str], bytes]:
+        raise NotImplementedError
+
+    async def _response(self, url: str, headers: dict, params: Optional[dict]) -> Tuple[int, Mapping[str, str], bytes]:
+        status, response_headers, body = await self._send(url, headers, params)
+        if self.observer is not None:
+            self.observer(status, response_headers)
+        return status, response_headers, body
+
+    @staticmethod
+    def _raise_for_status(url: str, status: int, headers: Mapping[str, str]):
+        """ Raises the error aiohttp raises for an error status """
+        if status < 400:
+            return
+        import aiohttp
+        from multidict import CIMultiDict, CIMultiDictProxy
+        from yarl import URL
+
+        request = aiohttp.RequestInfo(URL(url), 'GET', CIMultiDictProxy(CIMultiDict()), URL(url))
+        raise aiohttp.ClientResponseError(request, (), status=status, message=f'Recorded status {status}',
+                                          headers=CIMultiDictProxy(CIMultiDict(headers)))
+
+    async def get(self, url: str, headers: dict, params: Optional[dict]) -> Tuple[Any, int]:
+        status, response_headers, body = await self._response(url, headers, params)
+        self._raise_for_status(url, status, response_headers)
+        return json.loads(body), len(body)
+
+    async def get_instrumented(self, url: str, headers: dict, params: Optional[dict], metrics, route: str) -> Tuple[Any, int]:
+        start = time.perf_counter()
+        status, response_headers, body = await self._response(url, headers, params)
+        metrics.status(route, status)
+        self._raise_for_status(url, status, response_headers)
+        received = time.perf_counter()
+        response = json.loads(body)
+        metrics.timing(route, 'parse', time.perf_counter() - received)
+        metrics.size(route, len(body))
+        metrics.timing(route, 'total', time.perf_counter() - start)
+        return response, len(body)
+
+    async def get_conditional(self, url: str, headers: dict, params: Optional[dict]) -> Tuple[Mapping[str, str], Any]:
+        status, response_headers, body = await self._response(url, headers, params)
+        if status == 304:
+            return response_headers, None
+        self._raise_for_status(url, status, response_headers)
+        return response_headers, json.loads(body)
+
+    async def chunks(self, url: str, headers: dict, params: Optional[dict], chunk_size: int) -> AsyncIterator[bytes]:
+        status, response_headers, body = await self._response(url, headers, params)
+        self._raise_for_status(url, status, response_headers)
+        for i in range(0, len(body), chunk_size):
+            yield body[i:i + chunk_size]
+
+    async def close(self):
+        pass
+
+
+class RecordingTransport(_RecordedTransport):
+    """ Transport of AsyncNSAPI saving every response it receives over an aiohttp ClientSession """
+
+    def __init__(self, session, directory: str):
+        super().__init__()
+        self.session = session
+        self.store = RecordingStore(directory)
+
+    async def _send(self, url: str, headers: dict, params: Optional[dict]) -> Tuple[int, Mapping[str, str], bytes]:
+        async with self.session.get(url, headers=headers, params=params) as response:
+            body = await response.read()
+        self.store.save(str(response.url), response.status, response.headers, body)
+        return response.status, response.headers, body
+
+    async def close(self):
+        await self.session.close()
+
+
+class ReplayTransport(_RecordedTransport):
+    """ Transport of AsyncNSAPI answering from recordings instead of the network """
+
+    def __init__(self, directory: str, observer: Observer = None):
+        super().__init__(observer)
+        self.store = RecordingStore(directory)
+
+    async def _send(self, url: str, headers: dict, params: Optional[dict]) -> Tuple[int, Mapping[str, str], bytes]:
+        # The url as requests sends it, so recordings of either client replay in both
+        url = requests.Request('GET', url, params=params).prepare().url
+        recording = self.store.load(url)
+        if recording is None:
+            raise MissingRecording(f'No recording for {url}')
+        return recording['status'], CaseInsensitiveDict(recording['headers']), recording['body'].encode('utf-8')
+
+
+@dataclass
+class RecordingOptions(TransportOptions):
+    """ Transport options saving the responses either client receives """
+    recordings: str = 'recordings'
+
+    def session(self) -> requests.Session:
+        session = super().session()
+        adapter = RecordingAdapter(self.recordings, pool_connections=self.pool_connections,
+                                   pool_maxsize=self.pool_maxsize, pool_block=self.pool_block, max_retries=0)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
+    def async_transport(self, instrumentation=None, observer: Observer = None):
+        if self.http2:
+            raise ValueError('Responses are recorded over aiohttp, not http2')
+        return RecordingTransport(super().async_transport(instrumentation, observer).session, self.recordings)
+
+
+@dataclass
+class ReplayOptions(TransportOptions):
+    """ Transport options answering either client from recordings instead of the network """
+    recordings: str = 'recordings'
+
+    def session(self) -> requests.Session:
+        session = super().session()
+        adapter = ReplayAdapter(self.recordings)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
+    def async_transport(self, instrumentation=None, observer: Observer = None):
+        return ReplayTransport(self.recordings, observer)
+
+
+class StandInGateway():
+    """ Local HTTP server standing in for the NS gateway """
+
+    def __init__(self, fixtures: str = None, recordings: str = None, latency: float = 0.0, jitter: float = 0.0,
+                 error_rate: float = 0.0, error_status: int = 503, seed: int = None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.recordings = RecordingStore(recordings) if recordings else None
+        self.fixtures: Dict[str, bytes] = {}
+        self.requests = 0
+        self.errors = 0
+        self.base_url = None
+        self._random = random.Random(seed)
+        self._runner = None
+        self._loop = None
+        self._thread = None
+        if fixtures:
+            for name in ENDPOINTS:
+                path = os.path.join(fixtures, f'{name}.json')
+                if os.path.exists(path):
+                    with open(path, 'rb') as f:
+                        self.fixtures[name] = f.read()
+
+    async def handle(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        if self.latency or self.jitter:
+            await asyncio.sleep(self.latency + self._random.uniform(0, self.jitter))
+        if self.error_rate and self._random.random() < self.error_rate:
+            self.errors += 1
+            return web.json_response({'code': self.error_status, 'message': 'Injected error'}, status=self.error_status)
+
+        if self.recordings is not None:
+            recording = self.recordings.load(str(request.url))
+            if recording is not None:
+                headers = {k: v for k, v in recording['headers'].items() if k.lower() != 'content-type'}
+                content_type = recording['headers'].get('Content-Type', 'application/json').split(';')[0]
+                return web.Response(text=recording['body'], status=recording['status'], headers=headers,
+                                    content_type=content_type)
+        body = self.fixtures.get(endpoint(request.path))
+        if body is None:
+            return web.json_response({'code': 404, 'message': f'No fixture for {request.path}'}, status=404)
+        return web.Response(body=body, content_type='application/json')
+
+    async def start_async(self, host: str = '127.0.0.1', port: int = 0) -> str:
+        """ Starts serving on the running event loop, returning the base url for the clients """
+        app = web.Application()
+        app.router.add_get('/{tail:.*}', self.handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+        host, port = self._runner.addresses[0][:2]
+        self.base_url = f'http://{host}:{port}/public-'
+        return self.base_url
+
+    async def stop_async(self):
+        await self._runner.cleanup()
+
+    def start(self, host: str = '127.0.0.1', port: int = 0) -> str:
+        """ Starts serving from a background thread, returning the base url for the clients """
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name='ns-stand-in-gateway', daemon=True)
+        self._thread.start()
+        return asyncio.run_coroutine_threadsafe(self.start_async(host, port), self._loop).result()
+
+    def stop(self):
+        asyncio.run_coroutine_threadsafe(self.stop_async(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+    def __enter__(self) -> 'StandInGateway':
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    async def __aenter__(self) -> 'StandInGateway':
+        await self.start_async()
+        return self
+
+    async def __aexit__(self, *args):
+        await self.stop_async()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Local stand-in for the NS API gateway')
+    parser.add_argument('fixtures', help='directory with <endpoint>.json responses')
+    parser.add_argument('--recordings', help='directory with recorded responses')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds added to every response')
+    parser.add_argument('--jitter', type=float, default=0.0, help='random seconds added on top of latency')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of requests answered with an error')
+    parser.add_argument('--error-status', type=int, default=503)
+    args = parser.parse_args(argv)
+
+    gateway = StandInGateway(args.fixtures, args.recordings, args.latency, args.jitter, args.error_rate, args.error_status)
+
+    async def serve():
+        print(f'Serving on {await gateway.start_async(args.host, args.port)}')
+        await asyncio.Event().wait()
+
+    asyncio.run(serve())
+
+
+if __name__ == '__main__':
+    main()
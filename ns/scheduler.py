@@ -0,0 +1,249 @@
+"""
+Priority scheduling of requests under a rate limit learned from the gateway.
+
+Every request of a client with a Scheduler waits in the queue of its priority
+class until a token is free, the highest priority first. Lower classes are
+also deferred while the bucket is below their reserve, so a batch sweep leaves
+headroom for interactive requests instead of using up the quota, and can be
+shed after waiting too long or when its queue is full. The rate adapts to the
+responses: a 429 halves it and pauses until Retry-After, rate limit headers
+(RateLimit-Remaining and RateLimit-Reset) set it directly, and successful
+responses raise it again, up to max_rate.
+
+    scheduler = Scheduler(rate=10)
+    ns = NSAPI('yourkey', scheduler=scheduler)
+    with priority('batch'):
+        ns.get_trips(fromStation='UT', toStation='ASD')
+    scheduler.snapshot()
+
+Requests get the priority of their endpoint (departures, arrivals and
+disruptions are interactive, prices batch) unless set with ``priority``, which
+applies to the current thread or task and the tasks it creates.
+"""
+
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Callable, Deque, Dict, Iterator, Mapping, Optional, Sequence
+
+from ns.metrics import Histogram
+from ns.transport import parse_retry_after
+
+
+@dataclass
+class PriorityClass:
+    name: str
+    reserve: float = 0.0  # Fraction of the bucket left to higher classes
+    max_queue: Optional[int] = None  # Waiting requests beyond which new ones are shed
+    max_wait: Optional[float] = None  # Seconds after which a waiting request is shed
+
+
+PRIORITIES = (
+    PriorityClass('interactive'),
+    PriorityClass('normal', reserve=0.2),
+    PriorityClass('batch', reserve=0.5),
+)
+
+# Priority of the requests to an endpoint, 'normal' if not listed
+ROUTE_PRIORITIES = {
+    'departures': 'interactive',
+    'arrivals': 'interactive',
+    'disruptions': 'interactive',
+    'prices': 'batch',
+}
+
+_priority: ContextVar[Optional[str]] = ContextVar('ns_priority', default=None)
+
+
+@contextmanager
+def priority(name: str) -> Iterator[None]:
+    """ Schedules the requests made in this context with the given priority """
+    token = _priority.set(name)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class RequestShed(Exception):
+    """ A request was dropped by the scheduler to keep headroom for higher priorities """
+
+
+class _Ticket():
+    __slots__ = ('priority', 'enqueued', 'event', 'granted', 'error')
+
+    def __init__(self, priority: int, enqueued: float, event):
+        self.priority = priority
+        self.enqueued = enqueued
+        self.event = event
+        self.granted = False
+        self.error: Optional[Exception] = None
+
+
+class Scheduler():
+    """ Token bucket with a queue per priority class, whose rate follows the responses of the gateway """
+
+    def __init__(self, rate: float = 10.0, max_rate: float = None, min_rate: float = 0.1, burst: float = None,
+                 priorities: Sequence[PriorityClass] = PRIORITIES, routes: Mapping[str, str] = None,
+                 increase: float = 0.1, decrease: float = 0.5, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.max_rate = max_rate if max_rate is not None else rate
+        self.min_rate = min_rate
+        self.capacity = burst if burst is not None else max(rate, 1)
+        self.priorities = tuple(priorities)
+        self.routes = dict(ROUTE_PRIORITIES if routes is None else routes)
+        self.increase = increase  # Requests per second the rate grows by per second of successful responses
+        self.decrease = decrease  # Factor the rate is multiplied by on a 429
+        self.clock = clock
+        self.tokens = self.capacity
+        self.updated = clock()
+        self.paused_until = 0.0
+        self.throttled = 0
+        self._index = {cls.name: i for i, cls in enumerate(self.priorities)}
+        self._queues: Sequence[Deque[_Ticket]] = [deque() for _ in self.priorities]
+        self._waits = [Histogram() for _ in self.priorities]
+        self._granted = [0] * len(self.priorities)
+        self._shed = [0] * len(self.priorities)
+        self._lock = threading.Lock()
+
+    def priority_of(self, route: str) -> str:
+        """ Priority of a request to route, from the context or else the endpoint """
+        return _priority.get() or self.routes.get(route, 'normal')
+
+    def depth(self) -> Dict[str, int]:
+        """ Waiting requests per priority class """
+        with self._lock:
+            return {cls.name: len(queue) for cls, queue in zip(self.priorities, self._queues)}
+
+    def acquire(self, route: str):
+        """ Blocks until a request to route may be sent, raising RequestShed if it is dropped """
+        ticket = self._enqueue(route, threading.Event())
+        while True:
+            delay = self._dispatch()
+            if ticket.event.is_set():
+                break
+            ticket.event.wait(delay)
+        if ticket.error is not None:
+            raise ticket.error
+
+    async def acquire_async(self, route: str):
+        import asyncio
+
+        ticket = self._enqueue(route, asyncio.Event())
+        try:
+            while True:
+                delay = self._dispatch()
+                if ticket.event.is_set():
+                    break
+                try:
+                    await asyncio.wait_for(ticket.event.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            if not ticket.event.is_set():
+                self._cancel(ticket)
+        if ticket.error is not None:
+            raise ticket.error
+
+    def observe(self, status: int, headers: Mapping[str, str]):
+        """ Adapts the rate to a response of the gateway """
+        with self._lock:
+            now = self.clock()
+            if status == 429:
+                self.throttled += 1
+                self.rate = max(self.min_rate, self.rate * self.decrease)
+                self.tokens = min(self.tokens, 0.0)
+                retry_after = parse_retry_after(headers.get('Retry-After') or '')
+                self.paused_until = max(self.paused_until, now + (retry_after if retry_after is not None else 1 / self.rate))
+                return
+            remaining, reset = _header(headers, 'RateLimit-Remaining'), _header(headers, 'RateLimit-Reset')
+            if remaining is not None and reset is not None:
+                # Reset is given in seconds, some gateways give an epoch timestamp instead
+                reset = reset - time.time() if reset > 1e9 else reset
+                self.rate = min(self.max_rate, max(self.min_rate, remaining / max(reset, 1.0)))
+            elif status < 400:
+                self.rate = min(self.max_rate, self.rate + self.increase / self.rate)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                'rate': self.rate,
+                'tokens': self.tokens,
+                'throttled': self.throttled,
+                'priorities': {cls.name: {
+                    'depth': len(self._queues[i]),
+                    'granted': self._granted[i],
+                    'shed': self._shed[i],
+                    'wait': self._waits[i].snapshot(),
+                } for i, cls in enumerate(self.priorities)},
+            }
+
+    def _enqueue(self, route: str, event) -> _Ticket:
+        name = self.priority_of(route)
+        index = self._index.get(name)
+        if index is None:
+            raise ValueError(f'priority should be one of {", ".join(self._index)}, not {name}')
+        cls = self.priorities[index]
+        with self._lock:
+            if cls.max_queue is not None and len(self._queues[index]) >= cls.max_queue:
+                self._shed[index] += 1
+                raise RequestShed(f'{cls.name} queue is full')
+            ticket = _Ticket(index, self.clock(), event)
+            self._queues[index].append(ticket)
+        return ticket
+
+    def _cancel(self, ticket: _Ticket):
+        with self._lock:
+            try:
+                self._queues[ticket.priority].remove(ticket)
+            except ValueError:
+                pass
+
+    def _dispatch(self) -> Optional[float]:
+        """ Grants tokens to waiting requests, highest priority first.
+        Returns the seconds until the next one can be granted, None if none are waiting. """
+        with self._lock:
+            now = self.clock()
+            self._shed_expired(now)
+            if now < self.paused_until:
+                self.updated = now
+                return self.paused_until - now
+            self.tokens = min(self.capacity, self.tokens + (now - max(self.updated, self.paused_until)) * self.rate)
+            self.updated = now
+            for index, queue in enumerate(self._queues):
+                if not queue:
+                    continue
+                # Lower classes leave their reserve to requests of higher classes yet to come
+                needed = 1 + min(self.priorities[index].reserve * self.capacity, self.capacity - 1)
+                while queue and self.tokens >= needed:
+                    self.tokens -= 1
+                    self._grant(queue.popleft(), now)
+                if queue:
+                    return (needed - self.tokens) / self.rate
+            return None
+
+    def _grant(self, ticket: _Ticket, now: float):
+        ticket.granted = True
+        self._granted[ticket.priority] += 1
+        self._waits[ticket.priority].record(now - ticket.enqueued)
+        ticket.event.set()
+
+    def _shed_expired(self, now: float):
+        for index, queue in enumerate(self._queues):
+            max_wait = self.priorities[index].max_wait
+            while max_wait is not None and queue and now - queue[0].enqueued > max_wait:
+                ticket = queue.popleft()
+                ticket.error = RequestShed(f'{self.priorities[index].name} request waited over {max_wait} seconds')
+                self._shed[index] += 1
+                ticket.event.set()
+
+
+def _header(headers: Mapping[str, str], name: str) -> Optional[float]:
+    value = headers.get(name) or headers.get(f'X-{name}')
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
@@ -0,0 +1,55 @@
+"""
+Deferred dataclasses_json support for the models.
+
+Importing dataclasses_json (and marshmallow with it) costs more than building
+all of the models, while the clients decode with ns.decoder and never need it.
+Models are declared with the ``config`` and ``dataclass_json`` of this module
+instead: ``config`` writes the same field metadata as dataclasses_json does,
+and ``dataclass_json`` adds placeholders for its methods, which apply the real
+decorator to the model on first use.
+
+    Departure.from_dict(data)  # imports dataclasses_json and sets up Departure
+"""
+
+from typing import Callable, Dict
+
+_METHODS = ('to_json', 'to_dict')
+_CLASSMETHODS = ('from_json', 'from_dict', 'schema')
+
+
+def config(field_name: str) -> Dict[str, dict]:
+    """ Field metadata naming the key of a field in the payload, like dataclasses_json.config(field_name=...) """
+    def override(_, _field_name=field_name):
+        return _field_name
+    return {'dataclasses_json': {'letter_case': override}}
+
+
+def _load(cls: type):
+    """ Applies dataclasses_json to a model, replacing the placeholders by its methods """
+    from dataclasses_json import dataclass_json as apply
+    apply(cls)
+
+
+def _method(name: str) -> Callable:
+    def method(self, *args, **kwargs):
+        _load(type(self))
+        return getattr(self, name)(*args, **kwargs)
+    method.__name__ = name
+    return method
+
+
+def _classmethod(name: str) -> classmethod:
+    def method(cls, *args, **kwargs):
+        _load(cls)
+        return getattr(cls, name)(*args, **kwargs)
+    method.__name__ = name
+    return classmethod(method)
+
+
+def dataclass_json(cls: type) -> type:
+    """ Gives a model the to_json, to_dict, from_json, from_dict and schema methods of dataclasses_json """
+    for name in _METHODS:
+        setattr(cls, name, _method(name))
+    for name in _CLASSMETHODS:
+        setattr(cls, name, _classmethod(name))
+    return cls
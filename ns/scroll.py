@@ -0,0 +1,62 @@
+"""
+Paging through trip searches with the scroll context of the API.
+
+Every trips response carries a ``scrollRequestForwardContext``; passed back as
+``context``, it returns the advices following the last one, instead of a new
+search at a shifted dateTime that overlaps the previous one. Trips repeated at
+the seam of two pages are dropped by ctxRecon and checksum, and paging stops
+at the first trip departing after ``until``.
+
+    for trip in ns.scroll_trips(fromStation='UT', toStation='ASD', dateTime='2026-10-18T06:00:00+0200',
+                                until='2026-10-18T23:59:00+0200'):
+        print(trip.legs[0].origin.planned_datetime, trip.transfers)
+"""
+
+from datetime import datetime
+from typing import List, Optional, Set, Tuple, Union
+
+from ns.timestamps import epoch
+
+
+def departure(data: dict) -> Optional[int]:
+    """ Epoch seconds a raw trip departs, actual if known, else planned """
+    legs = data.get('legs') or ()
+    if not legs:
+        return None
+    origin = legs[0].get('origin') or {}
+    return epoch(origin.get('actualDateTime') or origin.get('plannedDateTime'))
+
+
+class TripScroll():
+    """ Position in a paged trip search, filtering every page down to the trips not seen before """
+
+    def __init__(self, params: dict, until: Union[str, int, datetime] = None, max_pages: int = None):
+        self.params = params
+        self.until = epoch(until)
+        self.max_pages = max_pages
+        self.pages = 0
+        self.duplicates = 0
+        self._seen: Set[str] = set()  # ctxRecon and checksums of the previous page only, pages overlap at their seam
+
+    def page(self, response: dict) -> Tuple[List[dict], Optional[dict]]:
+        """ The new raw trips of a response within the time bound, and the params of the next page (None when done) """
+        self.pages += 1
+        trips, seen, past = [], set(), False
+        for data in response.get('trips') or ():
+            keys = {key for key in (data.get('ctxRecon'), data.get('checksum')) if key}
+            if keys & self._seen or keys & seen:
+                self.duplicates += 1
+                continue
+            seen |= keys
+            departs = departure(data)
+            if self.until is not None and departs is not None and departs > self.until:
+                past = True
+                continue
+            trips.append(data)
+        self._seen = seen
+
+        context = response.get('scrollRequestForwardContext')
+        # A page without new trips would not move the search forward
+        if past or not context or not trips or (self.max_pages is not None and self.pages >= self.max_pages):
+            return trips, None
+        return trips, {**self.params, 'context': context}
@@ -0,0 +1,168 @@
+"""
+Index over the station list of get_all_stations, for constant time lookups
+of codes and names, name search and nearest station queries.
+
+    index = StationIndex(ns.get_all_stations())
+    index.get('8400621')
+    index.search('amsterdam')
+    index.nearest(52.09, 5.11, k=3)
+"""
+
+import bisect
+import difflib
+import math
+import pickle
+import unicodedata
+from collections import defaultdict
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from ns.models import Station
+
+EARTH_RADIUS = 6371.0  # km
+KM_PER_DEGREE = 2 * math.pi * EARTH_RADIUS / 360
+
+
+def normalize(name: str) -> str:
+    """ Case and accent insensitive form of a station name """
+    name = unicodedata.normalize('NFKD', name)
+    name = ''.join(c for c in name if not unicodedata.combining(c) and (c.isalnum() or c.isspace()))
+    return ' '.join(name.casefold().split())
+
+
+def distance(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """ Great circle distance in km """
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS * math.asin(min(1.0, math.sqrt(a)))
+
+
+class StationIndex():
+    """ Lookups on every station identifier, prefix and fuzzy name search, and a grid for spatial queries """
+
+    def __init__(self, stations: Iterable[Station], cell_size: float = 0.1):
+        self.stations = list(stations)
+        self.cell_size = cell_size
+        self.codes: Dict[str, Station] = {}
+        self.names: Dict[str, Station] = {}
+        self.grid: Dict[Tuple[int, int], List[Station]] = defaultdict(list)
+
+        for station in self.stations:
+            for code in (station.code, station.uic_code, station.eva_code):
+                if code:
+                    self.codes.setdefault(code.upper(), station)
+            for name in self._names(station):
+                self.names.setdefault(normalize(name), station)
+            if station.latitude is not None and station.longitude is not None:
+                self.grid[self._cell(station.latitude, station.longitude)].append(station)
+
+        self.grid = dict(self.grid)
+        self._sorted_names = sorted(self.names)
+        if self.grid:
+            rows, columns = zip(*self.grid)
+            self._bounds = (min(rows), max(rows), min(columns), max(columns))
+
+    def __len__(self) -> int:
+        return len(self.stations)
+
+    def __iter__(self) -> Iterator[Station]:
+        return iter(self.stations)
+
+    def __contains__(self, identifier: str) -> bool:
+        return self.get(identifier) is not None
+
+    def __getitem__(self, identifier: str) -> Station:
+        station = self.get(identifier)
+        if station is None:
+            raise KeyError(identifier)
+        return station
+
+    def get(self, identifier: str) -> Optional[Station]:
+        """ Station by code, UIC code, EVA code, name or synonym """
+        return self.codes.get(identifier.upper()) or self.names.get(normalize(identifier))
+
+    def search(self, prefix: str, limit: int = 10) -> List[Station]:
+        """ Stations with a name or synonym starting with prefix, alphabetically """
+        prefix = normalize(prefix)
+        results = []
+        for i in range(bisect.bisect_left(self._sorted_names, prefix), len(self._sorted_names)):
+            name = self._sorted_names[i]
+            if not name.startswith(prefix) or len(results) >= limit:
+                break
+            station = self.names[name]
+            if station not in results:
+                results.append(station)
+        return results
+
+    def fuzzy(self, query: str, limit: int = 5, cutoff: float = 0.6) -> List[Station]:
+        """ Stations with a name or synonym resembling query, best match first """
+        results = []
+        for name in difflib.get_close_matches(normalize(query), self._sorted_names, n=limit * 3, cutoff=cutoff):
+            station = self.names[name]
+            if station not in results:
+                results.append(station)
+        return results[:limit]
+
+    def within(self, latitude: float, longitude: float, radius: float) -> List[Tuple[Station, float]]:
+        """ Stations within radius km, with their distance, nearest first """
+        rings = int(radius / self._cell_km(latitude)) + 1
+        found = [(station, distance(latitude, longitude, station.latitude, station.longitude))
+                 for station in self._ring_stations(latitude, longitude, range(rings + 1))]
+        return sorted((item for item in found if item[1] <= radius), key=lambda item: item[1])
+
+    def nearest(self, latitude: float, longitude: float, k: int = 1) -> List[Tuple[Station, float]]:
+        """ The k nearest stations, with their distance in km, nearest first """
+        found = []
+        cell_km = self._cell_km(latitude)
+        ring = 0
+        while ring <= self._max_ring(latitude, longitude):
+            found.extend((station, distance(latitude, longitude, station.latitude, station.longitude))
+                         for station in self._ring_stations(latitude, longitude, (ring,)))
+            found.sort(key=lambda item: item[1])
+            # Stations outside this ring are at least ring * cell size away
+            if len(found) >= k and found[k - 1][1] <= ring * cell_km:
+                break
+            ring += 1
+        return found[:k]
+
+    def save(self, path: str):
+        with open(path, 'wb') as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, path: str) -> 'StationIndex':
+        with open(path, 'rb') as f:
+            index = pickle.load(f)
+        if not isinstance(index, cls):
+            raise TypeError(f'{path} does not contain a {cls.__name__}')
+        return index
+
+    @staticmethod
+    def _names(station: Station) -> Iterable[str]:
+        yield from (station.names or {}).values()
+        yield from station.synonyms or ()
+
+    def _cell(self, latitude: float, longitude: float) -> Tuple[int, int]:
+        return int(math.floor(latitude / self.cell_size)), int(math.floor(longitude / self.cell_size))
+
+    def _cell_km(self, latitude: float) -> float:
+        """ Lower bound of the width of a cell in km, around latitude """
+        return self.cell_size * KM_PER_DEGREE * max(math.cos(math.radians(min(abs(latitude) + self.cell_size, 90))), 0.01)
+
+    def _max_ring(self, latitude: float, longitude: float) -> int:
+        if not self.grid:
+            return -1
+        row, column = self._cell(latitude, longitude)
+        min_row, max_row, min_column, max_column = self._bounds
+        return max(abs(row - min_row), abs(row - max_row), abs(column - min_column), abs(column - max_column))
+
+    def _ring_stations(self, latitude: float, longitude: float, rings: Iterable[int]) -> Iterator[Station]:
+        """ Stations in the cells at exactly the given (Chebyshev) distances from the cell of a location """
+        row, column = self._cell(latitude, longitude)
+        for ring in rings:
+            for r in range(row - ring, row + ring + 1):
+                if abs(r - row) == ring:
+                    columns = range(column - ring, column + ring + 1)
+                else:
+                    columns = (column - ring, column + ring) if ring else (column,)
+                for c in columns:
+                    yield from self.grid.get((r, c), ())
@@ -0,0 +1,386 @@
+"""
+Persistent on-disk cache of slow-changing reference data: stations and prices.
+
+Responses are kept in one file per endpoint, in a compact binary format that
+is memory-mapped read-only, so any number of worker processes share a single
+copy through the page cache. A worker starting with a fresh store makes no
+gateway calls at all. Entries older than ``refresh_after`` are still served,
+while a refresh runs in the background; entries older than ``max_age`` are
+fetched again before returning.
+
+    store = PersistentCache('/var/cache/ns')
+    ns = NSAPI('yourkey', store=store)
+    ns.get_all_stations()  # from disk once stored, by any process
+
+Files start with a header (magic, format version, marshal version, number of
+entries), followed by an index sorted on key digest, then the entries. Files
+written by another format or Python version are ignored and rewritten. Updates
+are appended to a journal next to the file (``<path>.log``), one record per
+entry, so storing a response costs a single append. Once the journal holds as
+many entries as the file (and at least ``compact_after``), it is merged into a
+new file that is moved into place, so readers never see a partial file.
+Concurrent writers may drop each other's updates while compacting, which only
+costs a refetch. If writing the new file fails, the journal being merged is
+appended back to the journal, where the newest record of each key wins.
+
+The store keeps responses as parsed JSON, not as models, so every hit is still
+converted into the models of the client (compact, lazy or parsed). A hit saves
+the request and the JSON parsing. Loading marshalled JSON and decoding it is
+several times faster than loading the models from ns.binary.
+"""
+
+import bisect
+import hashlib
+import marshal
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterator, Optional, Set, Tuple
+from urllib.parse import urlencode, urlsplit
+
+from ns.metrics import endpoint
+
+MAGIC = b'NSDB'
+FORMAT_VERSION = 1
+
+# magic, format version, marshal version, number of entries
+_HEADER = struct.Struct('<4sHHI')
+# key digest, stored at (epoch seconds), offset, length
+_ENTRY = struct.Struct('<16sdQI')
+# marshal version, length of a journal record
+_RECORD = struct.Struct('<HI')
+
+# Seconds after which an entry is refetched before use, per endpoint
+DEFAULT_MAX_AGES = {
+    'stations': 7 * 24 * 60 * 60,
+    'prices': 24 * 60 * 60,
+}
+
+# Seconds after which an entry is refreshed in the background, per endpoint
+DEFAULT_REFRESH_AFTER = {
+    'stations': 24 * 60 * 60,
+    'prices': 6 * 60 * 60,
+}
+
+
+def _digest(key: str) -> bytes:
+    return hashlib.sha1(key.encode('utf-8')).digest()[:16]
+
+
+def _read_records(data: bytes, entries: Dict[bytes, Tuple[float, str, Any, int]]) -> int:
+    """ Adds the journal records in data to entries, returning the bytes read up to the first incomplete record """
+    position = 0
+    while position + _RECORD.size <= len(data):
+        marshal_version, length = _RECORD.unpack_from(data, position)
+        start = position + _RECORD.size
+        if start + length > len(data):
+            break
+        if marshal_version == marshal.version:
+            key, stored, value = marshal.loads(data[start:start + length])
+            digest = _digest(key)
+            # Records put back after a failed compaction may follow newer ones
+            if digest not in entries or entries[digest][0] <= stored:
+                entries[digest] = (stored, key, value, length)
+        position = start + length
+    return position
+
+
+class DiskStore():
+    """ Memory-mapped file of marshalled values by key, with a journal of the updates since it was last rewritten """
+
+    def __init__(self, path: str, compact_after: int = 64):
+        self.path = path
+        self.journal_path = path + '.log'
+        self.compact_after = compact_after
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._file = None
+        self._map = None
+        self._digests = []
+        self._stat = None
+        # Entries of the journal read so far: digest: (stored at, key, value, size)
+        self._journal: Dict[bytes, Tuple[float, str, Any, int]] = {}
+        self._journal_stat = None
+        self._journal_offset = 0
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._refresh()
+            return len(set(self._digests).union(self._journal))
+
+    def _refresh(self):
+        self._refresh_file()
+        self._refresh_journal()
+
+    def _refresh_file(self):
+        """ Maps the file again if another process (or this one) replaced it """
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            self._close()
+            return
+        identity = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if identity == self._stat:
+            return
+        self._close()
+        self._stat = identity
+        if stat.st_size < _HEADER.size:
+            return
+        self._file = open(self.path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, marshal_version, count = _HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != FORMAT_VERSION or marshal_version != marshal.version:
+            self._close()
+            self._stat = identity
+            return
+        self._digests = [_ENTRY.unpack_from(self._map, _HEADER.size + i * _ENTRY.size)[0] for i in range(count)]
+
+    def _refresh_journal(self):
+        """ Reads the records appended to the journal since the last call, from the start if it was replaced """
+        try:
+            with open(self.journal_path, 'rb') as f:
+                stat = os.fstat(f.fileno())
+                if stat.st_ino != self._journal_stat or stat.st_size < self._journal_offset:
+                    self._journal, self._journal_stat, self._journal_offset = {}, stat.st_ino, 0
+                if stat.st_size == self._journal_offset:
+                    return
+                f.seek(self._journal_offset)
+                data = f.read()
+        except FileNotFoundError:
+            self._journal, self._journal_stat, self._journal_offset = {}, None, 0
+            return
+        self._journal_offset += _read_records(data, self._journal)
+
+    def _close(self):
+        if self._map is not None:
+            self._map.close()
+            self._file.close()
+        self._file = self._map = self._stat = None
+        self._digests = []
+
+    def close(self):
+        with self._lock:
+            self._close()
+
+    def _entry(self, i: int) -> Tuple[float, str, Any, int]:
+        _, stored, offset, length = _ENTRY.unpack_from(self._map, _HEADER.size + i * _ENTRY.size)
+        key, value = marshal.loads(self._map[offset:offset + length])
+        return stored, key, value, length
+
+    def get(self, key: str) -> Optional[Tuple[float, Any, int]]:
+        """ Returns (stored at, value, stored size), or None """
+        digest = _digest(key)
+        with self._lock:
+            self._refresh()
+            entry = self._journal.get(digest)
+            if entry is None:
+                i = bisect.bisect_left(self._digests, digest)
+                if i == len(self._digests) or self._digests[i] != digest:
+                    return None
+                entry = self._entry(i)
+        stored, stored_key, value, size = entry
+        return (stored, value, size) if stored_key == key else None
+
+    def items(self) -> Iterator[Tuple[str, float, Any]]:
+        """ All (key, stored at, value) """
+        with self._lock:
+            self._refresh()
+            entries = {digest: self._entry(i) for i, digest in enumerate(self._digests)}
+            entries.update(self._journal)
+        for stored, key, value, _ in entries.values():
+            yield key, stored, value
+
+    def update(self, values: Dict[str, Any], stored: float = None):
+        """ Adds or replaces values, keeping the other entries """
+        stored = time.time() if stored is None else stored
+        records = []
+        for key, value in values.items():
+            blob = marshal.dumps((key, stored, value))
+            records.append(_RECORD.pack(marshal.version, len(blob)) + blob)
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with self._write_lock:
+            self._append(b''.join(records))
+            with self._lock:
+                self._refresh()
+                compact = len(self._journal) >= max(self.compact_after, len(self._digests))
+            if compact:
+                self._compact()
+
+    def _append(self, data: bytes):
+        fd = os.open(self.journal_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            # A single write, so that appends of other processes do not interleave with it
+            written = os.write(fd, data)
+            if written != len(data):
+                raise OSError(f'Short write to {self.journal_path}: {written} of {len(data)} bytes')
+        finally:
+            os.close(fd)
+
+    def compact(self):
+        """ Merges the journal into the file """
+        with self._write_lock:
+            self._compact()
+
+    def _compact(self):
+        # Appends from now on go to a new journal
+        compacting = f'{self.journal_path}.{os.getpid()}.{threading.get_ident()}'
+        try:
+            os.replace(self.journal_path, compacting)
+        except FileNotFoundError:
+            return
+        with open(compacting, 'rb') as f:
+            data = f.read()
+        try:
+            journal: Dict[bytes, Tuple[float, str, Any, int]] = {}
+            _read_records(data, journal)
+            with self._lock:
+                self._refresh_file()
+                entries = {digest: self._entry(i) for i, digest in enumerate(self._digests)}
+            entries.update(journal)
+            self._write({digest: (key, stored, value) for digest, (stored, key, value, _) in entries.items()})
+        except BaseException:
+            # Put the updates back, so they are merged by the next compaction instead of lost
+            self._append(data)
+            os.unlink(compacting)
+            raise
+        os.unlink(compacting)
+
+    def _write(self, entries: Dict[bytes, Tuple[str, float, Any]]):
+        digests = sorted(entries)
+        blobs = [marshal.dumps((entries[d][0], entries[d][2])) for d in digests]
+        offset = _HEADER.size + len(digests) * _ENTRY.size
+        index = []
+        for digest, blob in zip(digests, blobs):
+            index.append(_ENTRY.pack(digest, entries[digest][1], offset, len(blob)))
+            offset += len(blob)
+
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix='.' + os.path.basename(self.path))
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(_HEADER.pack(MAGIC, FORMAT_VERSION, marshal.version, len(digests)))
+                f.writelines(index)
+                f.writelines(blobs)
+            os.replace(tmp, self.path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+
+class PersistentCache():
+    """ Stale-while-revalidate cache of reference data responses, backed by a DiskStore per endpoint """
+
+    def __init__(self, directory: str, max_ages: Dict[str, float] = None, refresh_after: Dict[str, float] = None,
+                 clock: Callable[[], float] = time.time):
+        self.directory = directory
+        self.max_ages = {**DEFAULT_MAX_AGES, **(max_ages or {})}
+        self.refresh_after = {**DEFAULT_REFRESH_AFTER, **(refresh_after or {})}
+        self.clock = clock
+        self.stores = {name: DiskStore(os.path.join(directory, f'{name}.nsdb')) for name in self.max_ages}
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.refresh_errors = 0
+        self._refreshing: Set[str] = set()
+        self._tasks: Set['asyncio.Task'] = set()
+        self._lock = threading.Lock()
+
+    def handles(self, url: str) -> bool:
+        return endpoint(url) in self.stores
+
+    @staticmethod
+    def key(url: str, params: Optional[dict] = None) -> str:
+        """ Path and sorted query of a request, so gateways on other hosts share entries """
+        query = urlencode(sorted((k, str(v)) for k, v in (params or {}).items() if v is not None))
+        return f'{urlsplit(url).path}?{query}'
+
+    def _lookup(self, url: str, params: Optional[dict]) -> Tuple[DiskStore, str, Optional[Tuple[Any, int]], bool]:
+        """ Returns (store, key, (value, size) or None, whether to refresh in the background) """
+        name = endpoint(url)
+        store, key = self.stores[name], self.key(url, params)
+        entry = store.get(key)
+        hit, refresh = None, False
+        if entry is not None:
+            stored, value, size = entry
+            age = self.clock() - stored
+            if age < self.max_ages[name]:
+                hit = value, size
+                refresh = age >= self.refresh_after.get(name, self.max_ages[name])
+        with self._lock:
+            if hit is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            refresh = refresh and key not in self._refreshing
+            if refresh:
+                self._refreshing.add(key)
+        return store, key, hit, refresh
+
+    def fetch(self, url: str, params: Optional[dict], request: Callable[[], Tuple[Any, int]]) -> Tuple[Any, int]:
+        """ Like request(), returning (response, size), but from the store when it holds a fresh enough response """
+        store, key, hit, refresh = self._lookup(url, params)
+        if refresh:
+            threading.Thread(target=self._refresh, args=(store, key, request), name='ns-store-refresh', daemon=True).start()
+        if hit is not None:
+            return hit
+        value, size = request()
+        store.update({key: value}, self.clock())
+        return value, size
+
+    async def fetch_async(self, url: str, params: Optional[dict],
+                          request: Callable[[], Awaitable[Tuple[Any, int]]]) -> Tuple[Any, int]:
+        """ Like fetch, for a coroutine function request """
+        import asyncio
+
+        store, key, hit, refresh = self._lookup(url, params)
+        if refresh:
+            task = asyncio.get_running_loop().create_task(self._refresh_async(store, key, request))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        if hit is not None:
+            return hit
+        value, size = await request()
+        await asyncio.get_running_loop().run_in_executor(None, store.update, {key: value}, self.clock())
+        return value, size
+
+    def _refresh(self, store: DiskStore, key: str, request: Callable[[], Tuple[Any, int]]):
+        try:
+            value, _ = request()
+            store.update({key: value}, self.clock())
+            self.refreshes += 1
+        except Exception:
+            # Keep serving the stored response, and try again on the next request
+            self.refresh_errors += 1
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    async def _refresh_async(self, store: DiskStore, key: str, request: Callable[[], Awaitable[Tuple[Any, int]]]):
+        import asyncio
+
+        try:
+            value, _ = await request()
+            await asyncio.get_running_loop().run_in_executor(None, store.update, {key: value}, self.clock())
+            self.refreshes += 1
+        except Exception:
+            self.refresh_errors += 1
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def stats(self) -> dict:
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'refreshes': self.refreshes,
+            'refresh_errors': self.refresh_errors,
+            'entries': {name: len(store) for name, store in self.stores.items()},
+        }
+
+    def close(self):
+        for store in self.stores.values():
+            store.close()
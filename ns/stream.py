@@ -0,0 +1,126 @@
+"""
+Incremental parsing of one array member of a JSON object, e.g. the ``trips`` of
+a travel advice, from the chunks of a response body as they arrive.
+
+    stream = ArrayStream('trips')
+    for chunk in chunks:
+        for trip in stream.feed(chunk):
+            ...
+    stream.close()
+    stream.rest  # the other members, e.g. scrollRequestForwardContext
+"""
+
+import codecs
+import json
+import re
+from typing import Any, Dict, Iterator, List
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+_INCOMPLETE = object()
+
+_OBJECT, _KEY, _COLON, _VALUE, _ARRAY, _ELEMENT, _DONE = range(7)
+
+
+class ArrayStream():
+    """ Push parser yielding the elements of the array under `key` of a top-level JSON object """
+
+    def __init__(self, key: str):
+        self.key = key
+        self.rest: Dict[str, Any] = {}
+        self._decoder = codecs.getincrementaldecoder('utf-8')()
+        self._json = json.JSONDecoder()
+        self._text = ''
+        self._pos = 0
+        self._wait = 0
+        self._eof = False
+        self._state = _OBJECT
+        self._member = None
+
+    def feed(self, chunk: bytes) -> List[Any]:
+        """ Adds a chunk of the body, returning the array elements completed by it """
+        self._text = self._text[self._pos:] + self._decoder.decode(chunk)
+        self._pos = 0
+        if len(self._text) < self._wait:
+            return []
+        return list(self._parse())
+
+    def close(self) -> List[Any]:
+        """ Ends the body, returning the remaining array elements """
+        self._text = self._text[self._pos:] + self._decoder.decode(b'', final=True)
+        self._pos = 0
+        self._eof = True
+        items = list(self._parse())
+        if self._state != _DONE:
+            raise ValueError('Incomplete JSON document')
+        return items
+
+    def _decode(self) -> Any:
+        """ Decodes the value at the current position, or returns _INCOMPLETE if more data is needed """
+        try:
+            value, end = self._json.raw_decode(self._text, self._pos)
+        except json.JSONDecodeError:
+            if self._eof:
+                raise
+            value, end = _INCOMPLETE, len(self._text)
+        if end == len(self._text) and not self._eof and not isinstance(value, (dict, list, str)):
+            # A number (or the start of a value) could be cut off, wait until the buffer has doubled to keep retries
+            # linear. Objects, arrays and strings end in their closing character, so they are complete.
+            self._wait = 2 * (len(self._text) - self._pos)
+            return _INCOMPLETE
+        self._wait = 0
+        self._pos = end
+        return value
+
+    def _expect(self, char: str):
+        if self._text[self._pos] != char:
+            raise ValueError(f'Expected {char!r} at {self._text[self._pos:self._pos + 20]!r}')
+        self._pos += 1
+
+    def _parse(self) -> Iterator[Any]:
+        while True:
+            self._pos = _WHITESPACE.match(self._text, self._pos).end()
+            if self._pos >= len(self._text) or self._state == _DONE:
+                return
+            char = self._text[self._pos]
+
+            if self._state == _OBJECT:
+                self._expect('{')
+                self._state = _KEY
+            elif self._state == _KEY:
+                if char == '}':
+                    self._pos += 1
+                    self._state = _DONE
+                elif char == ',':
+                    self._pos += 1
+                else:
+                    member = self._decode()
+                    if member is _INCOMPLETE:
+                        return
+                    self._member = member
+                    self._state = _COLON
+            elif self._state == _COLON:
+                self._expect(':')
+                self._state = _ARRAY if self._member == self.key else _VALUE
+            elif self._state == _ARRAY and char == '[':
+                self._pos += 1
+                self._state = _ELEMENT
+            elif self._state in (_ARRAY, _VALUE):
+                value = self._decode()
+                if value is _INCOMPLETE:
+                    return
+                if self._state == _ARRAY and value is not None:
+                    yield from value
+                else:
+                    self.rest[self._member] = value
+                self._state = _KEY
+            elif self._state == _ELEMENT:
+                if char == ']':
+                    self._pos += 1
+                    self._state = _KEY
+                elif char == ',':
+                    self._pos += 1
+                else:
+                    item = self._decode()
+                    if item is _INCOMPLETE:
+                        return
+                    yield item
@@ -0,0 +1,77 @@
+"""
+Fast parsing of the fixed format timestamps of the API, e.g. 2026-10-18T10:04:00+0200.
+
+Departure boards and trips repeat the same timestamps many times, so parsed
+values are cached.
+"""
+
+from datetime import date, datetime, timedelta, timezone
+from functools import lru_cache
+from typing import Optional, Union
+
+_EPOCH = date(1970, 1, 1).toordinal()
+
+
+@lru_cache(maxsize=1024)
+def _days(day: str) -> int:
+    return date(int(day[0:4]), int(day[5:7]), int(day[8:10])).toordinal() - _EPOCH
+
+
+@lru_cache(maxsize=64)
+def _offset(offset: str) -> int:
+    """ Seconds east of UTC of +0200, +02:00 or Z """
+    if offset in ('', 'Z'):
+        return 0
+    sign = -1 if offset[0] == '-' else 1
+    digits = offset[1:].replace(':', '')
+    return sign * (int(digits[0:2]) * 3600 + int(digits[2:4]) * 60)
+
+
+@lru_cache(maxsize=65536)
+def to_epoch(value: str) -> int:
+    """ Seconds since the epoch of a timestamp """
+    if len(value) < 19 or value[10] != 'T':
+        return int(datetime.fromisoformat(value).timestamp())
+    seconds = int(value[11:13]) * 3600 + int(value[14:16]) * 60 + int(value[17:19])
+    rest = value[19:]
+    if rest.startswith('.'):
+        rest = rest.lstrip('.0123456789')
+    return _days(value[:10]) * 86400 + seconds - _offset(rest)
+
+
+@lru_cache(maxsize=64)
+def _timezone(offset: int) -> timezone:
+    return timezone(timedelta(seconds=offset))
+
+
+@lru_cache(maxsize=65536)
+def to_datetime(value: str) -> datetime:
+    """ Timezone aware datetime of a timestamp, in the timezone it is given in """
+    rest = value[19:]
+    if rest.startswith('.'):
+        rest = rest.lstrip('.0123456789')
+    offset = _offset(rest) if len(value) >= 19 and value[10] == 'T' else 0
+    return datetime.fromtimestamp(to_epoch(value), _timezone(offset))
+
+
+def optional_epoch(value: Optional[str]) -> Optional[int]:
+    return to_epoch(value) if value else None
+
+
+def epoch(value: Union[str, int, datetime, None]) -> Optional[int]:
+    """ Seconds since the epoch of a raw timestamp, a parsed datetime or epoch seconds """
+    if value is None or value == '':
+        return None
+    if isinstance(value, str):
+        return to_epoch(value)
+    if isinstance(value, datetime):
+        return int(value.timestamp())
+    return value
+
+
+def seconds_between(start, end) -> Optional[int]:
+    """ Seconds from start to end, None if either is missing """
+    start, end = epoch(start), epoch(end)
+    if start is None or end is None:
+        return None
+    return end - start
@@ -0,0 +1,150 @@
+"""
+Tracking of followed trips for AsyncNSAPI.
+
+Followers of the same trip, by ``ctxRecon`` or by the ``checksum`` of a trip
+found with get_trips, share a single tracked trip: it is reconstructed with
+get_trip every ``interval`` seconds, however many followers it has, and
+decoded only when its realtime fields changed. Followers are only notified of
+such changes, all getting the same decoded Trip.
+
+    async with AsyncNSAPI('yourkey') as ns:
+        trip = (await ns.get_trips(fromStation='UT', toStation='ASD'))[0]
+        async for update in ns.follow_trip(trip.ctx_recon, trip.checksum):
+            print(update.changed_legs, update.trip.legs[0].origin.actual_track)
+"""
+
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Awaitable, Callable, Dict, Hashable, List, Optional, Set, Tuple
+
+from ns.decoder import decode
+from ns.models import Trip
+
+
+@dataclass
+class TripUpdate:
+    ctx_recon: str
+    trip: Optional[Trip] = None  # Shared by all followers, do not modify
+    changed_legs: List[int] = field(default_factory=list)  # Indices of the legs whose realtime fields changed
+    error: Optional[Exception] = None  # Set, without changes, when refreshing failed
+
+
+def _point(data: dict) -> Hashable:
+    return data.get('actualDateTime'), data.get('actualTrack'), data.get('cancelled')
+
+
+def _stop(data: dict) -> Hashable:
+    return (data.get('actualArrivalDateTime'), data.get('actualDepartureDateTime'), data.get('actualArrivalTrack'),
+            data.get('actualDepartureTrack'), data.get('arrivalDelayInSeconds'), data.get('departureDelayInSeconds'),
+            data.get('cancelled'))
+
+
+def leg_version(data: dict) -> Hashable:
+    """ The realtime fields of a raw leg: delays, tracks and cancellations of the leg and its stops """
+    return (data.get('cancelled'), _point(data.get('origin') or {}), _point(data.get('destination') or {}),
+            tuple(_stop(stop) for stop in data.get('stops') or ()))
+
+
+def trip_version(data: dict) -> Tuple[Hashable, ...]:
+    """ The realtime fields of a raw trip, per leg """
+    return (data.get('status'),) + tuple(leg_version(leg) for leg in data.get('legs') or ())
+
+
+class _Tracked():
+    __slots__ = ('ctx_recon', 'params', 'checksum', 'version', 'trip', 'followers', 'task')
+
+    def __init__(self, ctx_recon: str, params: dict, checksum: Optional[str]):
+        self.ctx_recon = ctx_recon
+        self.params = params
+        self.checksum = checksum
+        self.version: Optional[Tuple[Hashable, ...]] = None
+        self.trip: Optional[Trip] = None
+        self.followers: Set['asyncio.Queue'] = set()
+        self.task: Optional['asyncio.Task'] = None
+
+
+class TripTracker():
+    """ Shared, scheduled refreshing of followed trips, fanned out to their followers """
+
+    def __init__(self, fetch: Callable[[str, dict], Awaitable[dict]], convert: Callable[[dict], Trip] = None,
+                 interval: float = 60, concurrency: int = 10):
+        """ fetch(ctx_recon, params) returns the raw trip reconstructed from ctx_recon """
+        self.fetch = fetch
+        self.convert = convert or (lambda data: decode(data, Trip))
+        self.interval = interval
+        self.concurrency = concurrency
+        self.refreshes = 0
+        self.trips: Dict[Hashable, _Tracked] = {}
+        self._checksums: Dict[str, _Tracked] = {}
+        self._semaphore: Optional['asyncio.Semaphore'] = None
+
+    def __len__(self) -> int:
+        return len(self.trips)
+
+    def _track(self, ctx_recon: str, checksum: Optional[str], params: dict) -> _Tracked:
+        key = (ctx_recon, tuple(sorted(params.items())))
+        tracked = self.trips.get(key)
+        if tracked is None and checksum is not None:
+            tracked = self._checksums.get(checksum)
+        if tracked is None:
+            tracked = self.trips[key] = _Tracked(ctx_recon, params, checksum)
+            if checksum is not None:
+                self._checksums[checksum] = tracked
+        return tracked
+
+    def _untrack(self, tracked: _Tracked):
+        tracked.task.cancel()
+        self.trips = {key: other for key, other in self.trips.items() if other is not tracked}
+        self._checksums = {checksum: other for checksum, other in self._checksums.items() if other is not tracked}
+
+    async def follow(self, ctx_recon: str, checksum: str = None, params: dict = None) -> AsyncIterator[TripUpdate]:
+        """ Updates of a trip, starting with the trip itself, then whenever its realtime fields change.
+        The trip stops being refreshed once its last follower is closed or cancelled. """
+        import asyncio
+
+        tracked = self._track(ctx_recon, checksum, params or {})
+        queue: asyncio.Queue = asyncio.Queue()
+        tracked.followers.add(queue)
+        if tracked.trip is not None:
+            queue.put_nowait(TripUpdate(tracked.ctx_recon, tracked.trip, list(range(len(tracked.trip.legs or ())))))
+        if tracked.task is None:
+            tracked.task = asyncio.get_running_loop().create_task(self._refresh(tracked))
+        try:
+            while True:
+                yield await queue.get()
+        finally:
+            tracked.followers.discard(queue)
+            if not tracked.followers:
+                self._untrack(tracked)
+
+    async def _refresh(self, tracked: _Tracked):
+        import asyncio
+
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        while True:
+            try:
+                async with self._semaphore:
+                    data = await self.fetch(tracked.ctx_recon, tracked.params)
+            except Exception as e:
+                update = TripUpdate(tracked.ctx_recon, tracked.trip, error=e)
+            else:
+                self.refreshes += 1
+                update = self._update(tracked, data)
+            if update is not None:
+                for queue in tracked.followers:
+                    queue.put_nowait(update)
+            await asyncio.sleep(self.interval)
+
+    def _update(self, tracked: _Tracked, data: dict) -> Optional[TripUpdate]:
+        """ Decodes a refreshed trip if its realtime fields changed, returning the update for the followers """
+        version = trip_version(data)
+        if version == tracked.version:
+            return None
+        previous = tracked.version or ()
+        changed = [i for i, leg in enumerate(version[1:]) if i + 1 >= len(previous) or previous[i + 1] != leg]
+        tracked.version = version
+        tracked.trip = self.convert(data)
+        if data.get('checksum') and data['checksum'] != tracked.checksum:
+            tracked.checksum = data['checksum']
+            self._checksums.setdefault(tracked.checksum, tracked)
+        return TripUpdate(tracked.ctx_recon, tracked.trip, changed)
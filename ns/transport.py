@@ -0,0 +1,321 @@
+"""
+Connection pooling, timeouts and retries of the HTTP clients.
+
+    options = TransportOptions(pool_maxsize=50, read_timeout=10, retry=RetryPolicy(total=5))
+    ns = NSAPI('yourkey', transport=options)
+
+The clients do their I/O through a transport: RequestsTransport for NSAPI,
+AiohttpTransport for AsyncNSAPI, or HttpxTransport for AsyncNSAPI with
+``http2=True``, which multiplexes concurrent requests over a single HTTP/2
+connection. A transport makes single attempts; retries, caching and decoding
+are left to the clients, so they apply whichever transport is used.
+"""
+
+import email.utils
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Callable, Iterator, Mapping, Optional, Tuple
+
+import requests
+
+
+@dataclass
+class RetryPolicy:
+    """ Exponential backoff with full jitter, honouring Retry-After up to max_backoff """
+    total: int = 3
+    backoff: float = 0.5
+    max_backoff: float = 30.0  # Seconds, also the longest Retry-After waited for
+    jitter: bool = True
+    statuses: Tuple[int, ...] = (429, 500, 502, 503, 504)
+    connection_errors: bool = True
+    respect_retry_after: bool = True
+
+    def delay(self, attempt: int, status: Optional[int] = None, retry_after: Optional[str] = None) -> Optional[float]:
+        """ Seconds to wait before retrying, or None if the failed attempt (0-based) should not be retried.
+        A status of None means the request failed before a response arrived. """
+        if attempt >= self.total:
+            return None
+        if status is None and not self.connection_errors:
+            return None
+        if status is not None and status not in self.statuses:
+            return None
+        if retry_after and self.respect_retry_after:
+            seconds = parse_retry_after(retry_after)
+            if seconds is not None:
+                return min(self.max_backoff, seconds)
+        delay = min(self.max_backoff, self.backoff * 2 ** attempt)
+        return random.uniform(0, delay) if self.jitter else delay
+
+
+NO_RETRY = RetryPolicy(total=0)
+
+
+def parse_retry_after(value: str) -> Optional[float]:
+    """ Seconds from a Retry-After header, given in seconds or as an HTTP date """
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        date = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, date.timestamp() - time.time())
+
+
+@dataclass
+class TransportOptions:
+    """ Connection settings shared by NSAPI (requests) and AsyncNSAPI (aiohttp) """
+    pool_maxsize: int = 10  # Connections kept per host
+    pool_connections: int = 10  # Hosts to keep a pool for (requests)
+    pool_block: bool = False  # Wait for a free connection instead of opening a throwaway one (requests)
+    limit: int = 100  # Connections in total (aiohttp)
+    keep_alive: bool = True
+    keepalive_timeout: float = 15.0  # Seconds an idle connection is kept open (aiohttp)
+    connect_timeout: Optional[float] = 10.0
+    read_timeout: Optional[float] = 30.0
+    dns_cache_ttl: Optional[int] = 300  # Seconds, None disables the DNS cache (aiohttp)
+    http2: bool = False  # Multiplex requests over one HTTP/2 connection per host, needs httpx[http2] (AsyncNSAPI)
+    retry: RetryPolicy = field(default_factory=RetryPolicy)
+
+    @property
+    def timeout(self) -> Tuple[Optional[float], Optional[float]]:
+        """ requests timeout """
+        return self.connect_timeout, self.read_timeout
+
+    def session(self) -> requests.Session:
+        """ requests Session with a connection pool per these options """
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=self.pool_connections, pool_maxsize=self.pool_maxsize,
+                                                pool_block=self.pool_block, max_retries=0)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        if not self.keep_alive:
+            session.headers['Connection'] = 'close'
+        return session
+
+    def connector(self):
+        """ aiohttp TCPConnector per these options, to be created inside the event loop """
+        import aiohttp
+
+        options = {}
+        if self.keep_alive:
+            options['keepalive_timeout'] = self.keepalive_timeout
+        else:
+            options['force_close'] = True
+        return aiohttp.TCPConnector(limit=self.limit, limit_per_host=self.pool_maxsize,
+                                    use_dns_cache=self.dns_cache_ttl is not None, ttl_dns_cache=self.dns_cache_ttl,
+                                    **options)
+
+    def client_timeout(self):
+        """ aiohttp ClientTimeout per these options """
+        import aiohttp
+
+        return aiohttp.ClientTimeout(total=None, sock_connect=self.connect_timeout, sock_read=self.read_timeout)
+
+    def async_transport(self, instrumentation=None, observer: 'Observer' = None):
+        """ Transport of AsyncNSAPI per these options, to be created inside the event loop """
+        if self.http2:
+            return HttpxTransport(self, observer)
+        import aiohttp
+
+        trace_configs = [instrumentation.trace_config()] if instrumentation is not None else []
+        if observer is not None:
+            trace_configs.append(observer_trace_config(observer))
+        return AiohttpTransport(aiohttp.ClientSession(connector=self.connector(), timeout=self.client_timeout(),
+                                                      trace_configs=trace_configs or None))
+
+
+# (status, Retry-After) of a failed attempt, status None if no response arrived
+Failure = Tuple[Optional[int], Optional[str]]
+
+# Called with the status and headers of every response, e.g. Scheduler.observe
+Observer = Callable[[int, Mapping[str, str]], None]
+
+
+def observer_trace_config(observer: Observer):
+    """ aiohttp TraceConfig passing every response to observer """
+    import aiohttp
+
+    async def on_request_end(session, context, params):
+        observer(params.response.status, params.response.headers)
+
+    trace_config = aiohttp.TraceConfig()
+    trace_config.on_request_end.append(on_request_end)
+    return trace_config
+
+
+class RequestsTransport():
+    """ Blocking requests over a requests Session """
+
+    errors = (requests.exceptions.HTTPError, requests.exceptions.ConnectionError, requests.exceptions.Timeout)
+
+    def __init__(self, session: requests.Session, timeout: Tuple[Optional[float], Optional[float]], observer: Observer = None):
+        self.session = session
+        self.timeout = timeout
+        if observer is not None:
+            session.hooks['response'].append(lambda response, *args, **kwargs: observer(response.status_code, response.headers))
+
+    @staticmethod
+    def failure(error: Exception) -> Failure:
+        response = getattr(error, 'response', None)
+        if response is None:
+            return None, None
+        return response.status_code, response.headers.get('Retry-After')
+
+    def get(self, url: str, headers: dict, params: Optional[dict]) -> Tuple[Any, int]:
+        """ Returns (parsed JSON, size of the body) """
+        with self.session.get(url, headers=headers, params=params, timeout=self.timeout) as request:
+            request.raise_for_status()
+            return request.json(), len(request.content)
+
+    def get_instrumented(self, url: str, headers: dict, params: Optional[dict], metrics, route: str) -> Tuple[Any, int]:
+        start = time.perf_counter()
+        with self.session.get(url, headers=headers, params=params, timeout=self.timeout) as request:
+            downloaded = time.perf_counter()
+            metrics.status(route, request.status_code)
+            metrics.timing(route, 'ttfb', request.elapsed.total_seconds())
+            metrics.timing(route, 'download', max(0.0, downloaded - start - request.elapsed.total_seconds()))
+            request.raise_for_status()
+            response = request.json()
+            metrics.timing(route, 'parse', time.perf_counter() - downloaded)
+            metrics.size(route, len(request.content))
+            metrics.timing(route, 'total', time.perf_counter() - start)
+            return response, len(request.content)
+
+    def get_conditional(self, url: str, headers: dict, params: Optional[dict]) -> Tuple[Mapping[str, str], Any]:
+        """ Returns (response headers, parsed JSON), the JSON None for 304 Not Modified """
+        with self.session.get(url, headers=headers, params=params, timeout=self.timeout) as request:
+            if request.status_code == 304:
+                return request.headers, None
+            request.raise_for_status()
+            return request.headers, request.json()
+
+    def chunks(self, url: str, headers: dict, params: Optional[dict], chunk_size: int) -> Iterator[bytes]:
+        """ The body, as it is downloaded """
+        with self.session.get(url, headers=headers, params=params, stream=True, timeout=self.timeout) as request:
+            request.raise_for_status()
+            yield from request.iter_content(chunk_size=chunk_size)
+
+    def close(self):
+        self.session.close()
+
+
+class AiohttpTransport():
+    """ Async requests over an aiohttp ClientSession """
+
+    def __init__(self, session):
+        import asyncio
+        import aiohttp
+
+        self.session = session
+        self.errors = (aiohttp.ClientResponseError, aiohttp.ClientConnectionError, asyncio.TimeoutError)
+
+    @staticmethod
+    def failure(error: Exception) -> Failure:
+        headers = getattr(error, 'headers', None)
+        return getattr(error, 'status', None), headers.get('Retry-After') if headers else None
+
+    async def get(self, url: str, headers: dict, params: Optional[dict]) -> Tuple[Any, int]:
+        async with self.session.get(url, headers=headers, params=params) as request:
+            request.raise_for_status()
+            body = await request.read()
+            return await request.json(), len(body)
+
+    async def get_instrumented(self, url: str, headers: dict, params: Optional[dict], metrics, route: str) -> Tuple[Any, int]:
+        start = time.perf_counter()
+        async with self.session.get(url, headers=headers, params=params) as request:
+            metrics.status(route, request.status)
+            request.raise_for_status()
+            received = time.perf_counter()
+            body = await request.read()
+            downloaded = time.perf_counter()
+            metrics.timing(route, 'download', downloaded - received)
+            response = await request.json()
+            metrics.timing(route, 'parse', time.perf_counter() - downloaded)
+            metrics.size(route, len(body))
+            metrics.timing(route, 'total', time.perf_counter() - start)
+            return response, len(body)
+
+    async def get_conditional(self, url: str, headers: dict, params: Optional[dict]) -> Tuple[Mapping[str, str], Any]:
+        async with self.session.get(url, headers=headers, params=params) as request:
+            if request.status == 304:
+                return request.headers, None
+            request.raise_for_status()
+            return request.headers, await request.json()
+
+    async def chunks(self, url: str, headers: dict, params: Optional[dict], chunk_size: int) -> AsyncIterator[bytes]:
+        async with self.session.get(url, headers=headers, params=params) as request:
+            request.raise_for_status()
+            async for chunk in request.content.iter_chunked(chunk_size):
+                yield chunk
+
+    async def close(self):
+        await self.session.close()
+
+
+class HttpxTransport():
+    """ Async requests over an httpx AsyncClient, multiplexed over one HTTP/2 connection per host """
+
+    def __init__(self, options: TransportOptions, observer: Observer = None):
+        try:
+            import httpx
+        except ImportError as e:
+            raise ImportError('http2 needs httpx with HTTP/2 support, install ns-api[http2]') from e
+
+        limits = httpx.Limits(max_connections=options.limit,
+                              max_keepalive_connections=options.pool_maxsize if options.keep_alive else 0,
+                              keepalive_expiry=options.keepalive_timeout)
+        timeout = httpx.Timeout(None, connect=options.connect_timeout, read=options.read_timeout)
+        hooks = {}
+        if observer is not None:
+            async def observe(response):
+                observer(response.status_code, response.headers)
+            hooks['response'] = [observe]
+        self.session = httpx.AsyncClient(http2=True, limits=limits, timeout=timeout, event_hooks=hooks)
+        self.errors = (httpx.HTTPStatusError, httpx.TransportError)
+
+    @staticmethod
+    def failure(error: Exception) -> Failure:
+        response = getattr(error, 'response', None)
+        if response is None:
+            return None, None
+        return response.status_code, response.headers.get('Retry-After')
+
+    async def get(self, url: str, headers: dict, params: Optional[dict]) -> Tuple[Any, int]:
+        response = await self.session.get(url, headers=headers, params=params)
+        response.raise_for_status()
+        return response.json(), len(response.content)
+
+    async def get_instrumented(self, url: str, headers: dict, params: Optional[dict], metrics, route: str) -> Tuple[Any, int]:
+        start = time.perf_counter()
+        async with self.session.stream('GET', url, headers=headers, params=params) as response:
+            metrics.status(route, response.status_code)
+            metrics.timing(route, 'ttfb', time.perf_counter() - start)
+            response.raise_for_status()
+            received = time.perf_counter()
+            body = await response.aread()
+        downloaded = time.perf_counter()
+        metrics.timing(route, 'download', downloaded - received)
+        result = response.json()
+        metrics.timing(route, 'parse', time.perf_counter() - downloaded)
+        metrics.size(route, len(body))
+        metrics.timing(route, 'total', time.perf_counter() - start)
+        return result, len(body)
+
+    async def get_conditional(self, url: str, headers: dict, params: Optional[dict]) -> Tuple[Mapping[str, str], Any]:
+        response = await self.session.get(url, headers=headers, params=params)
+        if response.status_code == 304:
+            return response.headers, None
+        response.raise_for_status()
+        return response.headers, response.json()
+
+    async def chunks(self, url: str, headers: dict, params: Optional[dict], chunk_size: int) -> AsyncIterator[bytes]:
+        async with self.session.stream('GET', url, headers=headers, params=params) as response:
+            response.raise_for_status()
+            async for chunk in response.aiter_bytes(chunk_size):
+                yield chunk
+
+    async def close(self):
+        await self.session.aclose()
@@ -29,6 +29,13 @@ setup(name='ns-api',
           'dataclasses-json',
           'requests',
       ],
+      extras_require={
+          'numpy': ['numpy'],
+          'http2': ['httpx[http2]'],
+      },
+      entry_points={
+          'console_scripts': ['ns-poll=ns.daemon:main'],
+      },
       tests_require=['pytest'],
       include_package_data=True,
       zip_safe=False)
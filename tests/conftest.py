@@ -0,0 +1,16 @@
+import json
+import os
+
+import pytest
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+
+def read_fixture(name: str) -> dict:
+    with open(os.path.join(FIXTURES, f'{name}.json')) as f:
+        return json.load(f)
+
+
+@pytest.fixture()
+def fixture():
+    return read_fixture
@@ -4,7 +4,8 @@ from unittest.mock import Mock, patch
 import pytest
 import requests
 
-from ns import NSAPI
+from ns import NSAPI, Station
+from ns.endpoints import STATIONS
 
 key = os.environ.get('PRIMARY_KEY')
 
@@ -29,6 +30,16 @@ def test_trip_price(mock_response, ns):
     assert len(response[0].prices) == 3
 
 
+def test_class_level_helpers(fixture):
+    assert NSAPI._route('reisinformatie', 'api', 'v2', 'stations') == 'https://gateway.apiportal.ns.nl/public-reisinformatie/api/v2/stations'
+    stations = NSAPI._convert(fixture('stations')['payload'], model = Station)
+    assert stations[0].code and isinstance(stations[0], Station)
+
+    ns = NSAPI('key')
+    ns.base_url = 'http://127.0.0.1:8080/public-'
+    assert ns._url(STATIONS) == 'http://127.0.0.1:8080/public-reisinformatie/api/v2/stations'
+
+
 def test_invalid_key():
     ns = NSAPI('invalidkey')
     with pytest.raises(requests.exceptions.HTTPError):
@@ -0,0 +1,79 @@
+import dataclasses
+
+import pytest
+
+from ns import binary, compact, lazy, models, parsed
+from ns.decoder import decode
+from ns.timestamps import epoch
+
+
+def test_round_trip(fixture):
+    departures = decode(fixture('departures')['payload']['departures'], models.Departure)
+    data = binary.dumps(departures)
+    assert binary.loads(data, models.Departure) == departures
+    assert len(data) < len(str([d.to_dict() for d in departures])) / 2
+
+    disruption = decode(fixture('disruptions')['payload'][2], models.Disruption)
+    assert binary.loads(binary.dumps(disruption), models.Disruption) == disruption
+
+
+def test_nested_and_variants(fixture):
+    trips = decode(fixture('trips')['trips'], models.Trip)
+    data = binary.dumps(trips)
+    assert [dataclasses.asdict(t) for t in binary.loads(data, models.Trip)] == [dataclasses.asdict(t) for t in trips]
+
+    loaded = binary.loads(data, lazy.MODELS[compact.Trip])
+    assert isinstance(loaded[0], compact.Trip)
+    assert isinstance(loaded[0].legs[0].stops[0], compact.LegStop)
+    assert binary.dumps(loaded) == data
+
+
+def test_parsed_timestamps(fixture):
+    model = parsed.MODELS['datetime'][models.Departure]
+    departures = decode(fixture('departures')['payload']['departures'], model)
+    loaded = binary.loads(binary.dumps(departures), model)
+    assert loaded == departures
+    assert loaded[0].planned_datetime.utcoffset() == departures[0].planned_datetime.utcoffset()
+
+
+@pytest.mark.parametrize('source', [None, 'datetime', 'epoch'])
+@pytest.mark.parametrize('target', [None, 'datetime', 'epoch'])
+def test_timestamps_across_variants(fixture, source, target):
+    trips = fixture('trips')['trips']
+    variant = lambda mode: parsed.MODELS[mode][models.Trip] if mode else models.Trip
+    loaded = binary.loads(binary.dumps(decode(trips, variant(source))), variant(target))
+    # As if decoded into the target variant directly
+    expected = decode(trips, variant(target))
+    stop, expected_stop = loaded[0].legs[0].stops[0], expected[0].legs[0].stops[0]
+    assert type(stop) is type(expected_stop)
+    assert type(stop.planned_departure_datetime) is type(expected_stop.planned_departure_datetime)
+    if target is None and source is not None:
+        # The same moment, in the offset of the datetime or in UTC for epoch seconds
+        assert epoch(stop.planned_departure_datetime) == epoch(expected_stop.planned_departure_datetime)
+    else:
+        assert [dataclasses.asdict(t) for t in loaded] == [dataclasses.asdict(t) for t in expected]
+
+
+@pytest.mark.parametrize('value', [0, 1, -1, 127, 128, -2 ** 63, 2 ** 63 - 1, 3.25, '', 'é', True, False, None,
+                                   [1, 'a', None], {'a': [1, 2]}])
+def test_values(value):
+    price = models.Price(price=1, supplements=value)
+    loaded = binary.loads(binary.dumps(price), models.Price)
+    assert loaded.supplements == value
+    assert type(loaded.supplements) is type(value)
+
+
+def test_errors(fixture):
+    departures = decode(fixture('departures')['payload']['departures'], models.Departure)
+    data = binary.dumps(departures)
+    with pytest.raises(binary.SerializationError):
+        binary.loads(data, models.Arrival)
+    with pytest.raises(binary.SerializationError):
+        binary.loads(data[:-5], models.Departure)
+    with pytest.raises(binary.SerializationError):
+        binary.loads(b'{"json": true}', models.Departure)
+    with pytest.raises(binary.SerializationError):
+        binary.dumps([])
+    with pytest.raises(binary.SerializationError):
+        binary.dumps(models.Price(price=2 ** 64))
+    assert binary.loads(binary.dumps([], model=models.Departure), models.Departure) == []
@@ -0,0 +1,116 @@
+import asyncio
+import copy
+from unittest.mock import patch
+
+from ns import AsyncNSAPI
+from ns.boards import BoardDiff, DepartureBoards, next_departure
+from ns.timestamps import to_epoch
+
+NOW = to_epoch('2026-10-18T10:00:00+0200')
+
+
+def test_diff(fixture):
+    payload = fixture('departures')['payload']['departures']
+    diff = BoardDiff()
+    changed, removed, board = diff.update(payload)
+    assert len(changed) == len(board) == len(payload)
+    assert removed == []
+
+    payload = copy.deepcopy(payload)
+    payload[1]['actualTrack'] = '7'
+    departed = payload.pop(0)
+    changed, removed, board = diff.update(payload)
+    assert [d.actual_track for d in changed] == ['7']
+    assert [d.name for d in removed] == [departed['name']]
+    assert len(board) == len(payload)
+
+    payload[0]['messages'] = [{'message': 'Vertraagd', 'style': 'WARNING'}]
+    payload[0]['directionOfTravel'] = 'unrelated'
+    assert len(diff.update(payload)[0]) == 1
+    assert diff.update(payload)[0] == []
+
+
+def test_interval(fixture):
+    payload = fixture('departures')['payload']['departures']
+    boards = DepartureBoards(None, min_interval=10, max_interval=120, lead=0.25, clock=lambda: NOW)
+    # First departure at 10:04, actually 10:06
+    assert next_departure(payload, NOW) == 6 * 60
+    assert boards.interval(payload) == 90
+    boards.clock = lambda: NOW + 5 * 60 + 50
+    assert boards.interval(payload) == 10
+    boards.clock = lambda: NOW + 24 * 60 * 60
+    assert boards.interval(payload) == 120
+    assert boards.interval([]) == 120
+
+
+def test_shared_polling(fixture):
+    payload = fixture('departures')['payload']['departures']
+    fetches = []
+
+    async def fetch(params):
+        fetches.append(params)
+        board = copy.deepcopy(payload)
+        if len(fetches) > 1:
+            board[0]['actualTrack'] = '9'
+        return board
+
+    async def main():
+        boards = DepartureBoards(fetch, min_interval=0, max_interval=0, clock=lambda: NOW)
+        first, second = boards.subscribe('UT', {'station': 'UT'}), boards.subscribe('UT', {'station': 'UT'})
+        a, b = await asyncio.gather(first.__anext__(), second.__anext__())
+        assert a is b
+        assert len(a.changed) == len(payload)
+        a, b = await asyncio.gather(first.__anext__(), second.__anext__())
+        assert a is b
+        assert [d.actual_track for d in a.changed] == ['9']
+
+        # A late subscriber starts with the whole board
+        third = boards.subscribe('UT', {'station': 'UT'})
+        c = await third.__anext__()
+        assert len(c.changed) == len(c.board) == len(payload)
+
+        for subscription in (first, second, third):
+            await subscription.aclose()
+        assert len(boards) == 0
+        polls = len(fetches)
+        await asyncio.sleep(0.01)
+        assert len(fetches) == polls
+
+    asyncio.run(main())
+    assert all(params == {'station': 'UT'} for params in fetches)
+
+
+def test_errors_are_pushed(fixture):
+    async def fetch(params):
+        raise ConnectionError()
+
+    async def main():
+        subscription = DepartureBoards(fetch, min_interval=0).subscribe('UT')
+        update = await subscription.__anext__()
+        await subscription.aclose()
+        return update
+
+    update = asyncio.run(main())
+    assert isinstance(update.error, ConnectionError)
+    assert update.changed == []
+
+
+def test_client(fixture):
+    calls = []
+
+    async def request(self, url, params=None):
+        calls.append(params)
+        return fixture('departures')
+
+    async def main():
+        with patch.object(AsyncNSAPI, '_request', request):
+            ns = AsyncNSAPI('key', compact=True)
+            subscription = ns.subscribe_departures('8400621', lang='nl')
+            update = await subscription.__anext__()
+            await subscription.aclose()
+        return update
+
+    update = asyncio.run(main())
+    assert calls == [{'uicCode': '8400621', 'lang': 'nl'}]
+    assert update.station == '8400621'
+    assert update.changed[0].direction == 'Amsterdam Centraal'
@@ -0,0 +1,66 @@
+import asyncio
+from unittest.mock import patch
+
+import requests
+
+from ns import AsyncNSAPI, NSAPI
+from ns.ratelimit import TokenBucket
+
+
+class Clock():
+    now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_token_bucket():
+    clock = Clock()
+    bucket = TokenBucket(rate=2, capacity=2, clock=clock)
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == 0.5
+    assert bucket.reserve() == 1.0
+    clock.now = 1.0
+    assert bucket.reserve() == 0.5
+
+
+def fake_request(fixture):
+    def request(url, params=None):
+        if params.get('station') == 'XX':
+            raise requests.exceptions.HTTPError('400 Client Error')
+        return fixture('departures')
+    return request
+
+
+def test_departures_bulk(fixture):
+    ns = NSAPI('key')
+    with patch.object(ns, '_request', side_effect=fake_request(fixture)) as mock_request:
+        results = {result.key: result for result in ns.get_departures_bulk(['UT', 'ASD', 'XX', '8400621'], concurrency=2)}
+    assert set(results) == {'UT', 'ASD', 'XX', '8400621'}
+    assert len(results['UT'].result) == 3
+    assert not results['XX'].ok
+    assert isinstance(results['XX'].error, requests.exceptions.HTTPError)
+    assert {'uicCode': '8400621'} in [call[1]['params'] for call in mock_request.call_args_list]
+
+
+def test_async_departures_bulk(fixture):
+    running = []
+    peak = []
+
+    async def request(url, params=None):
+        running.append(1)
+        peak.append(len(running))
+        await asyncio.sleep(0.01)
+        running.pop()
+        return fake_request(fixture)(url, params)
+
+    async def run():
+        async with AsyncNSAPI('key') as ns:
+            with patch.object(ns, '_request', side_effect=request):
+                return [result async for result in ns.get_departures_bulk(['UT', 'ASD', 'XX', 'GD', 'HT'], concurrency=2)]
+
+    results = asyncio.run(run())
+    assert len(results) == 5
+    assert sum(result.ok for result in results) == 4
+    assert max(peak) == 2
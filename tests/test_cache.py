@@ -0,0 +1,150 @@
+import asyncio
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+
+from ns import AsyncNSAPI, NSAPI
+from ns.cache import ResponseCache
+
+STATIONS = 'https://gateway.apiportal.ns.nl/public-reisinformatie/api/v2/stations'
+DEPARTURES = 'https://gateway.apiportal.ns.nl/public-reisinformatie/api/v2/departures'
+
+
+class Clock():
+    now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_ttl_per_endpoint():
+    cache = ResponseCache(ttls={'departures': 5})
+    assert cache.ttl(STATIONS) == 6 * 60 * 60
+    assert cache.ttl(DEPARTURES) == 5
+    assert cache.ttl('https://example.com/unknown') == 0
+
+
+def test_key_is_normalised():
+    assert ResponseCache.key(DEPARTURES, {'station': 'UT', 'lang': 'nl'}) == \
+        ResponseCache.key(DEPARTURES, {'lang': 'nl', 'station': 'UT', 'uicCode': None})
+
+
+def test_expiry():
+    clock = Clock()
+    cache = ResponseCache(clock=clock)
+    calls = []
+    request = lambda: (calls.append(1), 10)
+    cache.fetch(DEPARTURES, {'station': 'UT'}, request)
+    cache.fetch(DEPARTURES, {'station': 'UT'}, request)
+    clock.now = 16
+    cache.fetch(DEPARTURES, {'station': 'UT'}, request)
+    assert len(calls) == 2
+    assert cache.stats()['hits'] == 1
+    assert cache.stats()['misses'] == 2
+
+
+def test_lru_eviction():
+    cache = ResponseCache(max_size=25)
+    cache.put('a', 1, 10, 60)
+    cache.put('b', 2, 10, 60)
+    cache.get('a')
+    cache.put('c', 3, 10, 60)
+    assert cache.get('a') == 1
+    assert cache.get('b') is None
+    assert cache.size == 20
+    assert cache.evictions == 1
+
+
+def test_uncached_endpoint():
+    cache = ResponseCache()
+    assert cache.fetch('https://example.com/unknown', None, lambda: ('x', 1)) == 'x'
+    assert len(cache) == 0
+
+
+def test_coalescing():
+    cache = ResponseCache()
+    calls = []
+
+    def request():
+        calls.append(1)
+        time.sleep(0.05)
+        return 'response', 10
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.fetch(STATIONS, None, request))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == ['response'] * 8
+    assert len(calls) == 1
+    assert cache.coalesced == 7
+
+
+def test_coalescing_error():
+    cache = ResponseCache()
+
+    def request():
+        raise ValueError()
+
+    with pytest.raises(ValueError):
+        cache.fetch(STATIONS, None, request)
+    assert cache.fetch(STATIONS, None, lambda: ('response', 10)) == 'response'
+
+
+def test_async_coalescing():
+    cache = ResponseCache()
+    calls = []
+
+    async def request():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return 'response', 10
+
+    async def run():
+        return await asyncio.gather(*(cache.fetch_async(STATIONS, None, request) for _ in range(8)))
+
+    assert asyncio.run(run()) == ['response'] * 8
+    assert len(calls) == 1
+
+
+def test_async_coalescing_survives_cancelled_leader():
+    cache = ResponseCache()
+    calls = []
+
+    async def request():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return 'response', 10
+
+    async def run():
+        leader = asyncio.ensure_future(cache.fetch_async(STATIONS, None, request))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(cache.fetch_async(STATIONS, None, request))
+        await asyncio.sleep(0)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    assert asyncio.run(run()) == 'response'
+    assert len(calls) == 1 and cache.get(cache.key(STATIONS)) == 'response'
+
+
+@patch('ns.NSAPI._fetch')
+def test_shared_cache(mock_fetch, fixture):
+    mock_fetch.return_value = fixture('departures'), 100
+    cache = ResponseCache()
+    ns = NSAPI('key', cache=cache)
+    ns.get_departures(station='UT')
+    NSAPI('key', cache=cache).get_departures(station='UT')
+    assert mock_fetch.call_count == 1
+
+    async def run():
+        async with AsyncNSAPI('key', cache=cache) as ns:
+            return await ns.get_departures(station='UT')
+
+    assert len(asyncio.run(run())) == 3
+    assert cache.hits == 2
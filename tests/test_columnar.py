@@ -0,0 +1,77 @@
+from datetime import datetime
+from unittest.mock import patch
+
+import pytest
+
+from ns import NSAPI
+from ns.columnar import MISSING, Columns, departure_columns, stop_columns
+from ns.timestamps import to_datetime, to_epoch
+
+
+@pytest.mark.parametrize('value', [
+    '2026-10-18T10:04:00+0200',
+    '2026-10-18T10:04:00-0130',
+    '2026-01-01T00:00:59+0000',
+    '2026-03-29T01:59:00+01:00',
+    '2026-10-18T10:04:00.123+0200',
+    '2026-10-18T10:04:00Z',
+])
+def test_to_epoch(value):
+    expected = datetime.strptime(value.replace('Z', '+0000').replace('.123', ''), '%Y-%m-%dT%H:%M:%S%z')
+    assert to_epoch(value) == int(expected.timestamp())
+    assert to_datetime(value) == expected
+    assert to_datetime(value).utcoffset() == expected.utcoffset()
+
+
+def test_departure_columns(fixture):
+    departures = fixture('departures')['payload']['departures']
+    columns = departure_columns(departures)
+    assert len(columns) == len(departures)
+    assert columns['planned_datetime'][0] == to_epoch('2026-10-18T10:04:00+0200')
+    assert columns['actual_datetime'][0] - columns['planned_datetime'][0] == 120
+    assert columns.values('direction')[0] == 'Amsterdam Centraal'
+    assert columns.values('operator') == [d['product']['operatorCode'] for d in departures]
+    assert columns.values('cancelled') == [int(d['cancelled']) for d in departures]
+
+
+def test_missing_values():
+    columns = departure_columns([{'plannedDateTime': '2026-10-18T10:04:00+0200'}])
+    assert columns['actual_datetime'][0] == MISSING
+    assert columns['planned_track'][0] == -1
+    assert columns.values('actual_datetime') == [None]
+    assert columns.values('planned_track') == [None]
+
+
+def test_stop_columns(fixture):
+    trips = fixture('trips')['trips']
+    columns = stop_columns(trips)
+    stops = [stop for trip in trips for leg in trip['legs'] for stop in leg['stops']]
+    assert len(columns) == len(stops)
+    assert columns.values('name') == [stop['name'] for stop in stops]
+    assert columns['trip'][-1] == len(trips) - 1
+    assert columns.values('name')[1] == 'Amsterdam Amstel'
+
+
+def test_concat(fixture):
+    departures = fixture('departures')['payload']['departures']
+    first, second = departure_columns(departures[:1]), departure_columns(departures[1:])
+    merged = Columns.concat([first, second])
+    expected = departure_columns(departures)
+    for name in expected:
+        assert merged.values(name) == expected.values(name)
+    assert len(Columns.concat([])) == 0
+
+
+def test_to_numpy(fixture):
+    numpy = pytest.importorskip('numpy')
+    arrays = departure_columns(fixture('departures')['payload']['departures']).to_numpy()
+    assert arrays['planned_datetime'].dtype == numpy.dtype('datetime64[s]')
+    assert arrays['cancelled'].dtype == numpy.bool_
+    assert (arrays['actual_datetime'] - arrays['planned_datetime'])[0] == numpy.timedelta64(120, 's')
+
+
+@patch('ns.NSAPI._request')
+def test_client(mock_response, fixture):
+    mock_response.return_value = fixture('departures')
+    columns = NSAPI('key').get_departures_columns(station='UT')
+    assert columns.values('planned_track')[0] == '5'
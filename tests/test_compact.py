@@ -0,0 +1,43 @@
+import dataclasses
+import pickle
+from unittest.mock import patch
+
+from ns import NSAPI, compact, models
+from ns.decoder import decode
+
+
+def test_slotted(fixture):
+    departure = decode(fixture('departures')['payload']['departures'][0], compact.Departure)
+    assert not hasattr(departure, '__dict__')
+    assert isinstance(departure.product, compact.Product)
+    assert isinstance(departure.messages[0], compact.Message)
+    assert departure.planned_datetime == '2026-10-18T10:04:00+0200'
+
+
+def test_same_fields_as_models(fixture):
+    payload = fixture('trips')['trips'][0]
+    assert dataclasses.asdict(decode(payload, compact.Trip)) == dataclasses.asdict(decode(payload, models.Trip))
+
+
+def test_interned(fixture):
+    first, second = decode(fixture('departures')['payload']['departures'][:2], compact.Departure)
+    assert first.product.operator_name is second.product.operator_name
+    assert first.train_category is second.train_category
+
+
+def test_inherited_slots():
+    fare = compact.TripProductFare(price=1, product='A', travel_class='B', discount='C', price_excluding_supplement=2)
+    assert isinstance(fare, compact.TripFare)
+    assert not hasattr(fare, '__dict__')
+
+
+def test_pickle(fixture):
+    departure = decode(fixture('departures')['payload']['departures'][0], compact.Departure)
+    assert pickle.loads(pickle.dumps(departure)) == departure
+
+
+@patch('ns.NSAPI._request')
+def test_compact_client(mock_response, fixture):
+    mock_response.return_value = fixture('departures')
+    departures = NSAPI('key', compact=True).get_departures(station='UT')
+    assert isinstance(departures[0], compact.Departure)
@@ -0,0 +1,76 @@
+import multiprocessing
+import os
+from unittest.mock import patch
+
+from ns import models
+from ns.daemon import DaemonOptions, FileSink, read_sink, run, shard
+from ns.ratelimit import SharedTokenBucket
+from ns.replay import StandInGateway
+from tests.conftest import FIXTURES
+
+
+def test_shard():
+    assert shard(['UT', 'ASD', 'RTD', 'GVC', 'EHV'], 2) == [['UT', 'RTD', 'EHV'], ['ASD', 'GVC']]
+    assert shard(['UT'], 4) == [['UT']]
+
+
+def test_sink(tmp_path, fixture):
+    path = str(tmp_path / 'sink.nsb')
+    departures = [models.Departure.from_dict(d) for d in fixture('departures')['payload']['departures']]
+    sink = FileSink(path)
+    sink.write('departures', 'UT', departures, polled=1.5)
+    sink.write('disruptions', None, [])
+    sink.close()
+
+    records = list(read_sink(path))
+    assert [(r.kind, r.station) for r in records] == [('departures', 'UT'), ('disruptions', None)]
+    assert records[0].polled == 1.5 and records[0].items == departures
+    assert records[1].items == []
+    following = list(read_sink(path, offset=records[0].end))
+    assert [r.kind for r in following] == ['disruptions'] and following[0].end == os.path.getsize(path)
+
+    # A frame still being written is left for the next read
+    with open(path, 'rb') as f:
+        partial = f.read()[:20]
+    with open(path, 'ab') as f:
+        f.write(partial)
+    assert len(list(read_sink(path))) == 2
+
+
+def test_sink_short_writes(tmp_path):
+    path = str(tmp_path / 'sink.nsb')
+    write = os.write
+    sink = FileSink(path)
+    with patch('os.write', side_effect=lambda fd, data: write(fd, bytes(data[:7]))):
+        sink.write('disruptions', None, [], polled=1.5)
+    sink.write('disruptions', None, [], polled=2.5)
+    sink.close()
+    assert [r.polled for r in read_sink(path)] == [1.5, 2.5]
+
+
+def _reserve(bucket):
+    bucket.reserve()
+
+
+def test_shared_token_bucket():
+    context = multiprocessing.get_context('spawn')
+    bucket = SharedTokenBucket(1, capacity=1, context=context)
+    process = context.Process(target=_reserve, args=(bucket,))
+    process.start()
+    process.join()
+    assert 0.5 < bucket.reserve() <= 1
+
+
+def test_run(tmp_path):
+    path = str(tmp_path / 'sink.nsb')
+    with StandInGateway(fixtures=FIXTURES) as gateway:
+        options = DaemonOptions('key', path, workers=2, rate=100, rounds=1, stations=['UT', 'ASD', 'RTD'],
+                                base_url=gateway.base_url)
+        run(options, multiprocessing.get_context('spawn'))
+
+    records = list(read_sink(path))
+    assert sorted((r.kind, r.station) for r in records if r.station) == \
+        sorted((kind, station) for kind in ('arrivals', 'departures') for station in ('UT', 'ASD', 'RTD'))
+    disruptions = [r for r in records if r.kind == 'disruptions']
+    assert len(disruptions) == 1 and isinstance(disruptions[0].items[0], models.Disruption)
+    assert all(isinstance(d, models.Departure) for r in records if r.kind == 'departures' for d in r.items)
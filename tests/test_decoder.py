@@ -0,0 +1,45 @@
+import pytest
+
+from ns import Arrival, Departure, Station, Trip, PriceOption
+from ns.decoder import decode, decoder_for, field_keys
+
+
+def test_departures_match_from_dict(fixture):
+    payload = fixture('departures')['payload']['departures']
+    assert decode(payload, Departure) == [Departure.from_dict(d) for d in payload]
+
+
+def test_arrivals_match_from_dict(fixture):
+    payload = fixture('arrivals')['payload']['arrivals']
+    assert decode(payload, Arrival) == [Arrival.from_dict(d) for d in payload]
+
+
+def test_trips_match_from_dict(fixture):
+    payload = fixture('trips')['trips']
+    trips = decode(payload, Trip)
+    assert trips == [Trip.from_dict(d) for d in payload]
+    assert trips[0].legs[0].stops[1].name == 'Amsterdam Amstel'
+    assert trips[0].legs[0].origin.notes[0].key == 'PS'
+
+
+def test_scalar_coercion():
+    # dataclasses_json converts mismatching scalars, e.g. float prices to int
+    option = decode({'prices': [{'price': 250.0}]}, PriceOption)
+    assert option.prices[0].price == 250
+    assert isinstance(option.prices[0].price, int)
+
+
+def test_shadowed_field():
+    # Trip.ctxRecon is shadowed by the override of Trip.ctx_recon
+    assert field_keys(Trip)['ctx_recon'] == 'ctxRecon'
+    assert 'ctxRecon' not in field_keys(Trip)
+    assert decode({'ctxRecon': 'abc'}, Trip).ctxRecon is None
+
+
+def test_missing_required_field():
+    with pytest.raises(KeyError):
+        decode({'code': 'UT'}, Station)
+
+
+def test_decoder_is_cached():
+    assert decoder_for(Trip) is decoder_for(Trip)
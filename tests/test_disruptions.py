@@ -0,0 +1,66 @@
+import copy
+from unittest.mock import MagicMock, patch
+
+import requests
+
+from ns import NSAPI
+from ns.disruptions import ADDED, CHANGED, REMOVED, DisruptionWatcher
+from ns.transport import RetryPolicy, TransportOptions
+
+
+def test_events(fixture):
+    payload = fixture('disruptions')['payload']
+    watcher = DisruptionWatcher()
+    events = watcher.update(payload)
+    assert [(event.kind, event.disruption.id) for event in events] == [
+        (ADDED, '7001234'), (ADDED, 'prio-31245'), (ADDED, 'melding-981')]
+    assert watcher.update(copy.deepcopy(payload)) == []
+
+    changed = copy.deepcopy(payload[:2])
+    changed[0]['verstoring']['versie'] = '4'
+    changed[0]['verstoring']['verwachting'] = 'Tot ongeveer 13:00'
+    events = watcher.update(changed)
+    assert [(event.kind, event.disruption.id) for event in events] == [(CHANGED, '7001234'), (REMOVED, 'melding-981')]
+    assert events[0].disruption.details.expectation == 'Tot ongeveer 13:00'
+    assert len(watcher) == 2
+
+
+def test_unchanged_entries_are_not_decoded(fixture):
+    payload = fixture('disruptions')['payload']
+    decoded = []
+    watcher = DisruptionWatcher(lambda data: decoded.append(data['id']))
+    watcher.update(payload)
+    watcher.update(payload)
+    assert decoded == ['7001234', 'prio-31245', 'melding-981']
+
+
+def response(status, body=None, headers=None):
+    request = MagicMock(status_code=status, headers=headers or {})
+    request.__enter__.return_value = request
+    request.json.return_value = body
+    return request
+
+
+@patch('time.sleep')
+def test_watch_disruptions(mock_sleep, fixture):
+    ns = NSAPI('key')
+    watcher = DisruptionWatcher()
+    responses = [response(200, fixture('disruptions'), {'ETag': '"v1"'}), response(304), response(200, {'payload': []})]
+    with patch.object(ns.session, 'get', side_effect=responses) as mock_get:
+        events = ns.watch_disruptions(interval=30, watcher=watcher)
+        assert [next(events).kind for _ in range(6)] == [ADDED] * 3 + [REMOVED] * 3
+    assert mock_get.call_args_list[1][1]['headers']['If-None-Match'] == '"v1"'
+    assert mock_sleep.call_count == 2
+
+
+@patch('time.sleep')
+def test_watch_disruptions_survives_errors(mock_sleep, fixture):
+    ns = NSAPI('key', transport=TransportOptions(retry=RetryPolicy(total=1)))
+    failed = response(503)
+    failed.raise_for_status.side_effect = requests.exceptions.HTTPError(response=failed)
+    responses = [failed, response(200, fixture('disruptions')), failed, failed, response(200, {'payload': []})]
+    with patch.object(ns.session, 'get', side_effect=responses) as mock_get:
+        events = ns.watch_disruptions(interval=30)
+        # Retried within the poll, then skipped to the next poll once out of retries
+        assert [next(events).kind for _ in range(6)] == [ADDED] * 3 + [REMOVED] * 3
+    assert mock_get.call_count == 5
@@ -0,0 +1,97 @@
+import asyncio
+import inspect
+import json
+from typing import List
+from unittest.mock import patch
+
+import pytest
+from aiohttp import ClientResponseError, web
+
+from ns import AsyncNSAPI, NSAPI, models
+from ns.endpoints import ENDPOINTS, PRICES, STATION_DISRUPTIONS, TRIP
+from ns.transport import RetryPolicy, TransportOptions
+
+
+def test_bind():
+    assert TRIP.bind(('ctx',), {'lang': 'en'}) == ({}, {'ctxRecon': 'ctx', 'lang': 'en'})
+    assert PRICES.bind(('UT',), {'to_station': 'ASD'}) == ({}, {'fromStation': 'UT', 'toStation': 'ASD'})
+    assert STATION_DISRUPTIONS.bind((), {'code': 'UT'}) == ({'code': 'UT'}, {})
+    assert STATION_DISRUPTIONS.route({'code': 'UT'}) == ('reisinformatie', 'api', 'v2', 'disruptions', 'station', 'UT')
+    with pytest.raises(TypeError):
+        PRICES.bind(('UT',), {})
+    with pytest.raises(TypeError):
+        STATION_DISRUPTIONS.bind(('UT', 'ASD'), {})
+    with pytest.raises(TypeError):
+        STATION_DISRUPTIONS.bind(('UT',), {'lang': 'en'})
+
+
+def test_methods():
+    for endpoint in ENDPOINTS:
+        method, coroutine = getattr(NSAPI, endpoint.name), getattr(AsyncNSAPI, endpoint.name)
+        assert inspect.signature(method) == inspect.signature(coroutine)
+        assert asyncio.iscoroutinefunction(coroutine) and not asyncio.iscoroutinefunction(method)
+        assert method.__doc__ == endpoint.doc
+    assert list(inspect.signature(NSAPI.get_trip_price).parameters) == ['self', 'from_station', 'to_station', 'params']
+    assert inspect.signature(NSAPI.get_trips).return_annotation == List[models.Trip]
+
+
+@patch('ns.NSAPI._request')
+def test_station_disruptions_route(mock_response, fixture):
+    mock_response.return_value = fixture('disruptions')
+    disruptions = NSAPI('key').get_station_disruptions('UT')
+    assert mock_response.call_args[0][0] == 'https://gateway.apiportal.ns.nl/public-reisinformatie/api/v2/disruptions/station/UT'
+    assert isinstance(disruptions[0], models.Disruption)
+
+    urls = []
+
+    async def request(self, url, params=None):
+        urls.append(url)
+        return fixture('disruptions')
+
+    async def main():
+        with patch.object(AsyncNSAPI, '_request', request):
+            return await AsyncNSAPI('key').get_station_disruptions(code='UT')
+
+    assert len(asyncio.run(main())) == len(disruptions)
+    assert urls == [mock_response.call_args[0][0]]
+
+
+def serve(handler, call, **options):
+    """ Runs call(ns) against a local server answering every request with handler """
+    async def run():
+        app = web.Application()
+        app.router.add_get('/{tail:.*}', handler)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, '127.0.0.1', 0)
+        await site.start()
+        port = runner.addresses[0][1]
+        try:
+            with patch.object(AsyncNSAPI, 'base_url', f'http://127.0.0.1:{port}/public-'):
+                async with AsyncNSAPI('key', **options) as ns:
+                    return await call(ns)
+        finally:
+            await runner.cleanup()
+
+    return asyncio.run(run())
+
+
+def test_async_status_before_json():
+    async def handler(request):
+        return web.Response(text='<html>Service unavailable</html>', status=503, content_type='text/html')
+
+    with pytest.raises(ClientResponseError) as e:
+        serve(handler, lambda ns: ns.get_departures(station='UT'), transport=TransportOptions(retry=RetryPolicy(total=0)))
+    assert e.value.status == 503
+
+
+def test_http2(fixture):
+    pytest.importorskip('httpx')
+    pytest.importorskip('h2')
+    body = json.dumps(fixture('departures'))
+
+    async def handler(request):
+        return web.Response(text=body, content_type='application/json')
+
+    departures = serve(handler, lambda ns: ns.get_departures(station='UT'), transport=TransportOptions(http2=True))
+    assert len(departures) == 3
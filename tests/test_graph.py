@@ -0,0 +1,64 @@
+import pytest
+
+from ns.decoder import decode
+from ns.graph import ConnectionGraph
+from ns.models import Departure, Station, Trip
+from ns.stations import StationIndex, distance
+
+
+@pytest.fixture()
+def graph(fixture):
+    graph = ConnectionGraph(StationIndex(decode(fixture('stations')['payload'], Station)))
+    graph.add_trips(decode(fixture('trips')['trips'], Trip))
+    graph.add_departures('UT', decode(fixture('departures')['payload']['departures'], Departure))
+    return graph
+
+
+def test_legs(graph):
+    # Utrecht Centraal - Amsterdam Amstel - Amsterdam Centraal, Utrecht Centraal - Bunnik
+    neighbours = graph.neighbours('UT')
+    assert neighbours['8400057'] == 18 * 60 and neighbours['8400056'] == 7 * 60
+    assert graph.neighbours('ASA') == {'8400058': 8 * 60}
+    assert 'Bunnik' in graph and 'Zeist, Busstation' not in graph
+
+
+def test_shortest_path(graph):
+    route = graph.shortest_path('UT', 'Amsterdam Centraal')
+    assert route.stations == ['8400621', '8400057', '8400058']
+    assert route.duration == 26 * 60 and not route.estimated
+    assert graph.shortest_path('ASD', 'UT') is None
+    assert graph.shortest_path('UT', 'XXX') is None
+
+
+def test_estimated(graph):
+    # Route stations of departures are timed by distance, or a default time without coordinates
+    route = graph.shortest_path('UT', '8400626')
+    assert route.stations == ['8400621', '8400056', '8400195', '8400626'] and route.estimated
+    assert route.duration == 7 * 60 + 2 * graph.default_time
+    ut, ht = graph.stations['UT'], graph.stations['8400319']
+    km = distance(ut.latitude, ut.longitude, ht.latitude, ht.longitude)
+    assert graph.neighbours('UT')['8400319'] == pytest.approx(km / 80 * 3600)
+
+    graph.add_connection('8400056', '8400195', 300)
+    graph.add_connection('8400056', '8400195', 500)
+    assert graph.neighbours('BNK')['8400195'] == 400
+
+
+def test_reachable(graph):
+    assert graph.reachable('UT', within=20 * 60) == {'8400621': 0, '8400056': 7 * 60, '8400057': 18 * 60}
+    assert graph.reachable('ASD') == {'8400058': 0}
+    assert graph.reachable('XXX') == {}
+
+
+def test_a_star_matches_dijkstra(graph):
+    times = graph.reachable('UT')
+    for code, time in times.items():
+        assert graph.shortest_path('UT', code).duration == pytest.approx(time)
+
+
+def test_save_load(graph, tmp_path):
+    path = str(tmp_path / 'graph.idx')
+    graph.save(path)
+    loaded = ConnectionGraph.load(path)
+    assert loaded.shortest_path('UT', 'ASD') == graph.shortest_path('UT', 'ASD')
+    assert loaded.edge_count == graph.edge_count
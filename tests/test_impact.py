@@ -0,0 +1,69 @@
+import dataclasses
+
+import pytest
+
+from ns.decoder import decode
+from ns.disruptions import DisruptionWatcher
+from ns.impact import ImpactIndex
+from ns.models import Departure, Disruption, Station, Trip
+from ns.stations import StationIndex
+
+AT = '2026-10-18T10:00:00+0200'
+
+
+@pytest.fixture()
+def disruptions(fixture):
+    return decode(fixture('disruptions')['payload'], Disruption)
+
+
+@pytest.fixture()
+def impact(fixture, disruptions):
+    impact = ImpactIndex(StationIndex(decode(fixture('stations')['payload'], Station)))
+    impact.update(disruptions)
+    return impact
+
+
+def ids(annotations):
+    return [[disruption.id for disruption in found] for found in annotations]
+
+
+def test_lookups(impact):
+    assert [d.id for d in impact.at_station('8400621', AT)] == ['7001234']
+    assert [d.id for d in impact.on_segment('ASD', 'Utrecht Centraal', AT)] == ['7001234']
+    assert impact.on_segment('UT', 'RTD', AT) == []
+    assert [d.id for d in impact.on_segment('RTD', 'GD', AT)] == ['prio-31245']
+    # Before it started and after it ended
+    assert impact.at_station('UT', '2026-10-18T09:00:00+0200') == []
+    assert impact.at_station('UT', '2026-10-18T12:00:00+0200') == []
+
+
+def test_annotate(impact, fixture):
+    departures = decode(fixture('departures')['payload']['departures'], Departure)
+    # Only the train over Amsterdam Amstel travels over the disrupted track, the others only call at Utrecht Centraal
+    assert ids(impact.annotate_departures('UT', departures, AT)) == [['7001234'], [], []]
+
+    trips = decode(fixture('trips')['trips'], Trip)
+    assert ids(impact.annotate_trips(trips, AT)) == [['7001234'], []]
+    assert ids(impact.annotate_stops(trips[0].legs[0].stops, AT)) == [['7001234']] * 3
+    assert ids(impact.annotate_stops(trips[1].legs[1].stops, AT)) == [[], []]
+
+
+def test_update(impact, disruptions):
+    assert len(impact) == 3
+    moved = dataclasses.replace(disruptions[0], details=dataclasses.replace(
+        disruptions[0].details, tracks=[dataclasses.replace(disruptions[0].details.tracks[0], stations=['UT', 'AMF'])]))
+    impact.update([moved, disruptions[2]])
+    assert 'prio-31245' not in impact and impact.on_segment('RTD', 'GD', AT) == []
+    assert impact.on_segment('UT', 'ASD', AT) == []
+    assert [d.id for d in impact.on_segment('UT', 'AMF', AT)] == ['7001234']
+    assert impact._tracks.keys() == {'UT', 'AMF'}
+
+
+def test_apply(fixture):
+    impact = ImpactIndex()
+    watcher = DisruptionWatcher()
+    payload = fixture('disruptions')['payload']
+    impact.apply(watcher.update(payload))
+    assert [d.id for d in impact.affecting(['RTD', 'GD'], AT)] == ['prio-31245']
+    impact.apply(watcher.update(payload[:1]))
+    assert impact.affecting(['RTD', 'GD'], AT) == [] and len(impact) == 1
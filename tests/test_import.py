@@ -0,0 +1,71 @@
+import dataclasses
+import os
+import subprocess
+import sys
+from typing import Set
+
+import ns
+from ns import models
+
+ROOT = os.path.join(os.path.dirname(__file__), os.pardir)
+ASYNC_STACK = {'asyncio', 'aiohttp'}
+SERIALIZATION = {'dataclasses_json', 'marshmallow'}
+# Microseconds, the import used to take half a second and now loads no submodules
+IMPORT_BUDGET = 50000
+
+
+def run(statements: str) -> Set[str]:
+    """ The modules loaded after running the statements in a fresh interpreter """
+    code = '\n'.join(['import sys', statements, 'print(" ".join(sys.modules))'])
+    output = subprocess.run([sys.executable, '-c', code], cwd=ROOT, stdout=subprocess.PIPE, check=True,
+                            universal_newlines=True).stdout.splitlines()
+    return set(output[-1].split())
+
+
+def import_time(module: str) -> int:
+    """ Cumulative microseconds of importing a module in a fresh interpreter, as reported by -X importtime """
+    report = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'], cwd=ROOT,
+                            stderr=subprocess.PIPE, check=True, universal_newlines=True).stderr
+    for line in report.splitlines():
+        _, cumulative, name = line.split('|')
+        if name.strip() == module:
+            return int(cumulative)
+    raise AssertionError(f'{module} not in the import time report')
+
+
+def test_import_loads_nothing():
+    modules = run('import ns')
+    assert {module for module in modules if module.startswith('ns.')} == set()
+    assert not modules & {'requests', *ASYNC_STACK, *SERIALIZATION}
+
+
+def test_import_time():
+    # Far above the actual time, so only a submodule loaded on import again trips it
+    assert import_time('ns') < IMPORT_BUDGET
+
+
+def test_sync_client_skips_async_stack():
+    modules = run('import ns\nns.NSAPI("key")')
+    assert {'ns.api', 'ns.models', 'requests'} <= modules
+    assert not modules & {'ns.compact', 'ns.lazy', 'ns.parsed', *ASYNC_STACK, *SERIALIZATION}
+
+
+def test_async_client_loads_aiohttp():
+    modules = run('import asyncio, ns\nasync def main():\n    async with ns.AsyncNSAPI("key"):\n        pass\nasyncio.run(main())')
+    assert 'aiohttp' in modules
+    assert 'dataclasses_json' not in modules
+
+
+def test_dataclasses_json_on_first_use():
+    modules = run('import ns\nns.Message(message="Hello", style="INFO")')
+    assert 'dataclasses_json' not in modules
+    modules = run('import ns\nassert ns.Message.from_dict({"message": "Hello", "style": "INFO"}).to_dict()["style"] == "INFO"')
+    assert 'dataclasses_json' in modules
+
+
+def test_exports():
+    dataclass_models = {name for name, value in vars(models).items()
+                        if isinstance(value, type) and dataclasses.is_dataclass(value) and value.__module__ == models.__name__}
+    assert dataclass_models == set(ns._MODELS)
+    assert {'NSAPI', 'AsyncNSAPI', *dataclass_models} <= set(dir(ns))
+    assert ns.Trip is models.Trip
@@ -0,0 +1,43 @@
+import dataclasses
+from unittest.mock import patch
+
+from ns import NSAPI, compact, lazy, models
+from ns.decoder import Deferred, decode
+
+
+def test_lazy_trip(fixture):
+    payload = fixture('trips')['trips']
+    trips = decode(payload, lazy.MODELS[models.Trip])
+    trip = trips[0]
+    assert isinstance(trip, models.Trip)
+    assert isinstance(trip._lazy_legs, Deferred)
+    leg = trip.legs[0]
+    assert isinstance(leg, models.Leg)
+    assert trip.legs[0] is leg
+    assert isinstance(leg._lazy_stops, Deferred)
+    assert leg.stops[1].name == 'Amsterdam Amstel'
+    assert leg.origin.notes[0].key == 'PS'
+    assert dataclasses.asdict(trip) == dataclasses.asdict(decode(payload[0], models.Trip))
+
+
+def test_assignment(fixture):
+    trip = decode(fixture('trips')['trips'][0], lazy.MODELS[models.Trip])
+    trip.legs = []
+    assert trip.legs == []
+    assert lazy.MODELS[models.Trip](legs=None).legs is None
+
+
+def test_lazy_compact(fixture):
+    trip = decode(fixture('trips')['trips'][0], lazy.MODELS[compact.Trip])
+    assert isinstance(trip, compact.Trip)
+    assert not hasattr(trip, '__dict__')
+    assert isinstance(trip.legs[0], compact.Leg)
+    assert trip.legs[0].stops[0].name == 'Utrecht Centraal'
+
+
+@patch('ns.NSAPI._request')
+def test_lazy_client(mock_response, fixture):
+    mock_response.return_value = fixture('trips')
+    trips = NSAPI('key', lazy=True).get_trips(fromStation='UT', toStation='ASD')
+    assert type(trips[0]) is lazy.MODELS[models.Trip]
+    assert trips[1].legs[-1].destination.notes[0].key == 'RN'
@@ -0,0 +1,92 @@
+import asyncio
+import json
+from datetime import timedelta
+from unittest.mock import MagicMock, patch
+
+from aiohttp import web
+
+from ns import AsyncNSAPI, NSAPI
+from ns.metrics import Histogram, Instrumentation, endpoint
+
+
+def test_endpoint():
+    assert endpoint('https://gateway.apiportal.ns.nl/public-reisinformatie/api/v2/departures') == 'departures'
+    assert endpoint('https://gateway.apiportal.ns.nl/public-reisinformatie/api/v2/disruptions/station/UT') == 'disruptions'
+    assert endpoint('https://gateway.apiportal.ns.nl/public-prijsinformatie/prices') == 'prices'
+
+
+def test_histogram():
+    histogram = Histogram()
+    for ms in range(1, 101):
+        histogram.record(ms / 1000)
+    snapshot = histogram.snapshot()
+    assert snapshot['count'] == 100
+    assert snapshot['max'] == 0.1
+    assert 0.05 <= snapshot['p50'] <= 0.1
+    assert snapshot['p99'] == 0.1
+    assert sum(snapshot['buckets'].values()) == 100
+
+
+def test_hooks():
+    recorded = []
+    metrics = Instrumentation(hooks=[lambda *args: recorded.append(args)])
+    metrics.status('departures', 200)
+    metrics.retry('departures')
+    with metrics.measure('departures', 'convert'):
+        pass
+    assert [args[:3] for args in recorded] == [
+        ('status', 'departures', '200'), ('retry', 'departures', 'retries'), ('timing', 'departures', 'convert')]
+    snapshot = metrics.snapshot()['departures']
+    assert snapshot['statuses'] == {200: 1}
+    assert snapshot['retries'] == 1
+    assert snapshot['timings']['convert']['count'] == 1
+
+
+def test_sync_client(fixture):
+    metrics = Instrumentation()
+    ns = NSAPI('key', instrumentation=metrics)
+    body = fixture('departures')
+    request = MagicMock(status_code=200, elapsed=timedelta(milliseconds=20), content=json.dumps(body).encode())
+    request.__enter__.return_value = request
+    request.json.return_value = body
+    with patch.object(ns.session, 'get', return_value=request):
+        ns.get_departures(station='UT')
+    snapshot = metrics.snapshot()['departures']
+    assert set(snapshot['timings']) == {'ttfb', 'download', 'parse', 'convert', 'total'}
+    assert snapshot['timings']['ttfb']['sum'] == 0.02
+    assert snapshot['statuses'] == {200: 1}
+    assert snapshot['sizes']['sum'] == len(request.content)
+
+
+def test_async_client(fixture):
+    body = json.dumps(fixture('departures'))
+
+    async def handler(request):
+        return web.Response(text=body, content_type='application/json')
+
+    async def run():
+        app = web.Application()
+        app.router.add_get('/{tail:.*}', handler)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, '127.0.0.1', 0)
+        await site.start()
+        port = runner.addresses[0][1]
+        metrics = Instrumentation()
+        try:
+            with patch.object(AsyncNSAPI, 'base_url', f'http://127.0.0.1:{port}/public-'):
+                async with AsyncNSAPI('key', instrumentation=metrics) as ns:
+                    await ns.get_departures(station='UT')
+        finally:
+            await runner.cleanup()
+        return metrics.snapshot()['departures']
+
+    snapshot = asyncio.run(run())
+    assert {'connect', 'ttfb', 'download', 'parse', 'convert', 'total'} <= set(snapshot['timings'])
+    assert snapshot['statuses'] == {200: 1}
+
+
+def test_disabled(fixture):
+    with patch('ns.NSAPI._request', return_value=fixture('departures')):
+        ns = NSAPI('key')
+        assert len(ns.get_departures(station='UT')) == 3
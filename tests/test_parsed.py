@@ -0,0 +1,62 @@
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+import pytest
+
+from ns import NSAPI, compact, lazy, models, parsed
+from ns.decoder import decode
+from ns.timestamps import to_epoch
+
+CEST = timezone(timedelta(hours=2))
+
+
+def test_datetime_departures(fixture):
+    departures = decode(fixture('departures')['payload']['departures'], parsed.MODELS['datetime'][models.Departure])
+    departure = departures[0]
+    assert isinstance(departure, models.Departure)
+    assert departure.planned_datetime == datetime(2026, 10, 18, 10, 4, tzinfo=CEST)
+    assert departure.planned_datetime.utcoffset() == timedelta(minutes=int(departure.planned_timezone_offset))
+    assert departure.delay == 120
+    assert sorted(departures, key=lambda d: d.planned_datetime)[0].planned_datetime == \
+        min(d.planned_datetime for d in departures)
+
+
+def test_epoch_compact(fixture):
+    departure = decode(fixture('departures')['payload']['departures'][0], parsed.MODELS['epoch'][compact.Departure])
+    assert isinstance(departure, compact.Departure)
+    assert not hasattr(departure, '__dict__')
+    assert departure.planned_datetime == to_epoch('2026-10-18T10:04:00+0200')
+    assert departure.delay == 120
+
+
+def test_delay_without_parsing(fixture):
+    departures = decode(fixture('departures')['payload']['departures'], models.Departure)
+    parsed_departures = decode(fixture('departures')['payload']['departures'], parsed.MODELS['epoch'][models.Departure])
+    assert [d.delay for d in departures] == [d.delay for d in parsed_departures]
+    assert models.TripOriginDestination(planned_datetime='2026-10-18T10:04:00+0200').delay is None
+
+
+@pytest.mark.parametrize('base', [models.Trip, compact.Trip, lazy.MODELS[models.Trip], lazy.MODELS[compact.Trip]])
+def test_nested_trips(fixture, base):
+    trip = decode(fixture('trips')['trips'][0], parsed.MODELS['datetime'][base])
+    assert isinstance(trip, base)
+    leg = trip.legs[0]
+    assert isinstance(leg.origin.planned_datetime, datetime)
+    assert all(stop.planned_departure_datetime is None or isinstance(stop.planned_departure_datetime, datetime)
+               for stop in leg.stops)
+
+
+def test_disruption_report(fixture):
+    disruptions = decode(fixture('disruptions')['payload'], parsed.MODELS['epoch'][models.Disruption])
+    reports = [d.report for d in disruptions if d.report is not None]
+    assert reports
+    assert all(isinstance(report.last_update, int) for report in reports)
+
+
+@patch('ns.NSAPI._request')
+def test_client(mock_response, fixture):
+    mock_response.return_value = fixture('departures')
+    departures = NSAPI('key', compact=True, timestamps='epoch').get_departures(station='UT')
+    assert isinstance(departures[0].planned_datetime, int)
+    with pytest.raises(ValueError):
+        NSAPI('key', timestamps='iso')
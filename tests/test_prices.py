@@ -0,0 +1,86 @@
+import asyncio
+from unittest.mock import patch
+
+from ns import AsyncNSAPI, NSAPI, models
+from ns.decoder import decode
+from ns.prices import PriceCache, fare, plan_prices
+
+
+class Clock():
+    now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_plan_dedupes_pairs():
+    plan = plan_prices(['UT', 'ASD', 'RTD'], ['UT', 'ASD', 'RTD'], [None])
+    assert len(plan) == 3
+    assert plan[('UT', 'ASD', None)] == [('UT', 'ASD', None), ('ASD', 'UT', None)]
+    assert len(plan_prices(['UT', 'ASD', 'RTD'], ['UT', 'ASD', 'RTD'], [None], symmetric=False)) == 6
+    assert len(plan_prices(['UT', 'ASD'], ['UT', 'ASD'], ['2026-10-18', '2026-10-19'])) == 2
+
+
+def test_fare(fixture):
+    options = decode(fixture('prices')['priceOptions'], models.PriceOption)
+    assert fare(options) == 870
+    assert fare(options, class_type='FIRST') == 1479
+    assert fare(options, discount_type='TWENTY_PERCENT') is None
+    assert fare(None) is None
+
+
+def test_cache_expiry():
+    clock = Clock()
+    cache = PriceCache(ttl=10, clock=clock)
+    cache.put(('UT', 'ASD', None), [])
+    assert cache.get(('UT', 'ASD', None)) == []
+    clock.now = 10
+    assert cache.get(('UT', 'ASD', None)) is None
+    assert len(cache) == 0
+
+
+@patch('ns.NSAPI._request')
+def test_price_matrix(mock_response, fixture):
+    mock_response.return_value = fixture('prices')
+    cache = PriceCache()
+    ns = NSAPI('key')
+    matrix = ns.get_price_matrix(['UT', 'ASD', 'RTD', 'UT'], dates=['2026-10-18'], cache=cache)
+    assert mock_response.call_count == 3
+    assert matrix.origins == matrix.destinations == ['UT', 'ASD', 'RTD']
+    table = matrix.table('2026-10-18')
+    assert table[0] == [None, 870, 870]
+    assert matrix['ASD', 'UT', '2026-10-18'] is matrix['UT', 'ASD', '2026-10-18']
+    dates = {call[1]['params']['date'] for call in mock_response.call_args_list}
+    assert dates == {'2026-10-18'}
+
+    # Cached pairs are not requested again, in either direction
+    matrix = ns.get_price_matrix(['RTD', 'UT'], ['UT', 'ASD', 'RTD', 'GVC'], dates=['2026-10-18'], cache=cache)
+    assert mock_response.call_count == 5
+    assert len(matrix.rows('2026-10-18')) == 2
+    assert matrix['RTD', 'UT', '2026-10-18'] is not None
+
+
+@patch('ns.NSAPI.get_trip_price')
+def test_failed_pairs(mock_price):
+    mock_price.side_effect = lambda origin, destination, **params: 1 / 0 if 'RTD' in (origin, destination) else []
+    matrix = NSAPI('key').get_price_matrix(['UT', 'ASD', 'RTD'])
+    assert matrix['UT', 'ASD'] == []
+    assert matrix['UT', 'RTD'] is None
+    assert set(matrix.errors) == {('UT', 'RTD', None), ('RTD', 'UT', None), ('ASD', 'RTD', None), ('RTD', 'ASD', None)}
+    assert all('date' not in call[1] for call in mock_price.call_args_list)
+
+
+def test_async_price_matrix(fixture):
+    calls = []
+
+    async def request(self, url, params=None):
+        calls.append(params)
+        return fixture('prices')
+
+    async def main():
+        with patch.object(AsyncNSAPI, '_request', request):
+            return await AsyncNSAPI('key').get_price_matrix(['UT', 'ASD'], ['UT', 'ASD', 'RTD'], dates=[None, '2026-10-19'])
+
+    matrix = asyncio.run(main())
+    assert len(calls) == 6
+    assert matrix.table('2026-10-19') == [[None, 870, 870], [870, None, 870]]
@@ -0,0 +1,114 @@
+import asyncio
+
+import aiohttp
+import pytest
+import requests
+
+from ns import AsyncNSAPI, NSAPI
+from ns.replay import MissingRecording, RecordingAdapter, RecordingOptions, ReplayAdapter, ReplayOptions, StandInGateway
+from ns.transport import RetryPolicy, TransportOptions
+
+from tests.conftest import FIXTURES
+
+
+@pytest.fixture()
+def gateway():
+    with StandInGateway(fixtures=FIXTURES) as gateway:
+        yield gateway
+
+
+def test_stand_in_gateway(gateway):
+    ns = NSAPI('key')
+    ns.base_url = gateway.base_url
+    assert len(ns.get_all_stations()) == 11
+    assert len(ns.get_departures(station='UT')) == 3
+    assert len(ns.get_trips(fromStation='UT', toStation='ASD')) == 2
+    assert len(ns.get_disruptions()) == 3
+    assert ns.get_trip_price('UT', 'ASD')[0].from_station == 'UT'
+    assert gateway.requests == 5
+
+
+def test_async_client(gateway):
+    async def run():
+        async with AsyncNSAPI('key') as ns:
+            ns.base_url = gateway.base_url
+            return await ns.get_arrivals(station='UT')
+
+    assert len(asyncio.run(run())) == 2
+
+
+def test_error_injection():
+    with StandInGateway(fixtures=FIXTURES, error_rate=1.0, error_status=503) as gateway:
+        ns = NSAPI('key', transport=TransportOptions(retry=RetryPolicy(total=2, backoff=0)))
+        ns.base_url = gateway.base_url
+        with pytest.raises(requests.exceptions.HTTPError):
+            ns.get_departures(station='UT')
+    assert gateway.errors == 3
+
+
+def test_record_replay(gateway, tmp_path):
+    recordings = str(tmp_path)
+    ns = NSAPI('key')
+    ns.base_url = gateway.base_url
+    ns.session.mount('http://', RecordingAdapter(recordings))
+    recorded = ns.get_departures(station='UT', maxJourneys=3)
+    assert len(list(tmp_path.iterdir())) == 1
+
+    ns = NSAPI('key')
+    ns.base_url = 'http://gateway.invalid/public-'
+    ns.session.mount('http://', ReplayAdapter(recordings))
+    assert ns.get_departures(maxJourneys=3, station='UT') == recorded
+    with pytest.raises(MissingRecording):
+        ns.get_departures(station='ASD')
+
+    # Recordings take precedence over fixtures in the stand-in gateway
+    with StandInGateway(recordings=recordings) as replaying:
+        ns = NSAPI('key')
+        ns.base_url = replaying.base_url
+        assert ns.get_departures(station='UT', maxJourneys=3) == recorded
+
+
+def test_async_record_replay(gateway, tmp_path):
+    recordings = str(tmp_path)
+
+    async def record():
+        async with AsyncNSAPI('key', transport=RecordingOptions(recordings=recordings)) as ns:
+            ns.base_url = gateway.base_url
+            departures = await ns.get_departures(station='UT', maxJourneys=3)
+            return departures, [trip async for trip in ns.iter_trips(fromStation='UT', toStation='ASD')]
+
+    recorded, trips = asyncio.run(record())
+    assert len(list(tmp_path.iterdir())) == 2
+
+    async def replay():
+        async with AsyncNSAPI('key', transport=ReplayOptions(recordings=recordings)) as ns:
+            ns.base_url = gateway.base_url
+            assert await ns.get_departures(maxJourneys=3, station='UT') == recorded
+            assert [trip async for trip in ns.iter_trips(fromStation='UT', toStation='ASD')] == trips
+            with pytest.raises(MissingRecording):
+                await ns.get_departures(station='ASD')
+
+    asyncio.run(replay())
+
+    # Recordings of either client replay in the other
+    ns = NSAPI('key', transport=ReplayOptions(recordings=recordings))
+    ns.base_url = gateway.base_url
+    assert ns.get_departures(station='UT', maxJourneys=3) == recorded
+
+
+def test_async_replay_errors(tmp_path):
+    recordings = str(tmp_path)
+    with StandInGateway(fixtures=FIXTURES, error_rate=1.0, error_status=503) as gateway:
+        ns = NSAPI('key', transport=RecordingOptions(recordings=recordings, retry=RetryPolicy(total=0)))
+        ns.base_url = gateway.base_url
+        with pytest.raises(requests.exceptions.HTTPError):
+            ns.get_arrivals(station='UT')
+
+    async def replay():
+        async with AsyncNSAPI('key', transport=ReplayOptions(recordings=recordings, retry=RetryPolicy(total=1, backoff=0))) as ns:
+            ns.base_url = gateway.base_url
+            await ns.get_arrivals(station='UT')
+
+    with pytest.raises(aiohttp.ClientResponseError) as error:
+        asyncio.run(replay())
+    assert error.value.status == 503
@@ -0,0 +1,131 @@
+import asyncio
+import threading
+
+import pytest
+from aiohttp import web
+
+from ns import AsyncNSAPI, NSAPI
+from ns.replay import StandInGateway
+from ns.scheduler import PriorityClass, RequestShed, Scheduler, priority
+from ns.transport import RetryPolicy, TransportOptions
+
+
+class Clock():
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_priority_of():
+    scheduler = Scheduler()
+    assert scheduler.priority_of('departures') == 'interactive'
+    assert scheduler.priority_of('prices') == 'batch'
+    assert scheduler.priority_of('trips') == 'normal'
+    with priority('batch'):
+        assert scheduler.priority_of('departures') == 'batch'
+    assert scheduler.priority_of('departures') == 'interactive'
+
+
+def test_priority_order():
+    clock = Clock()
+    scheduler = Scheduler(rate=1, burst=1, clock=clock)
+    scheduler.tokens = 0
+    batch = scheduler._enqueue('prices', threading.Event())
+    normal = scheduler._enqueue('trips', threading.Event())
+    interactive = scheduler._enqueue('departures', threading.Event())
+    assert scheduler.depth() == {'interactive': 1, 'normal': 1, 'batch': 1}
+
+    assert scheduler._dispatch() == 1
+    for granted in (interactive, normal, batch):
+        clock.now += 1
+        scheduler._dispatch()
+        assert granted.granted
+    assert scheduler._dispatch() is None
+    assert scheduler.snapshot()['priorities']['batch']['wait']['max'] == 3
+
+
+def test_reserve():
+    clock = Clock()
+    scheduler = Scheduler(rate=1, burst=4, clock=clock)
+    scheduler.tokens = 2.5
+    batch = scheduler._enqueue('prices', threading.Event())
+    # Batch requests leave half of the bucket to interactive ones
+    assert scheduler._dispatch() == pytest.approx(0.5) and not batch.granted
+    interactive = scheduler._enqueue('departures', threading.Event())
+    scheduler._dispatch()
+    assert interactive.granted and not batch.granted
+    clock.now += 1.5
+    scheduler._dispatch()
+    assert batch.granted
+
+
+def test_shed():
+    clock = Clock()
+    priorities = (PriorityClass('interactive'), PriorityClass('batch', max_queue=1, max_wait=10))
+    scheduler = Scheduler(rate=0.01, burst=1, priorities=priorities, routes={'prices': 'batch'}, clock=clock)
+    scheduler.tokens = 0
+    waiting = scheduler._enqueue('prices', threading.Event())
+    with pytest.raises(RequestShed):
+        scheduler._enqueue('prices', threading.Event())
+    clock.now += 11
+    scheduler._dispatch()
+    assert isinstance(waiting.error, RequestShed) and waiting.event.is_set()
+    assert scheduler.snapshot()['priorities']['batch']['shed'] == 2
+    with pytest.raises(ValueError):
+        scheduler._enqueue('departures', threading.Event())
+
+
+def test_observe():
+    clock = Clock()
+    scheduler = Scheduler(rate=10, clock=clock)
+    scheduler.observe(429, {'Retry-After': '5'})
+    assert scheduler.rate == 5 and scheduler.paused_until == 5 and scheduler.throttled == 1
+    scheduler._enqueue('departures', threading.Event())
+    assert scheduler._dispatch() == 5
+
+    scheduler.observe(200, {})
+    assert 5 < scheduler.rate < 5.1
+    scheduler.observe(200, {'X-RateLimit-Remaining': '30', 'X-RateLimit-Reset': '10'})
+    assert scheduler.rate == 3
+    scheduler.observe(200, {'RateLimit-Remaining': '1000', 'RateLimit-Reset': '10'})
+    assert scheduler.rate == 10
+
+
+def test_sync_client():
+    scheduler = Scheduler(rate=100)
+    with StandInGateway(fixtures='tests/fixtures') as gateway:
+        ns = NSAPI('key', scheduler=scheduler)
+        ns.base_url = gateway.base_url
+        assert len(ns.get_departures(station='UT')) == 3
+        ns.get_trip_price('UT', 'ASD')
+    snapshot = scheduler.snapshot()['priorities']
+    assert snapshot['interactive']['granted'] == 1 and snapshot['batch']['granted'] == 1
+
+
+def test_async_throttled(fixture):
+    responses = [web.json_response({}, status=429, headers={'Retry-After': '0'}),
+                 web.json_response(fixture('departures'))]
+
+    async def handler(request):
+        return responses.pop(0)
+
+    async def run():
+        app = web.Application()
+        app.router.add_get('/{tail:.*}', handler)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, '127.0.0.1', 0)
+        await site.start()
+        try:
+            async with AsyncNSAPI('key', scheduler=scheduler, transport=TransportOptions(retry=RetryPolicy(backoff=0))) as ns:
+                ns.base_url = f'http://127.0.0.1:{runner.addresses[0][1]}/public-'
+                return await ns.get_departures(station='UT')
+        finally:
+            await runner.cleanup()
+
+    scheduler = Scheduler(rate=10)
+    assert len(asyncio.run(run())) == 3
+    assert scheduler.throttled == 1 and scheduler.rate < 10
+    assert scheduler.snapshot()['priorities']['interactive']['granted'] == 2
@@ -0,0 +1,86 @@
+import asyncio
+import copy
+from unittest.mock import patch
+
+from ns import AsyncNSAPI, NSAPI
+from ns.scroll import TripScroll, departure
+
+
+def pages(fixture, count: int):
+    """ Responses of consecutive pages of two trips each, every page repeating the last trip of the one before """
+    template = fixture('trips')
+    trips = []
+    for i in range(2 * count):
+        trip = copy.deepcopy(template['trips'][i % 2])
+        trip['ctxRecon'] = f'ctx-{i}'
+        trip['checksum'] = f'checksum-{i}'
+        trip['legs'][0]['origin']['plannedDateTime'] = f'2026-10-18T{10 + i:02}:00:00+0200'
+        trip['legs'][0]['origin'].pop('actualDateTime', None)
+        trips.append(trip)
+    responses = []
+    for page in range(count):
+        start = max(0, 2 * page - 1)
+        responses.append({**template, 'trips': trips[start:2 * page + 2], 'scrollRequestForwardContext': f'page-{page + 1}'})
+    return responses
+
+
+def test_departure(fixture):
+    trip = fixture('trips')['trips'][0]
+    assert departure(trip) is not None
+    assert departure({'legs': []}) is None
+
+
+def test_scroll_dedupes_and_stops(fixture):
+    responses = pages(fixture, 4)
+    scroll = TripScroll({'fromStation': 'UT'}, until='2026-10-18T14:30:00+0200')
+    trips, params = scroll.page(responses[0])
+    assert [t['ctxRecon'] for t in trips] == ['ctx-0', 'ctx-1']
+    assert params == {'fromStation': 'UT', 'context': 'page-1'}
+    trips, params = scroll.page(responses[1])
+    assert [t['ctxRecon'] for t in trips] == ['ctx-2', 'ctx-3']
+    assert scroll.duplicates == 1
+    trips, params = scroll.page(responses[2])
+    assert [t['ctxRecon'] for t in trips] == ['ctx-4']
+    assert params is None
+
+    scroll = TripScroll({}, max_pages=1)
+    assert scroll.page(responses[0])[1] is None
+    # A page of only known trips ends the scroll
+    scroll = TripScroll({})
+    scroll.page(responses[0])
+    assert scroll.page(responses[0]) == ([], None)
+
+
+@patch('ns.NSAPI._request')
+def test_scroll_trips(mock_response, fixture):
+    mock_response.side_effect = pages(fixture, 5)
+    ns = NSAPI('key')
+    trips = list(ns.scroll_trips(until='2026-10-18T16:00:00+0200', fromStation='UT', toStation='ASD'))
+    assert [trip.ctx_recon for trip in trips] == [f'ctx-{i}' for i in range(7)]
+    assert mock_response.call_count == 4
+    assert [call[0][1].get('context') for call in mock_response.call_args_list] == [None, 'page-1', 'page-2', 'page-3']
+    assert all(call[0][1]['fromStation'] == 'UT' for call in mock_response.call_args_list)
+
+
+def test_scroll_trips_async(fixture):
+    responses = pages(fixture, 3)
+    requested = []
+
+    async def request(url, params=None):
+        requested.append(params.get('context'))
+        return responses[int(params['context'][5:]) if 'context' in params else 0]
+
+    async def main():
+        ns = AsyncNSAPI('key')
+        with patch.object(ns, '_request', request):
+            trips = [trip async for trip in ns.scroll_trips(max_pages=2, fromStation='UT')]
+            # The next page is requested before the first trip is consumed
+            iterator = ns.scroll_trips(fromStation='UT')
+            await iterator.__anext__()
+            await asyncio.sleep(0)
+            await iterator.aclose()
+        return trips
+
+    trips = asyncio.run(main())
+    assert [trip.ctx_recon for trip in trips] == ['ctx-0', 'ctx-1', 'ctx-2', 'ctx-3']
+    assert requested == [None, 'page-1', None, 'page-1']
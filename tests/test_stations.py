@@ -0,0 +1,58 @@
+import pytest
+
+from ns.decoder import decode
+from ns.models import Station
+from ns.stations import StationIndex, distance
+
+
+@pytest.fixture()
+def index(fixture):
+    return StationIndex(decode(fixture('stations')['payload'], Station))
+
+
+def test_lookups(index):
+    assert index.get('UT').code == 'UT'
+    assert index.get('ut').code == 'UT'
+    assert index.get('8400058').code == 'ASD'
+    assert index.get('7004428').code == 'STP'
+    assert index.get('den bosch').code == 'HT'
+    assert index.get("'s-Gravenhage").code == 'GVC'
+    assert index['Amsterdam CS'].code == 'ASD'
+    assert index.get('XXX') is None
+    with pytest.raises(KeyError):
+        index['XXX']
+
+
+def test_search(index):
+    assert [s.code for s in index.search('am')] == ['AMF', 'ASA', 'ASD']
+    assert [s.code for s in index.search('amsterdam c')] == ['ASD']
+    assert len(index.search('a', limit=2)) == 2
+
+
+def test_fuzzy(index):
+    assert index.fuzzy('Utreht')[0].code == 'UT'
+    assert index.fuzzy('Rotterdm Centraal')[0].code == 'RTD'
+
+
+def test_nearest(index):
+    # Utrecht Science Park
+    lat, lng = 52.085, 5.175
+    expected = sorted(index, key=lambda s: distance(lat, lng, s.latitude, s.longitude))[:3]
+    nearest = index.nearest(lat, lng, k=3)
+    assert [s for s, _ in nearest] == expected
+    assert nearest[0][0].code == 'BNK'
+    assert index.nearest(51.5, 0, k=1)[0][0].code == 'STP'
+    assert len(index.nearest(lat, lng, k=100)) == len(index)
+
+
+def test_within(index):
+    codes = [s.code for s, _ in index.within(52.0888, 5.1100, 10)]
+    assert codes == ['UT', 'BNK']
+
+
+def test_save_load(index, tmp_path):
+    path = str(tmp_path / 'stations.idx')
+    index.save(path)
+    loaded = StationIndex.load(path)
+    assert loaded.get('UT') == index.get('UT')
+    assert loaded.nearest(52.0, 5.0) == index.nearest(52.0, 5.0)
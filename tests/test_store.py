@@ -0,0 +1,179 @@
+import asyncio
+import marshal
+import os
+import struct
+import time
+from unittest.mock import patch
+
+import pytest
+
+from ns import AsyncNSAPI, NSAPI
+from ns.store import DiskStore, PersistentCache
+
+STATIONS = 'https://gateway.apiportal.ns.nl/public-reisinformatie/api/v2/stations'
+PRICES = 'https://gateway.apiportal.ns.nl/public-prijsinformatie/prices'
+DEPARTURES = 'https://gateway.apiportal.ns.nl/public-reisinformatie/api/v2/departures'
+
+
+class Clock():
+    now = 1e9
+
+    def __call__(self):
+        return self.now
+
+
+def test_disk_store(tmp_path):
+    store = DiskStore(str(tmp_path / 'stations.nsdb'))
+    assert store.get('a') is None
+    store.update({'a': {'payload': [1, 2]}, 'b': 'two'}, stored=10)
+    store.update({'c': 3.5}, stored=20)
+    assert len(store) == 3
+    assert store.get('a')[:2] == (10, {'payload': [1, 2]})
+    assert store.get('c')[:2] == (20, 3.5)
+
+    # Another process sees the same file, and replacements of it
+    other = DiskStore(store.path)
+    assert other.get('b')[1] == 'two'
+    store.update({'b': 'three'}, stored=30)
+    assert other.get('b')[:2] == (30, 'three')
+
+
+def test_journal(tmp_path):
+    store = DiskStore(str(tmp_path / 'prices.nsdb'), compact_after=4)
+    other = DiskStore(store.path)
+    with patch.object(DiskStore, '_write', wraps=store._write) as write:
+        for i in range(3):
+            store.update({f'k{i}': i}, stored=i)
+        # Appended to the journal, without rewriting the file
+        assert write.call_count == 0
+        assert other.get('k2')[:2] == (2, 2) and len(other) == 3
+        store.update({'k3': 3, 'k0': 'zero'}, stored=10)
+        assert write.call_count == 1
+    assert not os.path.exists(store.journal_path)
+    assert other.get('k0')[:2] == (10, 'zero') and len(other) == 4
+    assert sorted(key for key, _, _ in store.items()) == ['k0', 'k1', 'k2', 'k3']
+
+    # The journal only compacts again once it holds as many entries as the file
+    for i in range(4, 7):
+        store.update({f'k{i}': i})
+    assert os.path.exists(store.journal_path) and len(store) == 7
+
+
+def test_failed_compaction_keeps_journal(tmp_path):
+    store = DiskStore(str(tmp_path / 'prices.nsdb'), compact_after=2)
+    other = DiskStore(store.path, compact_after=100)
+    store.update({'a': 1}, stored=1)
+
+    def full_disk(entries):
+        # Another writer appends a newer entry while the journal is being merged
+        other.update({'a': 'newer'}, stored=5)
+        raise OSError('No space left on device')
+
+    with patch.object(DiskStore, '_write', side_effect=full_disk):
+        with pytest.raises(OSError):
+            store.update({'b': 2}, stored=2)
+    assert os.listdir(str(tmp_path)) == ['prices.nsdb.log']
+    assert store.get('a')[:2] == (5, 'newer') and store.get('b')[:2] == (2, 2)
+    store.compact()
+    assert not os.path.exists(store.journal_path)
+    assert sorted((key, value) for key, _, value in other.items()) == [('a', 'newer'), ('b', 2)]
+
+
+def test_other_format_is_ignored(tmp_path):
+    path = tmp_path / 'stations.nsdb'
+    path.write_bytes(struct.pack('<4sHHI', b'NSDB', 99, marshal.version, 0))
+    store = DiskStore(str(path))
+    assert len(store) == 0
+    store.update({'a': 1})
+    assert store.get('a')[1] == 1
+
+
+def test_handles_reference_data_only(tmp_path):
+    cache = PersistentCache(str(tmp_path))
+    assert cache.handles(STATIONS)
+    assert cache.handles(PRICES)
+    assert not cache.handles(DEPARTURES)
+    assert PersistentCache.key(PRICES, {'toStation': 'ASD', 'fromStation': 'UT', 'date': None}) == \
+        PersistentCache.key('http://127.0.0.1:8080/public-prijsinformatie/prices', {'fromStation': 'UT', 'toStation': 'ASD'})
+
+
+def test_stale_while_revalidate(tmp_path):
+    clock = Clock()
+    cache = PersistentCache(str(tmp_path), max_ages={'stations': 100}, refresh_after={'stations': 10}, clock=clock)
+    calls = []
+
+    def request():
+        calls.append(1)
+        return {'payload': len(calls)}, 10
+
+    assert cache.fetch(STATIONS, None, request)[0] == {'payload': 1}
+    assert cache.fetch(STATIONS, None, request)[0] == {'payload': 1}
+    assert len(calls) == 1
+
+    clock.now += 50
+    assert cache.fetch(STATIONS, None, request)[0] == {'payload': 1}
+    deadline = time.monotonic() + 5
+    while not cache.refreshes and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert cache.fetch(STATIONS, None, request)[0] == {'payload': 2}
+
+    clock.now += 200
+    assert cache.fetch(STATIONS, None, request)[0] == {'payload': 3}
+    assert cache.stats()['misses'] == 2
+
+
+def test_failed_refresh_keeps_entry(tmp_path):
+    clock = Clock()
+    cache = PersistentCache(str(tmp_path), max_ages={'stations': 100}, refresh_after={'stations': 10}, clock=clock)
+    cache.fetch(STATIONS, None, lambda: ({'payload': 1}, 10))
+    clock.now += 50
+
+    def fail():
+        raise ConnectionError()
+
+    store, key, hit, refresh = cache._lookup(STATIONS, None)
+    assert refresh
+    cache._refresh(store, key, fail)
+    assert cache.refresh_errors == 1
+    assert cache.fetch(STATIONS, None, fail)[0] == {'payload': 1}
+
+
+@patch('ns.NSAPI._fetch')
+def test_warm_start(mock_fetch, tmp_path, fixture):
+    mock_fetch.return_value = fixture('stations'), 100
+    stations = NSAPI('key', store=PersistentCache(str(tmp_path))).get_all_stations()
+    assert mock_fetch.call_count == 1
+
+    # A new worker starts without any gateway call
+    warm = NSAPI('key', store=PersistentCache(str(tmp_path))).get_all_stations()
+    assert mock_fetch.call_count == 1
+    assert warm == stations
+
+
+@patch('ns.NSAPI._fetch')
+def test_prices_per_pair_and_date(mock_fetch, tmp_path, fixture):
+    mock_fetch.return_value = fixture('prices'), 100
+    ns = NSAPI('key', store=PersistentCache(str(tmp_path)))
+    ns.get_trip_price('UT', 'ASD', date='2026-10-18')
+    ns.get_trip_price('UT', 'ASD', date='2026-10-18')
+    ns.get_trip_price('UT', 'ASD', date='2026-10-19')
+    ns.get_trip_price('ASD', 'UT', date='2026-10-18')
+    assert mock_fetch.call_count == 3
+    assert len(ns.store.stores['prices']) == 3
+
+
+def test_async_warm_start(tmp_path, fixture):
+    async def fetch(self, url, params=None):
+        fetch.calls += 1
+        return fixture('stations'), 100
+    fetch.calls = 0
+
+    async def main():
+        with patch.object(AsyncNSAPI, '_fetch', fetch):
+            first = await AsyncNSAPI('key', store=PersistentCache(str(tmp_path))).get_all_stations()
+            second = await AsyncNSAPI('key', store=PersistentCache(str(tmp_path))).get_all_stations()
+        return first, second
+
+    first, second = asyncio.run(main())
+    assert first == second
+    assert fetch.calls == 1
@@ -0,0 +1,68 @@
+import json
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from ns import NSAPI, Trip
+from ns.stream import ArrayStream
+
+
+def chunks(body: bytes, size: int):
+    return [body[i:i + size] for i in range(0, len(body), size)]
+
+
+@pytest.mark.parametrize('size', [1, 7, 100, 1 << 20])
+def test_array_stream(fixture, size):
+    document = fixture('trips')
+    stream = ArrayStream('trips')
+    items = []
+    for chunk in chunks(json.dumps(document, ensure_ascii=False).encode(), size):
+        items.extend(stream.feed(chunk))
+    items.extend(stream.close())
+    assert items == document['trips']
+    assert stream.rest == {key: value for key, value in document.items() if key != 'trips'}
+
+
+def test_array_stream_yields_early(fixture):
+    body = json.dumps(fixture('trips')).encode()
+    stream = ArrayStream('trips')
+    first = stream.feed(body[:body.index(b'{"idx": 1')])
+    assert len(first) == 1
+
+
+def test_array_stream_yields_on_chunk_boundary(fixture):
+    body = json.dumps(fixture('trips')).encode()
+    stream = ArrayStream('trips')
+    # The chunk ends with the closing brace of the first trip
+    first = stream.feed(body[:body.index(b', {"idx": 1')])
+    assert [trip['idx'] for trip in first] == [0]
+    assert [trip['idx'] for trip in stream.feed(body[body.index(b', {"idx": 1'):])] == [1]
+
+
+def test_numbers_and_empty():
+    stream = ArrayStream('values')
+    assert stream.feed(b'{"values": [12') == []
+    assert stream.feed(b'3, 4') == [123]
+    assert stream.feed(b'], "empty": []') == [4]
+    assert stream.feed(b'}') == []
+    assert stream.close() == []
+    assert stream.rest == {'empty': []}
+
+
+def test_incomplete():
+    stream = ArrayStream('trips')
+    stream.feed(b'{"trips": [{"idx": 0}')
+    with pytest.raises(ValueError):
+        stream.close()
+
+
+def test_iter_trips(fixture):
+    ns = NSAPI('key')
+    response = MagicMock()
+    response.__enter__.return_value = response
+    response.iter_content.return_value = chunks(json.dumps(fixture('trips')).encode(), 512)
+    with patch.object(ns.session, 'get', return_value=response):
+        trips = list(ns.iter_trips(fromStation='UT', toStation='ASD'))
+    assert [trip.index for trip in trips] == [0, 1]
+    assert isinstance(trips[0], Trip)
+    assert trips[1].legs[1].product.operator_name == 'Syntus Utrecht'
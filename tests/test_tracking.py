@@ -0,0 +1,92 @@
+import asyncio
+import copy
+from unittest.mock import patch
+
+from ns import AsyncNSAPI
+from ns.tracking import TripTracker, trip_version
+
+
+def test_trip_version(fixture):
+    trip = fixture('trips')['trips'][0]
+    changed = copy.deepcopy(trip)
+    changed['crowdForecast'] = 'HIGH'
+    changed['legs'][0]['notes'] = []
+    assert trip_version(changed) == trip_version(trip)
+    changed['legs'][0]['stops'][1]['arrivalDelayInSeconds'] = 300
+    assert trip_version(changed) != trip_version(trip)
+
+
+def test_shared_refresh(fixture):
+    trip = fixture('trips')['trips'][0]
+    fetches = []
+
+    async def fetch(ctx_recon, params):
+        fetches.append(ctx_recon)
+        data = copy.deepcopy(trip)
+        if len(fetches) >= 3:
+            data['legs'][0]['destination']['actualTrack'] = '8'
+        return data
+
+    async def main():
+        tracker = TripTracker(fetch, interval=0)
+        first = tracker.follow(trip['ctxRecon'])
+        second = tracker.follow(trip['ctxRecon'], trip['checksum'])
+        a, b = await asyncio.gather(first.__anext__(), second.__anext__())
+        assert a is b
+        assert a.changed_legs == [0]
+
+        # Refreshes without realtime changes are not pushed
+        a, b = await asyncio.gather(first.__anext__(), second.__anext__())
+        assert a is b
+        assert len(fetches) >= 3
+        assert a.trip.legs[0].destination.actual_track == '8'
+        assert a.changed_legs == [0]
+
+        # Followers joining by checksum share the tracked trip, and start with it
+        third = tracker.follow('another representation', trip['checksum'])
+        c = await third.__anext__()
+        assert c.trip is a.trip
+        assert len(tracker) == 1
+
+        for follower in (first, second, third):
+            await follower.aclose()
+        assert len(tracker) == 0
+        assert not tracker._checksums
+
+    asyncio.run(main())
+    assert set(fetches) == {trip['ctxRecon']}
+
+
+def test_errors_are_pushed():
+    async def fetch(ctx_recon, params):
+        raise ConnectionError()
+
+    async def main():
+        follower = TripTracker(fetch).follow('ctx')
+        update = await follower.__anext__()
+        await follower.aclose()
+        return update
+
+    update = asyncio.run(main())
+    assert isinstance(update.error, ConnectionError)
+    assert update.trip is None
+
+
+def test_client(fixture):
+    calls = []
+
+    async def request(self, url, params=None):
+        calls.append(params)
+        return {'payload': fixture('trips')['trips'][0]}
+
+    async def main():
+        with patch.object(AsyncNSAPI, '_request', request):
+            ns = AsyncNSAPI('key', lazy=True)
+            follower = ns.follow_trip('ctx', lang='nl')
+            update = await follower.__anext__()
+            await follower.aclose()
+        return update
+
+    update = asyncio.run(main())
+    assert calls == [{'ctxRecon': 'ctx', 'lang': 'nl'}]
+    assert update.trip.legs[0].stops[0].name == 'Utrecht Centraal'
@@ -0,0 +1,110 @@
+import asyncio
+import email.utils
+import json
+import time
+from datetime import timedelta
+from unittest.mock import MagicMock, patch
+
+import pytest
+import requests
+from aiohttp import web
+
+from ns import AsyncNSAPI, NSAPI
+from ns.metrics import Instrumentation
+from ns.ratelimit import TokenBucket
+from ns.transport import RetryPolicy, TransportOptions, parse_retry_after
+
+
+def test_retry_policy():
+    policy = RetryPolicy(total=3, backoff=1, max_backoff=3, jitter=False)
+    assert [policy.delay(attempt, 503) for attempt in range(4)] == [1, 2, 3, None]
+    assert policy.delay(0, 404) is None
+    assert policy.delay(0, None) == 1
+    assert policy.delay(0, 429, '2') == 2
+    assert policy.delay(0, 429, '3600') == 3
+    assert RetryPolicy(connection_errors=False).delay(0, None) is None
+    assert 0 <= RetryPolicy(backoff=1).delay(2, 500) <= 4
+
+
+def test_parse_retry_after():
+    assert parse_retry_after('120') == 120
+    assert 55 < parse_retry_after(email.utils.formatdate(time.time() + 60, usegmt=True)) <= 60
+    assert parse_retry_after('soon') is None
+
+
+def test_session_pool():
+    session = TransportOptions(pool_maxsize=50).session()
+    assert session.get_adapter('https://gateway.apiportal.ns.nl')._pool_maxsize == 50
+    assert session.headers['Connection'] == 'keep-alive'
+    assert TransportOptions(keep_alive=False).session().headers['Connection'] == 'close'
+
+
+def response(status, body=None, headers=None):
+    request = MagicMock(status_code=status, headers=headers or {}, content=b'{}', elapsed=timedelta(milliseconds=10))
+    request.__enter__.return_value = request
+    request.json.return_value = body
+    if status >= 400:
+        request.raise_for_status.side_effect = requests.exceptions.HTTPError(response=request)
+    return request
+
+
+@patch('time.sleep')
+def test_sync_retry(mock_sleep, fixture):
+    metrics = Instrumentation()
+    bucket = TokenBucket(rate=100)
+    ns = NSAPI('key', instrumentation=metrics, rate_limit=bucket)
+    responses = [response(503), response(429, headers={'Retry-After': '2'}), response(200, fixture('departures'))]
+    with patch.object(ns.session, 'get', side_effect=responses) as mock_get, \
+            patch.object(bucket, 'acquire', wraps=bucket.acquire) as acquire:
+        assert len(ns.get_departures(station='UT')) == 3
+    assert mock_get.call_count == 3
+    # Every attempt takes a token
+    assert acquire.call_count == 3
+    assert mock_get.call_args[1]['timeout'] == (10.0, 30.0)
+    assert mock_sleep.call_args_list[1][0] == (2.0,)
+    assert metrics.snapshot()['departures']['retries'] == 2
+
+
+@patch('time.sleep')
+def test_sync_no_retry(mock_sleep):
+    ns = NSAPI('key', transport=TransportOptions(retry=RetryPolicy(total=1)))
+    with patch.object(ns.session, 'get', side_effect=[response(401)]):
+        with pytest.raises(requests.exceptions.HTTPError):
+            ns.get_all_stations()
+    with patch.object(ns.session, 'get', side_effect=[response(500), response(500)]) as mock_get:
+        with pytest.raises(requests.exceptions.HTTPError):
+            ns.get_all_stations()
+    assert mock_get.call_count == 2
+
+
+def test_async_retry(fixture):
+    body = json.dumps(fixture('departures'))
+    statuses = [503, 200]
+
+    async def handler(request):
+        status = statuses.pop(0)
+        if status != 200:
+            return web.json_response({'message': 'unavailable'}, status=status, headers={'Retry-After': '0'})
+        return web.Response(text=body, content_type='application/json')
+
+    async def run():
+        app = web.Application()
+        app.router.add_get('/{tail:.*}', handler)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, '127.0.0.1', 0)
+        await site.start()
+        port = runner.addresses[0][1]
+        try:
+            with patch.object(AsyncNSAPI, 'base_url', f'http://127.0.0.1:{port}/public-'):
+                async with AsyncNSAPI('key', transport=TransportOptions(pool_maxsize=4), rate_limit=bucket) as ns:
+                    assert ns.session.connector.limit_per_host == 4
+                    return await ns.get_departures(station='UT')
+        finally:
+            await runner.cleanup()
+
+    # A stopped clock, so the bucket shows the tokens taken by both attempts
+    bucket = TokenBucket(rate=1, capacity=10, clock=lambda: 0.0)
+    assert len(asyncio.run(run())) == 3
+    assert statuses == []
+    assert bucket.tokens == 8